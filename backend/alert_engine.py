@@ -0,0 +1,212 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+from alert_store import load_active_alerts
+
+
+class _ThresholdIndex:
+    """
+    Active alerts of one pair, kept as two sorted threshold lists.
+
+    '>' alerts fire when z > value, so with ascending values the triggered ones
+    are the prefix before bisect_left(z). '<' alerts fire when z < value, so they
+    are the suffix after bisect_right(z). Each evaluation is O(log n + fired).
+    """
+
+    def __init__(self):
+        # condition -> sorted list of (value, alert_id)
+        self.thresholds = {">": [], "<": []}
+
+    def __len__(self):
+        return len(self.thresholds[">"]) + len(self.thresholds["<"])
+
+    def add(self, condition: str, value: float, alert_id: int):
+        insort(self.thresholds[condition], (value, alert_id))
+
+    def remove(self, condition: str, value: float, alert_id: int):
+        entries = self.thresholds[condition]
+        i = bisect_left(entries, (value, alert_id))
+        if i < len(entries) and entries[i] == (value, alert_id):
+            del entries[i]
+
+    def pop_triggered(self, z_score: float) -> list:
+        """Removes and returns the ids of every alert triggered by `z_score`."""
+        above = self.thresholds[">"]
+        # Compare on value only; (z, -inf) sorts before every (z, id).
+        i = bisect_left(above, (z_score, float("-inf")))
+        fired = [alert_id for _, alert_id in above[:i]]
+        del above[:i]
+
+        below = self.thresholds["<"]
+        j = bisect_right(below, (z_score, float("inf")))
+        fired.extend(alert_id for _, alert_id in below[j:])
+        del below[j:]
+        return fired
+
+
+class AlertEngine:
+    """
+    In-memory evaluation of the active alert rules.
+
+    Rules are loaded from the `alerts` table once and then kept in sync by the
+    create/delete endpoints (and by sync() when other API workers edit them). Every
+    new z-score of a pair is checked with a bisect over that pair's thresholds.
+    Triggered alerts leave the index immediately and their status is persisted
+    later in one batched write by flush().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._alerts = {}  # alert_id -> alert dict
+        self._indexes = {}  # symbol_pair -> _ThresholdIndex
+        self._pending = []  # triggered ids waiting to be persisted
+        self._listeners = []
+        self.triggered_count = 0
+
+    # --- Rule management ---
+
+    def load(self, conn):
+        """(Re)loads every active alert from the database."""
+        rows = load_active_alerts(conn)
+        with self._lock:
+            self._alerts.clear()
+            self._indexes.clear()
+            for row in rows:
+                self._add_locked(row)
+        print(f"--- Alert engine loaded {len(rows)} active alerts ---")
+
+    def sync(self, conn) -> int:
+        """
+        Applies the changes other processes made to the active alerts since the
+        last load/sync. Alerts triggered here but not yet flushed are left out.
+        Returns the number of alerts added or removed.
+        """
+        rows = {row["id"]: row for row in load_active_alerts(conn)}
+        with self._lock:
+            pending = set(self._pending)
+            removed = [alert_id for alert_id in self._alerts if alert_id not in rows]
+            for alert_id in removed:
+                self._remove_locked(alert_id)
+            added = 0
+            for alert_id, row in rows.items():
+                if alert_id not in self._alerts and alert_id not in pending:
+                    self._add_locked(row)
+                    added += alert_id in self._alerts
+        return len(removed) + added
+
+    def add(self, alert: dict):
+        """Indexes a new (or re-activated) alert."""
+        with self._lock:
+            self._remove_locked(alert["id"])
+            # A re-activated alert must not be marked triggered by a pending write.
+            if alert["id"] in self._pending:
+                self._pending = [i for i in self._pending if i != alert["id"]]
+            self._add_locked(alert)
+
+    def remove(self, alert_id: int):
+        with self._lock:
+            self._remove_locked(alert_id)
+
+    def _add_locked(self, alert: dict):
+        if alert.get("metric") != "Z-Score" or alert.get("status", "active") != "active":
+            return
+        self._alerts[alert["id"]] = alert
+        index = self._indexes.setdefault(alert["symbol_pair"], _ThresholdIndex())
+        index.add(alert["condition"], alert["value"], alert["id"])
+
+    def _remove_locked(self, alert_id: int):
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        index = self._indexes.get(alert["symbol_pair"])
+        if index is not None:
+            index.remove(alert["condition"], alert["value"], alert_id)
+            if not len(index):
+                del self._indexes[alert["symbol_pair"]]
+
+    def pairs(self) -> set:
+        """Pairs that currently have at least one active alert."""
+        with self._lock:
+            return set(self._indexes)
+
+    # --- Evaluation ---
+
+    def evaluate(self, symbol_pair: str, z_score: float) -> list:
+        """
+        Checks a new z-score of a pair. Returns one event per triggered alert and
+        notifies the listeners.
+        """
+        if z_score != z_score:  # NaN never triggers anything
+            return []
+
+        with self._lock:
+            index = self._indexes.get(symbol_pair)
+            if index is None:
+                return []
+            fired = index.pop_triggered(z_score)
+            if not fired:
+                return []
+            if not len(index):
+                del self._indexes[symbol_pair]
+
+            events = []
+            for alert_id in fired:
+                alert = self._alerts.pop(alert_id)
+                self._pending.append(alert_id)
+                events.append(
+                    {
+                        "type": "alert",
+                        "message": f"ALERT on {alert['symbol_pair']}: Z-Score ({z_score:.2f}) {alert['condition']} {alert['value']}",
+                        "alert_id": alert_id,
+                        "symbol_pair": symbol_pair,
+                    }
+                )
+            self.triggered_count += len(events)
+            listeners = list(self._listeners)
+
+        for event in events:
+            print(f"--- ALERT TRIGGERED: {event['alert_id']} ---")
+            for listener in listeners:
+                listener(event)
+        return events
+
+    # --- Trigger event listeners ---
+
+    def add_listener(self, callback):
+        """Registers callback(event), called for every triggered alert."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    # --- Persistence ---
+
+    def flush(self, persist) -> int:
+        """
+        Persists the 'triggered' status of every pending alert in one batch:
+        persist(alert_ids) is expected to write them in a single transaction.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            persist(pending)
+        except Exception:
+            # Keep them for the next flush rather than losing the status change.
+            with self._lock:
+                self._pending = pending + self._pending
+            raise
+        return len(pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_alerts": len(self._alerts),
+                "pairs": len(self._indexes),
+                "pending_writes": len(self._pending),
+                "triggered": self.triggered_count,
+            }
@@ -0,0 +1,57 @@
+# SQL for every write to the `alerts` table. The API runs these directly when it is
+# the only (read-write) process; with several read-only API workers they run in the
+# ingestor, reached through the control channel (control.py).
+
+
+def upsert_alert(conn, symbol_pair: str, metric: str, condition: str, value: float) -> dict:
+    """
+    Creates an alert rule or re-activates an identical existing one.
+    Returns the stored alert, including its ID.
+    """
+    # Check if an alert with these exact parameters already exists
+    existing = conn.execute(
+        "SELECT * FROM alerts WHERE symbol_pair = ? AND metric = ? AND condition = ? AND value = ?",
+        (symbol_pair, metric, condition, value),
+    ).fetchone()
+
+    with conn:
+        if existing:
+            alert_id = existing["id"]
+            if existing["status"] != "active":
+                # If it was triggered or deleted, re-activate it
+                conn.execute("UPDATE alerts SET status = 'active' WHERE id = ?", (alert_id,))
+        else:
+            alert_id = conn.execute(
+                "INSERT INTO alerts (symbol_pair, metric, condition, value, status) VALUES (?, ?, ?, ?, 'active')",
+                (symbol_pair, metric, condition, value),
+            ).lastrowid
+
+    row = conn.execute("SELECT * FROM alerts WHERE id = ?", (alert_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def delete_alert(conn, alert_id: int):
+    with conn:
+        conn.execute("DELETE FROM alerts WHERE id = ?", (alert_id,))
+
+
+def mark_triggered(conn, alert_ids) -> int:
+    """Sets the 'triggered' status of every still-active alert in `alert_ids`."""
+    with conn:
+        conn.executemany(
+            "UPDATE alerts SET status = 'triggered' WHERE id = ? AND status = 'active'",
+            [(alert_id,) for alert_id in alert_ids],
+        )
+    return len(alert_ids)
+
+
+def load_active_alerts(conn) -> list:
+    return [dict(row) for row in conn.execute("SELECT * FROM alerts WHERE status = 'active'")]
+
+
+# Writes the control channel accepts, by name.
+WRITE_COMMANDS = {
+    "upsert_alert": upsert_alert,
+    "delete_alert": delete_alert,
+    "mark_triggered": mark_triggered,
+}
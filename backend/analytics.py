@@ -1,6 +1,10 @@
+import math
+from collections import deque
+
 import pandas as pd
-import statsmodels.api as sm
-from statsmodels.tsa.stattools import adfuller
+
+from adf import adf_test
+from kernels import ols_fit
 
 
 def calculate_hedge_ratio(y: pd.Series, x: pd.Series) -> tuple:
@@ -13,24 +17,38 @@ def calculate_hedge_ratio(y: pd.Series, x: pd.Series) -> tuple:
     - a: Intercept
     - b: Slope, which is our Hedge Ratio
 
-    Returns a tuple containing the hedge ratio and the full regression model results.
+    Returns a tuple containing the hedge ratio and the intercept. Both are NaN
+    when X never changes, since no relationship can be determined then.
+    Solved in closed form (kernels.ols_fit); see ols_diagnostics for the full
+    statsmodels results.
     """
-    # If all X values are the same, regression is impossible.
-    if x.std() == 0:
-        # In this case, we can't determine a relationship, so the hedge ratio is undefined.
-        # We can return 0 or NaN. Returning NaN and handling it later is more robust.
-        return float("nan"), None
+    return ols_fit(y.to_numpy(), x.to_numpy())
 
-    x_with_const = sm.add_constant(x)
-    model = sm.OLS(y, x_with_const).fit()
 
-    # Check if model is None (which it will be if the check above passes)
-    if model is None:
-        return float("nan"), None
+def ols_diagnostics(y: pd.Series, x: pd.Series) -> dict:
+    """
+    Full regression diagnostics of Y = a + b*X from statsmodels, which is imported
+    only here so that the API does not load it unless diagnostics are requested.
+    """
+    import statsmodels.api as sm
+    from statsmodels.stats.stattools import durbin_watson
 
-    # The hedge ratio is the coefficient of our X variable
-    hedge_ratio = model.params.iloc[1]
-    return hedge_ratio, model
+    model = sm.OLS(y.to_numpy(), sm.add_constant(x.to_numpy())).fit()
+    return {
+        "nobs": int(model.nobs),
+        "r_squared": model.rsquared,
+        "adj_r_squared": model.rsquared_adj,
+        "f_p_value": model.f_pvalue,
+        "intercept": model.params[0],
+        "hedge_ratio": model.params[1],
+        "std_errors": {"intercept": model.bse[0], "hedge_ratio": model.bse[1]},
+        "t_values": {"intercept": model.tvalues[0], "hedge_ratio": model.tvalues[1]},
+        "p_values": {"intercept": model.pvalues[0], "hedge_ratio": model.pvalues[1]},
+        "aic": model.aic,
+        "bic": model.bic,
+        "durbin_watson": durbin_watson(model.resid),
+        "condition_number": model.condition_number,
+    }
 
 
 def calculate_spread(y: pd.Series, x: pd.Series, hedge_ratio: float) -> pd.Series:
@@ -62,17 +80,11 @@ def run_adf_test(series: pd.Series) -> dict:
 
     Returns a dictionary with key test results.
     A low p-value (e.g., < 0.05) suggests the series is stationary.
+    Uses the NumPy implementation in adf.py (same results as statsmodels' adfuller).
+    Needs at least adf.MIN_OBSERVATIONS non-NaN values.
     """
     # Drop any NaN values before running the test
-    result = adfuller(series.dropna())
-
-    return {
-        "test_statistic": result[0],
-        "p_value": result[1],
-        "lags_used": result[2],
-        "num_observations": result[3],
-        "critical_values": result[4],
-    }
+    return adf_test(series.dropna().to_numpy())
 
 
 def calculate_rolling_correlation(y: pd.Series, x: pd.Series, window: int) -> pd.Series:
@@ -80,3 +92,206 @@ def calculate_rolling_correlation(y: pd.Series, x: pd.Series, window: int) -> pd
     Calculates the rolling correlation between two time series.
     """
     return x.rolling(window=window).corr(y)
+
+
+# --- Online (streaming) analytics ---
+
+
+class _WindowMoments:
+    """
+    Running means and co-moments of (x, y) pairs, updated with Welford's method.
+
+    With a `window` the oldest pair is removed (reverse Welford step) once the window
+    is full; without one the statistics are expanding. Every update is O(1).
+    """
+
+    def __init__(self, window: int = None):
+        self.window = window
+        self._values = deque()
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.c_xx = 0.0
+        self.c_yy = 0.0
+        self.c_xy = 0.0
+
+    def add(self, x: float, y: float):
+        if self.window is not None:
+            if len(self._values) == self.window:
+                self._remove(*self._values.popleft())
+            self._values.append((x, y))
+
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.c_xx += dx * (x - self.mean_x)
+        self.c_yy += dy * (y - self.mean_y)
+        self.c_xy += dx * (y - self.mean_y)
+
+    def _remove(self, x: float, y: float):
+        if self.n <= 1:
+            self.n = 0
+            self.mean_x = self.mean_y = 0.0
+            self.c_xx = self.c_yy = self.c_xy = 0.0
+            return
+
+        # Reverse of add(): (x - new mean) * (x - old mean) is what add() contributed.
+        self.n -= 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x -= dx / self.n
+        self.mean_y -= dy / self.n
+        self.c_xx -= dx * (x - self.mean_x)
+        self.c_yy -= dy * (y - self.mean_y)
+        self.c_xy -= dx * (y - self.mean_y)
+
+    @property
+    def ready(self) -> bool:
+        return self.n >= 2
+
+    def variances(self):
+        """(var_x, var_y, cov_xy) with ddof=1, matching pandas."""
+        d = self.n - 1
+        return self.c_xx / d, self.c_yy / d, self.c_xy / d
+
+
+class _DecayMoments:
+    """
+    Exponentially weighted means and co-moments of (x, y) pairs.
+    Equivalent to pandas `ewm(alpha=alpha, adjust=False)` with bias=True.
+    """
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.var_x = 0.0
+        self.var_y = 0.0
+        self.cov_xy = 0.0
+
+    def add(self, x: float, y: float):
+        self.n += 1
+        if self.n == 1:
+            self.mean_x, self.mean_y = x, y
+            return
+
+        a = self.alpha
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += a * dx
+        self.mean_y += a * dy
+        self.var_x = (1 - a) * (self.var_x + a * dx * dx)
+        self.var_y = (1 - a) * (self.var_y + a * dy * dy)
+        self.cov_xy = (1 - a) * (self.cov_xy + a * dx * dy)
+
+    @property
+    def ready(self) -> bool:
+        return self.n >= 2
+
+    def variances(self):
+        return self.var_x, self.var_y, self.cov_xy
+
+
+class OnlinePairAnalytics:
+    """
+    Streaming version of the pair analytics, fed one closed bar at a time.
+
+    It keeps the OLS sufficient statistics of Y on X (means and co-moments) for the
+    lookback, plus a separate set over `corr_window` for the rolling correlation.
+    The hedge ratio, intercept, spread mean/std and z-score are all derived from
+    those moments, so each update costs O(1) and nothing is ever refitted:
+
+        hedge_ratio = cov(x, y) / var(x)
+        spread_mean = mean(y) - hedge_ratio * mean(x)
+        spread_var  = var(y) - 2 * hedge_ratio * cov(x, y) + hedge_ratio^2 * var(x)
+
+    Modes:
+    - window=None: expanding lookback, matches the batch functions over all bars fed.
+    - window=N: sliding lookback of the last N bars.
+    - halflife=H: exponential decay (in bars) instead of a hard window.
+    """
+
+    def __init__(self, window: int = None, corr_window: int = 50, halflife: float = None):
+        if halflife is not None:
+            alpha = 1 - math.exp(math.log(0.5) / halflife)
+            self._moments = _DecayMoments(alpha)
+        else:
+            self._moments = _WindowMoments(window)
+        self._corr_moments = _WindowMoments(corr_window)
+        self.corr_window = corr_window
+        self.last_y = float("nan")
+        self.last_x = float("nan")
+
+    @property
+    def count(self) -> int:
+        """Number of bars currently contributing to the lookback statistics."""
+        return self._moments.n
+
+    def update(self, y: float, x: float) -> dict:
+        """Adds one closed bar (Y close, X close) and returns the new snapshot."""
+        self._moments.add(x, y)
+        self._corr_moments.add(x, y)
+        self.last_y, self.last_x = y, x
+        return self.snapshot()
+
+    def parameters(self) -> dict:
+        """Current hedge ratio, intercept and spread mean/std."""
+        nan = float("nan")
+        m = self._moments
+        if not m.ready:
+            return {"hedge_ratio": nan, "intercept": nan, "spread_mean": nan, "spread_std": nan}
+
+        var_x, var_y, cov_xy = m.variances()
+        if var_x <= 0:
+            # Same as calculate_hedge_ratio: no relationship can be estimated.
+            return {"hedge_ratio": nan, "intercept": nan, "spread_mean": nan, "spread_std": nan}
+
+        hedge_ratio = cov_xy / var_x
+        intercept = m.mean_y - hedge_ratio * m.mean_x
+        spread_var = var_y - 2 * hedge_ratio * cov_xy + hedge_ratio * hedge_ratio * var_x
+        return {
+            "hedge_ratio": hedge_ratio,
+            "intercept": intercept,
+            # With an intercept in the regression, the spread's mean is the intercept.
+            "spread_mean": intercept,
+            "spread_std": math.sqrt(max(spread_var, 0.0)),
+        }
+
+    def rolling_correlation(self) -> float:
+        m = self._corr_moments
+        if m.n < self.corr_window:
+            # pandas rolling() needs a full window before it reports a value.
+            return float("nan")
+        var_x, var_y, cov_xy = m.variances()
+        if var_x <= 0 or var_y <= 0:
+            return float("nan")
+        return cov_xy / math.sqrt(var_x * var_y)
+
+    def evaluate(self, y: float, x: float) -> dict:
+        """
+        Scores a price pair against the current parameters without updating them.
+        Used for the live, not yet closed, bar.
+        """
+        params = self.parameters()
+        spread = y - params["hedge_ratio"] * x
+        std = params["spread_std"]
+        if std > 0:
+            z_score = (spread - params["spread_mean"]) / std
+        elif std == 0:
+            z_score = 0.0
+        else:
+            z_score = float("nan")
+        return {
+            **params,
+            "spread": spread,
+            "z_score": z_score,
+            "regression_line_value": params["intercept"] + params["hedge_ratio"] * x,
+            "rolling_corr": self.rolling_correlation(),
+        }
+
+    def snapshot(self) -> dict:
+        """Everything evaluated at the last closed bar."""
+        return self.evaluate(self.last_y, self.last_x)
@@ -1,4 +1,7 @@
 import multiprocessing
+import shutil
+import tempfile
+import threading
 import uvicorn
 import time
 import os
@@ -9,15 +12,71 @@ sys.path.append(os.path.dirname(__file__))
 
 from database import create_tables
 from ingestor import run_ingestor
+from tick_ring import create_rings
+from metrics import ingest_metrics
+from control import ensure_control_key
+from config import (
+    SUPPORTED_SYMBOLS,
+    API_WORKERS,
+    API_READ_ONLY,
+    INGESTOR_RESTART_DELAY,
+    SHARED_CACHE_DIR_ENV,
+    SHARED_CACHE_ROOT,
+)
 
 
 def start_backend_server():
     """
     Starts the FastAPI Uvicorn server.
     'main:app' tells uvicorn where to find the FastAPI 'app' instance.
+    With API_WORKERS > 1 uvicorn runs that many worker processes, all read-only.
     """
-    print("Starting backend API server...")
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, log_level="info")
+    print(f"Starting backend API server with {API_WORKERS} worker(s)...")
+    uvicorn.run(
+        "main:app", host="127.0.0.1", port=8000, log_level="info", workers=API_WORKERS
+    )
+
+
+def start_ingestor() -> multiprocessing.Process:
+    # Not a daemon: with several ingest shards the ingestor starts child processes,
+    # which daemonic processes may not. It is stopped by stop_ingestor() instead.
+    process = multiprocessing.Process(target=run_ingestor, name="Ingestor")
+    process.start()
+    print(f"Ingestor process started with PID: {process.pid}")
+    return process
+
+
+def stop_ingestor(process: multiprocessing.Process, timeout: float = 10.0):
+    """
+    Sends SIGTERM to the ingestor, which stops its shards and flushes its writer,
+    and waits for it to exit (killing it after `timeout` seconds).
+    """
+    if process.is_alive():
+        process.terminate()
+        process.join(timeout)
+    if process.is_alive():
+        print("--- Ingestor did not stop in time; killing it ---")
+        process.kill()
+        process.join()
+
+
+def supervise_ingestor(ingestor: list, stop: threading.Event):
+    """
+    Restarts the ingestor, the only process writing to the database, whenever it
+    exits. `ingestor` holds the current process, so shutdown stops the latest
+    one. Runs until `stop` is set.
+    """
+    while not stop.wait(1.0):
+        process = ingestor[0]
+        if process.is_alive():
+            continue
+        print(
+            f"--- Ingestor exited with code {process.exitcode}. "
+            f"Restarting in {INGESTOR_RESTART_DELAY:.0f} seconds... ---"
+        )
+        if stop.wait(INGESTOR_RESTART_DELAY):
+            break
+        ingestor[0] = start_ingestor()
 
 
 if __name__ == "__main__":
@@ -28,14 +87,44 @@ if __name__ == "__main__":
     create_tables()
     print("Database setup complete.")
 
-    # --- 2. Start Data Ingestor Process ---
-    print("Step 2: Starting data ingestor in a background process...")
-    ingestor_process = multiprocessing.Process(target=run_ingestor, daemon=True)
-    ingestor_process.start()
-    print(f"Ingestor process started with PID: {ingestor_process.pid}")
+    # --- 2. Create Shared-Memory Tick Rings and Metrics ---
+    # Created here so they outlive ingestor restarts and are removed on shutdown.
+    print("Step 2: Creating shared-memory tick rings and metrics...")
+    tick_rings = create_rings(SUPPORTED_SYMBOLS)
+    ingest_metrics.create()
+
+    # --- 3. Start Data Ingestor Process ---
+    # The control channel secret is inherited by the ingestor and the API workers.
+    print("Step 3: Starting data ingestor in a background process...")
+    ensure_control_key()
+    ingestor = [start_ingestor()]
+    stop_supervisor = threading.Event()
+    supervisor = threading.Thread(
+        target=supervise_ingestor,
+        args=(ingestor, stop_supervisor),
+        name="IngestorSupervisor",
+        daemon=True,
+    )
+    supervisor.start()
 
-    # --- 3. Start API Server ---
-    print("Step 3: Starting main backend API server...")
-    start_backend_server()
+    # --- 4. Start API Server ---
+    # Workers share computed analytics through a directory only this run can write
+    # to (they unpickle what is in it); it is removed on shutdown.
+    shared_cache_dir = None
+    if API_READ_ONLY:
+        shared_cache_dir = tempfile.mkdtemp(prefix="quantstream-cache-", dir=SHARED_CACHE_ROOT)
+        os.environ[SHARED_CACHE_DIR_ENV] = shared_cache_dir
+    print("Step 4: Starting main backend API server...")
+    try:
+        start_backend_server()
+    finally:
+        if shared_cache_dir is not None:
+            shutil.rmtree(shared_cache_dir, ignore_errors=True)
+        stop_supervisor.set()
+        supervisor.join()
+        stop_ingestor(ingestor[0])
+        for ring in tick_rings.values():
+            ring.close()
+        ingest_metrics.close()
 
     print("--- Application has shut down. ---")
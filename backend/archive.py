@@ -0,0 +1,279 @@
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from config import ARCHIVE_AGE_HOURS, ARCHIVE_INTERVAL
+from tick_store import DELETE_RANGE_SQL, RANGE_TICKS_SQL, list_symbols
+
+
+# Aged ticks live next to the database, one directory per symbol and UTC day:
+#   archive/<SYMBOL>/<YYYY-MM-DD>/{timestamp,price,quantity,trade_id}.npy
+# trade_id is only read when a day is rewritten, to merge without duplicates; days
+# archived before it was kept lack the file.
+ARCHIVE_DIR_NAME = "archive"
+
+# 1s bars of archived ticks are dropped from SQLite and re-aggregated from the archive.
+ARCHIVED_TIMEFRAME = "1s"
+
+COLUMNS = (("timestamp", np.int64), ("price", np.float64), ("quantity", np.float64))
+TRADE_ID_FILE = "trade_id.npy"
+DAY_MS = 86_400_000
+
+
+def _day_name(day_start_ms: int) -> str:
+    return datetime.fromtimestamp(day_start_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _day_start(day_name: str) -> int:
+    day = datetime.strptime(day_name, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(day.timestamp() * 1000)
+
+
+def archive_dir() -> str:
+    """The archive directory of the current database (QUANTSTREAM_DB_PATH moves both)."""
+    import database  # database imports bars, which imports this module
+
+    return os.path.join(os.path.dirname(database.DB_FILE_PATH), ARCHIVE_DIR_NAME)
+
+
+def _day_dir(symbol: str, day_start_ms: int) -> str:
+    return os.path.join(archive_dir(), symbol, _day_name(day_start_ms))
+
+
+# --- Reading ---
+
+
+def load_day(symbol: str, day_start_ms: int):
+    """
+    Memory-maps one archived day of a symbol. Returns (timestamps, prices,
+    quantities) as read-only arrays backed by the files, or None if not archived.
+    """
+    day_dir = _day_dir(symbol, day_start_ms)
+    if not os.path.isdir(day_dir):
+        return None
+    return tuple(
+        np.load(os.path.join(day_dir, f"{name}.npy"), mmap_mode="r")
+        for name, _ in COLUMNS
+    )
+
+
+def archived_days(symbol: str) -> list:
+    """Start (ms) of every archived day of a symbol, oldest first."""
+    symbol_dir = os.path.join(archive_dir(), symbol)
+    if not os.path.isdir(symbol_dir):
+        return []
+    days = []
+    for name in os.listdir(symbol_dir):
+        try:
+            days.append(_day_start(name))
+        except ValueError:
+            continue  # temporary directories of an interrupted write
+    return sorted(days)
+
+
+def read_archived_ticks(symbol: str, start_ms: int, end_ms: int):
+    """
+    Archived ticks of a symbol with start_ms <= timestamp < end_ms, as
+    (timestamps, prices, quantities). A range inside one day is returned as
+    slices of the memory-mapped files without copying.
+    """
+    parts = []
+    for day_start in archived_days(symbol):
+        if day_start + DAY_MS <= start_ms or day_start >= end_ms:
+            continue
+        day = load_day(symbol, day_start)
+        if day is None:
+            continue
+        timestamps = day[0]
+        lo = np.searchsorted(timestamps, start_ms, side="left")
+        hi = np.searchsorted(timestamps, end_ms, side="left")
+        if hi > lo:
+            parts.append(tuple(column[lo:hi] for column in day))
+
+    if not parts:
+        return tuple(np.empty(0, dtype=dtype) for _, dtype in COLUMNS)
+    if len(parts) == 1:
+        return parts[0]
+    return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+
+def archived_bars(symbol: str, bar_ms: int, start_ms: int, end_ms: int) -> pd.DataFrame:
+    """
+    Aggregates archived ticks into OHLCV bars of `bar_ms` with one vectorized pass
+    over the memory-mapped columns. Same layout as bars.load_bars().
+    """
+    timestamps, prices, quantities = read_archived_ticks(symbol, start_ms, end_ms)
+    if len(timestamps) == 0:
+        empty = pd.DataFrame(columns=["open", "high", "low", "close", "volume"], dtype="float64")
+        empty.index = pd.DatetimeIndex([], tz="UTC", name="timestamp")
+        return empty
+
+    buckets = timestamps - timestamps % bar_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)]
+
+    df = pd.DataFrame(
+        {
+            "open": prices[starts],
+            "high": np.maximum.reduceat(prices, starts),
+            "low": np.minimum.reduceat(prices, starts),
+            "close": prices[ends - 1],
+            "volume": np.add.reduceat(quantities, starts),
+        },
+        index=pd.to_datetime(buckets[starts], unit="ms", utc=True),
+    )
+    df.index.name = "timestamp"
+    return df
+
+
+# --- Writing (ingestor only) ---
+
+
+def _write_day(symbol: str, day_start_ms: int, columns: tuple, trade_ids: np.ndarray):
+    """
+    Merges new ticks into an archived day and rewrites its files. Ticks already in
+    the day (same timestamp and trade id) are skipped, so writing the same ticks
+    again, as after a crash before they were deleted from SQLite, changes nothing.
+    The new day is written to a temporary directory and swapped in, so readers
+    never see a partially written day.
+    """
+    day_dir = _day_dir(symbol, day_start_ms)
+    old_dir = f"{day_dir}.old"
+    if not os.path.isdir(day_dir) and os.path.isdir(old_dir):
+        # Interrupted between the two renames below.
+        os.replace(old_dir, day_dir)
+
+    existing = load_day(symbol, day_start_ms)
+    if existing is not None:
+        ids_path = os.path.join(day_dir, TRADE_ID_FILE)
+        existing_ids = (
+            np.load(ids_path) if os.path.exists(ids_path) else np.full(len(existing[0]), -1)
+        )
+        columns = tuple(np.concatenate((old, new)) for old, new in zip(existing, columns))
+        trade_ids = np.concatenate((existing_ids, trade_ids))
+        del existing
+    # Trade ids follow arrival order within a millisecond. lexsort is stable, so of
+    # two equal ticks the archived one comes first and is the one kept.
+    order = np.lexsort((trade_ids, columns[0]))
+    timestamps, sorted_ids = columns[0][order], trade_ids[order]
+    repeated = np.r_[
+        False, (timestamps[1:] == timestamps[:-1]) & (sorted_ids[1:] == sorted_ids[:-1])
+    ]
+    order = order[~repeated]
+
+    tmp_dir = f"{day_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for (name, dtype), values in zip(COLUMNS, columns):
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.asarray(values, dtype=dtype)[order])
+    np.save(os.path.join(tmp_dir, TRADE_ID_FILE), np.asarray(trade_ids, dtype=np.int64)[order])
+
+    if os.path.isdir(day_dir):
+        os.replace(day_dir, old_dir)
+    os.replace(tmp_dir, day_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def archive_old_ticks(conn, cutoff_ms: int) -> int:
+    """
+    Moves every tick older than `cutoff_ms` out of SQLite into the archive, one
+    symbol and UTC day at a time, and drops the matching 1s bars (they are rebuilt
+    from the archive on demand). Files are written before the rows are deleted, so
+    a crash can only leave a tick in both places, never in neither; the next run
+    merges it into the archive again without duplicating it.
+    """
+    cutoff_ms -= cutoff_ms % 1000
+    moved = 0
+    for symbol_id, symbol in list_symbols(conn):
+        oldest = conn.execute(
+            "SELECT MIN(timestamp) FROM ticks WHERE symbol_id = ?", (symbol_id,)
+        ).fetchone()[0]
+        if oldest is None or oldest >= cutoff_ms:
+            continue
+
+        day_start = oldest - oldest % DAY_MS
+        while day_start < cutoff_ms:
+            day_end = min(day_start + DAY_MS, cutoff_ms)
+            rows = conn.execute(RANGE_TICKS_SQL, (symbol_id, day_start, day_end)).fetchall()
+            if rows:
+                # Columns: timestamp, trade_id, price, quantity (ms and trade ids
+                # fit a float64 exactly).
+                values = np.array(rows, dtype=np.float64)
+                _write_day(
+                    symbol,
+                    day_start,
+                    (values[:, 0].astype(np.int64), values[:, 2], values[:, 3]),
+                    values[:, 1].astype(np.int64),
+                )
+                with conn:
+                    conn.execute(DELETE_RANGE_SQL, (symbol_id, day_start, day_end))
+                moved += len(rows)
+            day_start += DAY_MS
+
+    with conn:
+        conn.execute(
+            "DELETE FROM ohlc_bars WHERE timeframe = ? AND bucket < ?",
+            (ARCHIVED_TIMEFRAME, cutoff_ms),
+        )
+    # Give the space back: without a checkpoint the WAL keeps every deleted page.
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return moved
+
+
+class ArchiveWorker:
+    """
+    Background thread of the ingestor that periodically tiers ticks older than
+    `age_hours` out of the hot database.
+    """
+
+    def __init__(
+        self,
+        connect,
+        age_hours: float = ARCHIVE_AGE_HOURS,
+        interval: float = ARCHIVE_INTERVAL,
+    ):
+        self._connect = connect
+        self.age_ms = int(age_hours * 3_600_000)
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ArchiveWorker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self) -> int:
+        cutoff_ms = int(time.time() * 1000) - self.age_ms
+        conn = self._connect()
+        try:
+            started = time.perf_counter()
+            moved = archive_old_ticks(conn, cutoff_ms)
+            if moved:
+                print(
+                    f"--- Archived {moved} ticks older than {_day_name(cutoff_ms)} "
+                    f"in {time.perf_counter() - started:.1f}s ---"
+                )
+            return moved
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"--- Archive job error: {e} ---")
+            self._stop_event.wait(self.interval)
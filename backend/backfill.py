@@ -0,0 +1,302 @@
+# Bulk import of Binance trade dumps (data.binance.vision) from local disk, so a
+# fresh deployment has history before the live feed has caught up:
+#
+#   python backfill.py BTCUSDT-trades-2024-05-01.zip ETHUSDT-trades-2024-05-01.zip
+#   python backfill.py dumps/          # every .csv / .zip file in a directory
+#
+# trades and aggTrades files (spot or futures, with or without a header row, plain
+# or zipped) are recognised by name and columns; the symbol is the part of the file
+# name before the first "-" unless --symbol is given.
+#
+# Files are parsed BACKFILL_CHUNK_ROWS lines at a time and staged in an unindexed
+# temporary table. Every BACKFILL_TRANSACTION_ROWS rows the stage is merged into
+# `ticks` with one INSERT OR IGNORE sorted by the primary key, so ticks that are
+# already stored (same symbol, time and trade id) are skipped and the clustered
+# table is filled in key order. The OHLC bars are maintained once at the end, for
+# the spans that received ticks. Ticks on days already moved to the tick archive
+# are skipped: only the ingestor writes the archive, and days archived before it
+# kept trade ids could not be deduplicated against.
+
+import argparse
+import os
+import time
+import zipfile
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+import database
+from archive import DAY_MS, archived_days
+from bars import rebuild_bar_span, set_backfill_time
+from config import BACKFILL_BAR_SPAN_MS, BACKFILL_CHUNK_ROWS, BACKFILL_TRANSACTION_ROWS
+from tick_store import SymbolIds
+
+# Positions of the trade id, price, quantity and time columns of each dump kind.
+# aggTrades are stored under their first trade id, the id the live @trade stream
+# reports for the first trade of the aggregate.
+COLUMNS = {
+    "trades": (0, 1, 2, 4),
+    "aggTrades": (3, 1, 2, 5),
+}
+
+# Spot dumps from 2025 on have microsecond timestamps; anything above this is one.
+MAX_MS_TIMESTAMP = 10**14
+
+STAGE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS backfill_stage (
+        symbol_id INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL,
+        trade_id INTEGER NOT NULL,
+        price REAL NOT NULL,
+        quantity REAL NOT NULL
+    )
+"""
+
+MERGE_SQL = """
+    INSERT OR IGNORE INTO ticks (symbol_id, timestamp, trade_id, price, quantity)
+    SELECT symbol_id, timestamp, trade_id, price, quantity FROM temp.backfill_stage
+    ORDER BY symbol_id, timestamp, trade_id
+"""
+
+
+# --- Dump files ---
+
+
+def dump_sources(paths) -> list:
+    """
+    (name, open) for every CSV in `paths`: plain .csv files, every .csv inside a
+    .zip, and the .csv / .zip files of a directory (sorted by name).
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith((".csv", ".zip"))
+            )
+        else:
+            files.append(path)
+
+    sources = []
+    for path in files:
+        if path.endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                members = [m for m in archive.namelist() if m.endswith(".csv")]
+            sources.extend(
+                (member, lambda path=path, member=member: _open_member(path, member))
+                for member in members
+            )
+        else:
+            sources.append((os.path.basename(path), lambda path=path: open(path, "rb")))
+    return sources
+
+
+def _open_member(path: str, member: str):
+    archive = zipfile.ZipFile(path)
+    stream = archive.open(member)
+    stream.close = lambda close=stream.close: (close(), archive.close())
+    return stream
+
+
+def sniff(name: str, first_line: str, kind: str = None) -> tuple:
+    """
+    (kind, has_header) of a dump from its name and first line. Without a header,
+    8 columns are spot aggTrades; 6 or 7 are trades.
+    """
+    fields = [field.strip() for field in first_line.split(",")]
+    has_header = not fields[0].isdigit()
+    if kind is None:
+        if "aggTrades" in name:
+            kind = "aggTrades"
+        elif "trades" in name:
+            kind = "trades"
+        elif has_header:
+            kind = "aggTrades" if "transact_time" in fields else "trades"
+        else:
+            kind = "aggTrades" if len(fields) == 8 else "trades"
+    return kind, has_header
+
+
+def read_dump(open_source, kind: str, has_header: bool, chunk_rows: int = BACKFILL_CHUNK_ROWS):
+    """
+    Streams a dump as (trade_ids, timestamps_ms, prices, quantities) array chunks,
+    parsed by the pandas C reader.
+    """
+    id_col, price_col, quantity_col, time_col = COLUMNS[kind]
+    with open_source() as stream:
+        reader = pd.read_csv(
+            stream,
+            header=None,
+            skiprows=1 if has_header else 0,
+            usecols=[id_col, price_col, quantity_col, time_col],
+            dtype={id_col: np.int64, price_col: np.float64, quantity_col: np.float64, time_col: np.int64},
+            chunksize=chunk_rows,
+        )
+        for chunk in reader:
+            timestamps = chunk[time_col].to_numpy()
+            if len(timestamps) and timestamps.max() > MAX_MS_TIMESTAMP:
+                timestamps = timestamps // 1000
+            yield (
+                chunk[id_col].to_numpy(),
+                timestamps,
+                chunk[price_col].to_numpy(),
+                chunk[quantity_col].to_numpy(),
+            )
+
+
+# --- Loading ---
+
+
+class Backfill:
+    """
+    Stages parsed ticks and merges them into `ticks` in large sorted transactions.
+    Remembers which spans of every symbol received ticks, for rebuild_bars().
+    """
+
+    def __init__(self, conn, transaction_rows: int = BACKFILL_TRANSACTION_ROWS):
+        self.conn = conn
+        self.transaction_rows = transaction_rows
+        self._symbol_ids = SymbolIds()
+        self._archived = {}
+        self._spans = {}
+        self._staged = 0
+
+        self.rows_read = 0
+        self.rows_inserted = 0
+        self.rows_archived = 0
+        conn.execute(STAGE_SQL)
+        conn.commit()
+
+    def add(self, symbol: str, trade_ids, timestamps, prices, quantities):
+        """Stages one chunk of a symbol's ticks."""
+        self.rows_read += len(timestamps)
+        archived = self._archived_days(symbol)
+        if len(archived):
+            keep = ~np.isin(timestamps - timestamps % DAY_MS, archived)
+            self.rows_archived += len(keep) - int(keep.sum())
+            trade_ids, timestamps, prices, quantities = (
+                column[keep] for column in (trade_ids, timestamps, prices, quantities)
+            )
+        if len(timestamps) == 0:
+            return
+
+        symbol_id = self._symbol_ids.get(self.conn, symbol)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO temp.backfill_stage VALUES (?, ?, ?, ?, ?)",
+                zip(
+                    repeat(symbol_id),
+                    timestamps.tolist(),
+                    trade_ids.tolist(),
+                    prices.tolist(),
+                    quantities.tolist(),
+                ),
+            )
+        spans = self._spans.setdefault((symbol_id, symbol), set())
+        spans.update(np.unique(timestamps - timestamps % BACKFILL_BAR_SPAN_MS).tolist())
+
+        self._staged += len(timestamps)
+        if self._staged >= self.transaction_rows:
+            self.merge()
+
+    def merge(self):
+        """Moves the staged rows into `ticks` in one transaction."""
+        if not self._staged:
+            return
+        with self.conn:
+            self.rows_inserted += self.conn.execute(MERGE_SQL).rowcount
+            self.conn.execute("DELETE FROM temp.backfill_stage")
+        self._staged = 0
+
+    def rebuild_bars(self) -> int:
+        """Rebuilds the bars of every span that received ticks. Returns ticks aggregated."""
+        self.merge()
+        aggregated = 0
+        for (symbol_id, symbol), spans in self._spans.items():
+            for start in sorted(spans):
+                aggregated += rebuild_bar_span(
+                    self.conn, symbol_id, symbol, start, start + BACKFILL_BAR_SPAN_MS
+                )
+        return aggregated
+
+    def _archived_days(self, symbol: str) -> np.ndarray:
+        days = self._archived.get(symbol)
+        if days is None:
+            days = self._archived[symbol] = np.array(archived_days(symbol), dtype=np.int64)
+        return days
+
+
+def run_backfill(paths, symbol: str = None, kind: str = None, rebuild: bool = True) -> dict:
+    """Imports every dump in `paths` and rebuilds the affected bars. Returns the totals."""
+    database.create_tables()
+    conn = database.get_db_connection()
+    conn.row_factory = None  # plain tuples for the bar rebuild
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")
+    backfill = Backfill(conn)
+
+    started = time.perf_counter()
+    try:
+        for name, open_source in dump_sources(paths):
+            with open_source() as stream:
+                first_line = stream.readline().decode(errors="replace")
+            if not first_line.strip():
+                continue
+            dump_kind, has_header = sniff(name, first_line, kind)
+            dump_symbol = symbol or os.path.basename(name).split("-", 1)[0].upper()
+
+            file_started, file_read = time.perf_counter(), backfill.rows_read
+            for chunk in read_dump(open_source, dump_kind, has_header):
+                backfill.add(dump_symbol, *chunk)
+            rows = backfill.rows_read - file_read
+            elapsed = time.perf_counter() - file_started
+            print(
+                f"--- Backfill: {name} ({dump_symbol} {dump_kind}): {rows:,} rows "
+                f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s) ---"
+            )
+
+        backfill.merge()
+        load_s = time.perf_counter() - started
+
+        bars_started = time.perf_counter()
+        if rebuild:
+            backfill.rebuild_bars()
+        bars_s = time.perf_counter() - bars_started
+
+        # Cached chart results of the API are keyed on this (see get_backfill_time).
+        with conn:
+            set_backfill_time(conn, int(time.time() * 1000))
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+    total_s = time.perf_counter() - started
+    return {
+        "rows_read": backfill.rows_read,
+        "rows_inserted": backfill.rows_inserted,
+        "rows_duplicate": backfill.rows_read - backfill.rows_archived - backfill.rows_inserted,
+        "rows_archived": backfill.rows_archived,
+        "load_s": load_s,
+        "bars_s": bars_s,
+        "rows_per_s": backfill.rows_read / max(total_s, 1e-9),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Imports Binance trade dumps into the tick store.")
+    parser.add_argument("paths", nargs="+", help=".csv / .zip files or directories")
+    parser.add_argument("--symbol", help="symbol of every file (default: from the file name)")
+    parser.add_argument("--kind", choices=sorted(COLUMNS), help="dump format (default: detected)")
+    parser.add_argument("--no-bars", action="store_true", help="skip rebuilding the bars")
+    args = parser.parse_args()
+
+    totals = run_backfill(args.paths, args.symbol, args.kind, rebuild=not args.no_bars)
+    print(
+        f"--- Backfill finished: {totals['rows_read']:,} rows read, "
+        f"{totals['rows_inserted']:,} new, {totals['rows_duplicate']:,} already stored, "
+        f"{totals['rows_archived']:,} on archived days; load {totals['load_s']:.1f}s, "
+        f"bars {totals['bars_s']:.1f}s ({totals['rows_per_s']:,.0f} rows/s overall) ---"
+    )
@@ -0,0 +1,293 @@
+# Backtests of a z-score mean-reversion strategy on the spread y - b*x. At the close
+# of every bar, the z-score of the rolling fit over the last `window` bars decides
+# the position held until the next close:
+#
+#   - short the spread (-quantity Y, +b*quantity X) when z crosses above +entry_z,
+#     long when it crosses below -entry_z, as long as |z| is still below stop_z;
+#   - close a short once z is back at +exit_z or below (a long at -exit_z or above),
+#     so exit_z = 0 closes on crossing the mean, or when |z| reaches stop_z. A
+#     stopped-out position is only re-opened after z has crossed the entry level again.
+#
+# The hedge quantity is fixed with the hedge ratio of the bar the position opened
+# on. Fills are at the bar close; every fill pays `fee_rate` on its notional plus
+# `impact_rate` scaled by the fill's share of the bar's traded volume (capped at 1).
+# A reversal is filled as a close and an open.
+
+import math
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from bars import combine_pair_bars, load_pair_bars
+from config import BACKTEST_CHUNK_ELEMENTS, BACKTEST_MAX_BARS, TIMEFRAME_MS
+from kernels import rolling_pair_kernel
+from scanner import WORKERS, get_pool
+
+
+# --- 1. Data ---
+
+
+def load_pair_prices(
+    conn, y_symbol: str, x_symbol: str, timeframe: str, start_ms=None, end_ms=None,
+    max_bars: int = BACKTEST_MAX_BARS,
+) -> pd.DataFrame:
+    """
+    Closes and volumes of both symbols (columns y, x, y_volume, x_volume) over the
+    combined bar times of [start_ms, end_ms], capped to the last `max_bars` periods.
+    Periods before both symbols have traded are dropped.
+    """
+    loaded = load_pair_bars(conn, y_symbol, x_symbol, timeframe, max_bars, start_ms, end_ms)
+    if loaded is None:
+        return pd.DataFrame(columns=["y", "x", "y_volume", "x_volume"], dtype="float64")
+    combined = combine_pair_bars(y_symbol, loaded[0], x_symbol, loaded[1])
+    prices = pd.DataFrame(
+        {
+            "y": combined[(y_symbol, "close")],
+            "x": combined[(x_symbol, "close")],
+            "y_volume": combined[(y_symbol, "volume")],
+            "x_volume": combined[(x_symbol, "volume")],
+        }
+    )
+    return prices.dropna()
+
+
+def parameter_grid(windows, entry_z, exit_z, stop_z) -> tuple:
+    """
+    The Cartesian product of the parameter lists, as (window, entry, exit, stop)
+    tuples. A stop of None never triggers. Combinations that do not satisfy
+    0 <= exit < entry < stop are left out; returns (grid, number left out).
+    """
+    grid, skipped = [], 0
+    for window, entry, exit_, stop in product(
+        sorted(set(windows)), sorted(set(entry_z)), sorted(set(exit_z)),
+        sorted(set(stop_z), key=lambda s: math.inf if s is None else s),
+    ):
+        if 0 <= exit_ < entry < (math.inf if stop is None else stop):
+            grid.append((window, entry, exit_, stop))
+        else:
+            skipped += 1
+    return grid, skipped
+
+
+# --- 2. Vectorized simulation ---
+
+
+def _shift_in_rows(values: np.ndarray, row_start: np.ndarray) -> np.ndarray:
+    """The previous entry of a flat per-row sequence, 0 at the first entry of each row."""
+    previous = np.empty_like(values)
+    previous[0] = 0
+    previous[1:] = values[:-1]
+    previous[row_start] = 0
+    return previous
+
+
+def _row_totals(cumulative: np.ndarray, row_start: np.ndarray) -> np.ndarray:
+    """For a running total over flat per-row sequences, the total of all earlier rows."""
+    before = np.zeros(len(row_start))
+    before[1:] = cumulative[row_start[1:] - 1]
+    return np.repeat(before, np.diff(row_start, append=len(cumulative)))
+
+
+def simulate_thresholds(
+    y, x, y_volume, x_volume, z_score, hedge_ratio, entry, exit_, stop,
+    quantity: float, fee_rate: float, impact_rate: float,
+) -> dict:
+    """
+    Runs the strategy for m threshold sets at once on one z-score series. `entry`,
+    `exit_` and `stop` are arrays of shape (m,); the signals and the equity curves
+    are (2m, n) arrays over the n bars (one row per side), with no loop over bars.
+
+    Only the bars where a position actually changes are handled one by one (as a
+    flat array over all sets): the fills and their costs are computed there, and
+    the holdings and cash, constant in between, are repeated over the bars. Returns
+    the (m, n) equity curves and the per-set totals.
+    """
+    m, n = len(entry), len(z_score)
+
+    # Rows 0..m-1 trade the long side of every set and rows m..2m-1 the short side,
+    # on the z-score seen from that side (-z for the short side): a side opens when
+    # its z crosses below -entry (above -stop) and closes once it is back at -exit
+    # or beyond, or at the stop. The position of the set is the sum of its sides.
+    side = np.repeat([1.0, -1.0], m)
+    z = side[:, np.newaxis] * z_score
+    entry, exit_, stop = (np.tile(t, 2)[:, np.newaxis] for t in (entry, exit_, stop))
+
+    # Events: 1 when the side opens, 0 when it closes; between events its state is
+    # kept. A side is never open on a bar where its exit condition holds, so only
+    # the first bar of every run of that condition can close it. NaN z-scores
+    # compare False everywhere.
+    opens = z < -entry
+    opens[:, 1:] &= z[:, :-1] >= -entry
+    opens[:, 0] = False
+    opens &= z > -stop
+    closes = (z >= -exit_) | (z <= -stop)
+    has_event = opens.copy()
+    has_event[:, 1:] |= closes[:, 1:] & ~closes[:, :-1]
+    has_event[:, 0] = True
+    events = np.flatnonzero(has_event)
+    values = opens.ravel()[events].astype(np.float64)
+
+    # The events that change the state of a side, with the bar they happen on.
+    # Every row starts with one, so the position segments tile each row.
+    first_in_row = events % n == 0
+    moved = values != _shift_in_rows(values, first_in_row)
+    moved[first_in_row] = True
+    changes = events[moved]
+    rows, bars = np.divmod(changes, n)
+    position = values[moved] * side[rows]
+    row_start = np.flatnonzero(first_in_row[moved])
+    lengths = np.empty_like(bars)
+    lengths[:-1] = bars[1:] - bars[:-1]
+    lengths[row_start[1:] - 1] = n - bars[row_start[1:] - 1]
+    lengths[-1] = n - bars[-1]
+
+    # Holdings of each leg from every change on; the X leg keeps the hedge ratio of
+    # the bar the position was opened on. Fills are at the bar close.
+    held_y = position * quantity
+    held_x = np.where(position != 0, -held_y * hedge_ratio[bars], 0.0)
+    filled_y = held_y - _shift_in_rows(held_y, row_start)
+    filled_x = held_x - _shift_in_rows(held_x, row_start)
+    costs = _fill_costs(filled_y, y[bars], y_volume[bars], fee_rate, impact_rate)
+    costs += _fill_costs(filled_x, x[bars], x_volume[bars], fee_rate, impact_rate)
+    cash = -np.cumsum(filled_y * y[bars] + filled_x * x[bars] + costs)
+    cash -= _row_totals(cash, row_start)
+
+    # Marked to market at every close: holdings * price + cash, each constant over
+    # a segment.
+    equity = np.repeat(held_y, lengths).reshape(2 * m, n) * y
+    equity += np.repeat(held_x, lengths).reshape(2 * m, n) * x
+    equity += np.repeat(cash, lengths).reshape(2 * m, n)
+
+    def per_set(weights):
+        totals = np.bincount(rows, weights, minlength=2 * m)
+        return totals[:m] + totals[m:]
+
+    holding = position != 0
+    total_costs = per_set(costs)
+    equity = equity[:m] + equity[m:]
+    return {
+        "equity": equity,
+        "gross_pnl": equity[:, -1] + total_costs,
+        "costs": total_costs,
+        "trades": per_set(holding).astype(np.int64),
+        "exposure": per_set(holding * lengths) / n,
+    }
+
+
+def _fill_costs(filled, price, volume, fee_rate, impact_rate) -> np.ndarray:
+    """Fee plus volume-scaled impact of fills, given the fill prices and bar volumes."""
+    size = np.abs(filled)
+    notional = size * price
+    if not impact_rate:
+        return notional * fee_rate
+    with np.errstate(divide="ignore", invalid="ignore"):
+        participation = np.where(volume > 0, np.minimum(size / volume, 1.0), 1.0)
+    return notional * (fee_rate + impact_rate * participation)
+
+
+def performance(equity: np.ndarray, periods_per_year: float) -> dict:
+    """Total PnL, annualised Sharpe ratio (of the per-bar PnL) and maximum drawdown of (m, n) equity curves."""
+    net = np.diff(equity, axis=1, prepend=0.0)
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, 0.0, out=peak)
+    std = net.std(axis=1, ddof=1) if net.shape[1] > 1 else np.full(len(net), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, net.mean(axis=1) / std * math.sqrt(periods_per_year), np.nan)
+    return {
+        "pnl": equity[:, -1],
+        "sharpe": sharpe,
+        "max_drawdown": (peak - equity).max(axis=1),
+    }
+
+
+# --- 3. Sweeps in worker processes ---
+
+
+def _run_window(task: tuple) -> list:
+    """
+    Worker: every threshold set of one lookback window. The rolling fit is
+    computed once and the threshold sets are simulated in chunks of at most
+    BACKTEST_CHUNK_ELEMENTS elements (bars x two sides per set).
+    """
+    arrays, window, thresholds, costs, periods_per_year = task
+    y, x, y_volume, x_volume = arrays
+    kernel = rolling_pair_kernel(y, x, window)
+
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    chunk = max(1, BACKTEST_CHUNK_ELEMENTS // max(2 * len(y), 1))
+    results = []
+    for start in range(0, len(thresholds), chunk):
+        entry, exit_, stop = thresholds[start : start + chunk].T
+        simulated = simulate_thresholds(
+            y, x, y_volume, x_volume, kernel["z_score"], kernel["hedge_ratio"],
+            entry, exit_, stop, *costs,
+        )
+        stats = performance(simulated.pop("equity"), periods_per_year)
+        stats.update(simulated)
+        for k in range(len(entry)):
+            results.append({name: values[k].item() for name, values in stats.items()})
+    return results
+
+
+def run_sweep(
+    prices: pd.DataFrame,
+    grid: list,
+    timeframe: str,
+    quantity: float = 1.0,
+    fee_rate: float = 0.0,
+    impact_rate: float = 0.0,
+    pool=None,
+) -> list:
+    """
+    Backtests every (window, entry, exit, stop) of `grid` on `prices` (see
+    load_pair_prices). Each task is one window's threshold sets, or a share of
+    them when there are fewer windows than workers; the tasks run in the
+    scanner's process pool. Returns one result row per grid point, in grid order.
+    """
+    if not grid:
+        return []
+    arrays = tuple(
+        np.ascontiguousarray(prices[name].to_numpy(dtype=np.float64))
+        for name in ("y", "x", "y_volume", "x_volume")
+    )
+    periods_per_year = 365 * 24 * 3600 * 1000 / TIMEFRAME_MS[timeframe]
+    costs = (quantity, fee_rate, impact_rate)
+
+    by_window = {}
+    for index, (window, entry, exit_, stop) in enumerate(grid):
+        threshold = (entry, exit_, math.inf if stop is None else stop)
+        by_window.setdefault(window, []).append((index, threshold))
+
+    shares = max(1, -(-WORKERS // len(by_window)))
+    tasks, order = [], []
+    for window, entries in by_window.items():
+        for share in range(shares):
+            part = entries[share::shares]
+            if part:
+                tasks.append((arrays, window, [t for _, t in part], costs, periods_per_year))
+                order.append([i for i, _ in part])
+
+    if len(tasks) == 1:
+        outputs = [_run_window(tasks[0])]
+    else:
+        outputs = (pool or get_pool()).map(_run_window, tasks)
+
+    results = [None] * len(grid)
+    for indices, rows in zip(order, outputs):
+        for index, row in zip(indices, rows):
+            window, entry, exit_, stop = grid[index]
+            results[index] = {
+                "window": window,
+                "entry_z": entry,
+                "exit_z": exit_,
+                "stop_z": stop,
+                **{name: _value(value) for name, value in row.items()},
+            }
+    return results
+
+
+def _value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
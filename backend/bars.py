@@ -0,0 +1,369 @@
+import sqlite3
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from archive import ARCHIVED_TIMEFRAME, archived_bars
+from config import TIMEFRAME_MS
+from tick_store import RANGE_TICKS_SQL, list_symbols
+
+
+# Upsert for one pre-aggregated bar. A late tick only moves `open` if it is older than
+# the bar's first trade and only moves `close` if it is at least as new as the last one,
+# so the bar ends up identical to aggregating all of its ticks in timestamp order.
+UPSERT_BAR_SQL = """
+    INSERT INTO ohlc_bars (
+        symbol, timeframe, bucket, open, high, low, close,
+        volume, trade_count, first_ts, last_ts
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (symbol, timeframe, bucket) DO UPDATE SET
+        open = CASE WHEN excluded.first_ts < ohlc_bars.first_ts
+                    THEN excluded.open ELSE ohlc_bars.open END,
+        high = MAX(ohlc_bars.high, excluded.high),
+        low = MIN(ohlc_bars.low, excluded.low),
+        close = CASE WHEN excluded.last_ts >= ohlc_bars.last_ts
+                     THEN excluded.close ELSE ohlc_bars.close END,
+        volume = ohlc_bars.volume + excluded.volume,
+        trade_count = ohlc_bars.trade_count + excluded.trade_count,
+        first_ts = MIN(ohlc_bars.first_ts, excluded.first_ts),
+        last_ts = MAX(ohlc_bars.last_ts, excluded.last_ts)
+"""
+
+
+def aggregate_ticks(ticks) -> list:
+    """
+    Rolls a batch of (timestamp, symbol, price, quantity, trade_id) ticks into one partial bar
+    per (symbol, timeframe, bucket), for every timeframe in TIMEFRAME_MS.
+
+    The batch does not need to be sorted. Returns rows ready for UPSERT_BAR_SQL.
+    """
+    bars = {}
+    for timestamp, symbol, price, quantity, _ in ticks:
+        for timeframe, bar_ms in TIMEFRAME_MS.items():
+            key = (symbol, timeframe, timestamp - timestamp % bar_ms)
+            bar = bars.get(key)
+            if bar is None:
+                # [open, high, low, close, volume, trade_count, first_ts, last_ts]
+                bars[key] = [price, price, price, price, quantity, 1, timestamp, timestamp]
+                continue
+
+            if timestamp < bar[6]:
+                bar[0] = price
+                bar[6] = timestamp
+            if timestamp >= bar[7]:
+                bar[3] = price
+                bar[7] = timestamp
+            if price > bar[1]:
+                bar[1] = price
+            if price < bar[2]:
+                bar[2] = price
+            bar[4] += quantity
+            bar[5] += 1
+
+    return [key + tuple(bar) for key, bar in bars.items()]
+
+
+def upsert_bars(conn, ticks):
+    """
+    Merges a batch of ticks into the persisted bars.
+    Runs inside the caller's transaction so ticks and bars are committed together.
+    """
+    rows = aggregate_ticks(ticks)
+    if rows:
+        conn.executemany(UPSERT_BAR_SQL, rows)
+
+
+def rebuild_bars(conn, chunk_size: int = 100000):
+    """
+    Rebuilds every bar from the stored ticks. Used once when the bars table is
+    introduced on a database that already holds ticks.
+    """
+    conn.execute("DELETE FROM ohlc_bars")
+    total = 0
+    for symbol_id, symbol in list_symbols(conn):
+        # Keyset pagination over the primary key: (timestamp, trade_id) > last seen.
+        last = (-1, -1)
+        while True:
+            rows = conn.execute(
+                """
+                SELECT timestamp, trade_id, price, quantity FROM ticks
+                WHERE symbol_id = ? AND (timestamp, trade_id) > (?, ?)
+                ORDER BY timestamp, trade_id LIMIT ?
+                """,
+                (symbol_id, *last, chunk_size),
+            ).fetchall()
+            if not rows:
+                break
+            last = (rows[-1][0], rows[-1][1])
+            total += len(rows)
+            upsert_bars(
+                conn,
+                [
+                    (timestamp, symbol, price, quantity, trade_id)
+                    for timestamp, trade_id, price, quantity in rows
+                ],
+            )
+    conn.commit()
+    return total
+
+
+def aggregate_tick_arrays(symbol: str, timestamps, prices, quantities) -> list:
+    """
+    Vectorized aggregate_ticks for the ticks of one symbol, given as arrays in
+    (timestamp, trade_id) order. Returns one row per (timeframe, bucket) for
+    UPSERT_BAR_SQL.
+    """
+    rows = []
+    if len(timestamps) == 0:
+        return rows
+    for timeframe, bar_ms in TIMEFRAME_MS.items():
+        buckets = timestamps - timestamps % bar_ms
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)]
+        rows.extend(
+            zip(
+                repeat(symbol),
+                repeat(timeframe),
+                buckets[starts].tolist(),
+                prices[starts].tolist(),
+                np.maximum.reduceat(prices, starts).tolist(),
+                np.minimum.reduceat(prices, starts).tolist(),
+                prices[ends - 1].tolist(),
+                np.add.reduceat(quantities, starts).tolist(),
+                (ends - starts).tolist(),
+                timestamps[starts].tolist(),
+                timestamps[ends - 1].tolist(),
+            )
+        )
+    return rows
+
+
+def rebuild_bar_span(conn, symbol_id: int, symbol: str, start_ms: int, end_ms: int) -> int:
+    """
+    Recomputes every bar of a symbol in [start_ms, end_ms) from its stored ticks.
+    Both ends must fall on bar boundaries of every timeframe. The ticks are read
+    and the bars replaced in one write transaction, so a bar the ingestor updates
+    meanwhile is not lost. Returns the number of ticks aggregated.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(RANGE_TICKS_SQL, (symbol_id, start_ms, end_ms)).fetchall()
+        for timeframe in TIMEFRAME_MS:
+            conn.execute(
+                "DELETE FROM ohlc_bars WHERE symbol = ? AND timeframe = ? AND bucket >= ? AND bucket < ?",
+                (symbol, timeframe, start_ms, end_ms),
+            )
+        if rows:
+            # Columns: timestamp, trade_id, price, quantity (ms fit a float64 exactly).
+            values = np.array(rows, dtype=np.float64)
+            conn.executemany(
+                UPSERT_BAR_SQL,
+                aggregate_tick_arrays(
+                    symbol, values[:, 0].astype(np.int64), values[:, 2], values[:, 3]
+                ),
+            )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+# Open-ended ranges use this as their upper bound, so there is one statement to cache.
+MAX_BUCKET = 2**62
+
+
+def load_bars(
+    conn, symbol: str, timeframe: str, start_bucket: int, end_bucket: int = MAX_BUCKET
+) -> pd.DataFrame:
+    """
+    Loads the persisted bars of one symbol with start_bucket <= open time <= end_bucket
+    (ms). Returns a DataFrame indexed by the UTC bar open time.
+
+    1s bars older than the hot database are aggregated from the tick archive.
+    """
+    df = pd.read_sql_query(
+        """
+        SELECT bucket, open, high, low, close, volume
+        FROM ohlc_bars
+        WHERE symbol = ? AND timeframe = ? AND bucket >= ? AND bucket <= ?
+        ORDER BY bucket
+        """,
+        conn,
+        params=(symbol, timeframe, start_bucket, end_bucket),
+    )
+    df.index = pd.to_datetime(df.pop("bucket"), unit="ms", utc=True)
+    df.index.name = "timestamp"
+
+    if timeframe == ARCHIVED_TIMEFRAME and (
+        df.empty or start_bucket < df.index[0].value // 1_000_000
+    ):
+        archived = archived_bars(
+            symbol, TIMEFRAME_MS[timeframe], start_bucket, min(end_bucket + 1, MAX_BUCKET)
+        )
+        if not archived.empty and df.empty:
+            df = archived
+        elif not archived.empty:
+            # A late tick can leave a partial bar in both tiers; the hot one wins.
+            archived = archived[~archived.index.isin(df.index)]
+            df = pd.concat([archived, df]).sort_index()
+    return df
+
+
+def latest_bucket(conn, symbols, timeframe: str):
+    """Open time (ms) of the newest bar of any of `symbols`, or None."""
+    latest = None
+    for symbol in symbols:
+        # One primary-key seek per symbol.
+        bucket = conn.execute(
+            "SELECT MAX(bucket) FROM ohlc_bars WHERE symbol = ? AND timeframe = ?",
+            (symbol, timeframe),
+        ).fetchone()[0]
+        if bucket is None and timeframe == ARCHIVED_TIMEFRAME:
+            # A symbol idle since before the archive cutoff has its 1s bars only
+            # in the archive (load_bars reads them there).
+            last_ts = last_tick_time(conn, symbol)
+            if last_ts is not None:
+                bucket = last_ts - last_ts % TIMEFRAME_MS[timeframe]
+        if bucket is not None and (latest is None or bucket > latest):
+            latest = bucket
+    return latest
+
+
+def last_tick_time(conn, symbol: str):
+    """
+    Timestamp (ms) of the newest tick of a symbol, or None. Read from the newest
+    bar of every timeframe (one primary-key seek each): the archive drops old 1s
+    bars, but the coarser bars are kept.
+    """
+    latest = None
+    for timeframe in TIMEFRAME_MS:
+        row = conn.execute(
+            """
+            SELECT last_ts FROM ohlc_bars
+            WHERE symbol = ? AND timeframe = ?
+            ORDER BY bucket DESC LIMIT 1
+            """,
+            (symbol, timeframe),
+        ).fetchone()
+        if row is not None and (latest is None or row[0] > latest):
+            latest = row[0]
+    return latest
+
+
+def get_backfill_time(conn) -> int:
+    """
+    Time (ms) of the last bulk backfill, 0 if there was none. A backfill rewrites
+    history without moving the watermark, so cached results are also keyed on it.
+    """
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'backfilled_at'").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # database created before the `meta` table
+    return row[0] if row else 0
+
+
+def set_backfill_time(conn, time_ms: int):
+    conn.execute(
+        """
+        INSERT INTO meta (key, value) VALUES ('backfilled_at', ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """,
+        (time_ms,),
+    )
+
+
+def get_watermark(conn, symbols):
+    """
+    Timestamp (ms) of the newest stored tick of any of `symbols`, archived ones
+    included (see last_tick_time).
+    """
+    watermark = None
+    for symbol in symbols:
+        last_ts = last_tick_time(conn, symbol)
+        if last_ts is not None and (watermark is None or last_ts > watermark):
+            watermark = last_ts
+    return watermark
+
+
+def merge_bars(old: pd.DataFrame, new: pd.DataFrame, start) -> pd.DataFrame:
+    """
+    Extends previously loaded bars with newly loaded ones. Bars present in both
+    (the one that was still open) are taken from `new`; bars before `start` are dropped.
+    """
+    if new.empty:
+        merged = old
+    else:
+        merged = pd.concat([old[old.index < new.index[0]], new])
+    return merged[merged.index >= start]
+
+
+def combine_pair_bars(
+    y_symbol: str, y_bars: pd.DataFrame, x_symbol: str, x_bars: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Combines both symbols' bars into the shape `price_df.resample(...).ohlc()` on
+    the pivoted ticks used to have: (symbol, field) columns over the union of both
+    symbols' bar times. Where only one symbol traded in a period, the other gets a
+    flat bar at its previous close, which is what resampling the forward-filled
+    prices produced.
+    """
+    index = y_bars.index.union(x_bars.index)
+
+    columns = {}
+    for symbol, bars in ((y_symbol, y_bars), (x_symbol, x_bars)):
+        bars = bars.reindex(index)
+        previous_close = bars["close"].ffill()
+        for field in ("open", "high", "low", "close"):
+            columns[(symbol, field)] = bars[field].fillna(previous_close)
+        columns[(symbol, "volume")] = bars["volume"].fillna(0.0)
+
+    return pd.DataFrame(columns, index=index)
+
+
+def pair_bar_range(
+    conn, symbols, timeframe: str, max_bars: int, start_ms=None, end_ms=None
+):
+    """
+    Resolves a requested time range to (start_bucket, end_bucket) bar open times.
+    The range ends at the newest bar (or `end_ms`) and spans at most `max_bars`
+    periods, starting no earlier than `start_ms`. Returns None when there are no
+    bars yet.
+    """
+    latest = latest_bucket(conn, symbols, timeframe)
+    if latest is None:
+        return None
+
+    bar_ms = TIMEFRAME_MS[timeframe]
+    end_bucket = latest if end_ms is None else min(latest, end_ms - end_ms % bar_ms)
+    start_bucket = end_bucket - (max_bars - 1) * bar_ms
+    if start_ms is not None:
+        start_bucket = max(start_bucket, start_ms)
+    return start_bucket, end_bucket
+
+
+def load_pair_bars(
+    conn,
+    y_symbol: str,
+    x_symbol: str,
+    timeframe: str,
+    max_bars: int,
+    start_ms=None,
+    end_ms=None,
+):
+    """
+    Loads up to `max_bars` bar periods of both symbols, the most recent ones or
+    those of the [start_ms, end_ms] range. Returns (y_bars, x_bars), or None when
+    there are no bars yet.
+    """
+    bounds = pair_bar_range(
+        conn, (y_symbol, x_symbol), timeframe, max_bars, start_ms, end_ms
+    )
+    if bounds is None:
+        return None
+    return (
+        load_bars(conn, y_symbol, timeframe, *bounds),
+        load_bars(conn, x_symbol, timeframe, *bounds),
+    )
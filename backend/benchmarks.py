@@ -0,0 +1,439 @@
+# Benchmark suite: builds deterministic synthetic tick databases and times the chart
+# pipeline stage by stage, the tick writer and the live fan-out. Results are written
+# as JSON so that two runs can be compared:
+#
+#   python benchmarks.py --rows 100000 1000000 --output after.json
+#   python benchmarks.py --rows 100000 1000000 --compare before.json
+#
+# Generated databases are kept in --dir and reused by later runs with the same size
+# and seed.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import database
+from bars import combine_pair_bars, load_pair_bars, rebuild_bars
+from config import CHART_MAX_BARS, SUPPORTED_SYMBOLS, TIMEFRAME_MS
+from tick_store import INSERT_TICK_SQL, SymbolIds
+
+BENCH_DIR = os.path.join(os.path.dirname(__file__), "database_storage", "benchmarks")
+DEFAULT_ROWS = (100_000, 1_000_000, 10_000_000)
+DEFAULT_WINDOWS = (20, 50)
+DEFAULT_FANOUT_CLIENTS = (1, 10, 100, 1000)
+
+# Synthetic ticks start at 2020-01-01 UTC (away from any recorded or archived data)
+# and arrive at TICKS_PER_SECOND over all symbols.
+START_MS = 1_577_836_800_000
+TICKS_PER_SECOND = 10.0
+INSERT_CHUNK = 100_000
+
+
+# --- Synthetic databases ---
+
+
+def synthetic_ticks(rows: int, symbols, seed: int = 42):
+    """
+    Deterministic synthetic trades as column arrays (timestamps, symbol indexes,
+    prices, quantities, trade_ids), in timestamp order. Log prices share one random
+    walk plus a per-symbol one.
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = START_MS + np.cumsum(rng.exponential(1000.0 / TICKS_PER_SECOND, rows)).astype(np.int64)
+    symbol_index = rng.integers(0, len(symbols), rows)
+
+    factor = np.cumsum(rng.normal(0.0, 2e-4, rows))
+    idiosyncratic = rng.normal(0.0, 1e-4, rows)
+    trade_ids = np.empty(rows, dtype=np.int64)
+    for i in range(len(symbols)):
+        mask = symbol_index == i
+        idiosyncratic[mask] = np.cumsum(idiosyncratic[mask])
+        trade_ids[mask] = np.arange(1, mask.sum() + 1)
+    start_prices = 100.0 * 2.0 ** np.arange(len(symbols))
+    prices = start_prices[symbol_index] * np.exp(factor + idiosyncratic)
+    quantities = np.round(rng.exponential(1.0, rows), 5)
+    return timestamps, symbol_index, prices, quantities, trade_ids
+
+
+def build_database(path: str, rows: int, symbols, seed: int = 42) -> dict:
+    """
+    Creates the benchmark database at `path` (schema, ticks and bars) unless it
+    already exists. Returns the timings of the steps that ran.
+    """
+    database.DB_FILE_PATH = path
+    if os.path.exists(path):
+        return {"reused": True}
+
+    started = time.perf_counter()
+    columns = synthetic_ticks(rows, symbols, seed)
+    generate_s = time.perf_counter() - started
+
+    database.create_tables()
+    conn = database.get_db_connection()
+    conn.execute("PRAGMA synchronous=OFF")
+    symbol_ids = SymbolIds()
+    ids = np.array([symbol_ids.get(conn, symbol) for symbol in symbols])
+    conn.commit()
+
+    timestamps, symbol_index, prices, quantities, trade_ids = columns
+    started = time.perf_counter()
+    for i in range(0, rows, INSERT_CHUNK):
+        part = slice(i, i + INSERT_CHUNK)
+        with conn:
+            conn.executemany(
+                INSERT_TICK_SQL,
+                zip(
+                    ids[symbol_index[part]].tolist(),
+                    timestamps[part].tolist(),
+                    trade_ids[part].tolist(),
+                    prices[part].tolist(),
+                    quantities[part].tolist(),
+                ),
+            )
+    insert_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with conn:
+        rebuild_bars(conn)
+    rebuild_s = time.perf_counter() - started
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+    return {
+        "reused": False,
+        "generate_s": generate_s,
+        "insert_s": insert_s,
+        "insert_rows_per_s": rows / insert_s,
+        "bar_rebuild_s": rebuild_s,
+        "bar_rebuild_rows_per_s": rows / rebuild_s,
+    }
+
+
+# --- Timing helpers ---
+
+
+def timed(fn, repeat: int):
+    """Runs fn() `repeat` times. Returns ({"min_ms", "median_ms"}, last result)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return {"min_ms": min(samples), "median_ms": statistics.median(samples)}, result
+
+
+# --- Chart pipeline ---
+
+
+def bench_chart(y_symbol: str, x_symbol: str, timeframes, windows, repeat: int) -> dict:
+    """
+    Times every stage of the /api/chart-data pipeline on the current database:
+    fetch (bar reads), pivot (combine and align), ols (pair kernel), adf,
+    rolling_corr, frame (join into the response frame) and serialize, plus the
+    endpoint end to end with a cold and a warm cache.
+    """
+    # Imported here: main builds the app and its pools on import.
+    from fastapi.testclient import TestClient
+
+    import main
+    from analytics import calculate_rolling_correlation, run_adf_test
+    from chart_response import build_timeseries_frame, frame_to_rows, json_response
+    from kernels import pair_kernel
+
+    results = {}
+    client = TestClient(main.app)
+    conn = database.get_db_connection(read_only=True)
+    try:
+        for timeframe in timeframes:
+            for window in windows:
+                stages = {}
+                stages["fetch"], loaded = timed(
+                    lambda: load_pair_bars(conn, y_symbol, x_symbol, timeframe, CHART_MAX_BARS), repeat
+                )
+                y_bars, x_bars = loaded
+
+                def pivot():
+                    ohlc = combine_pair_bars(y_symbol, y_bars, x_symbol, x_bars)
+                    aligned = pd.concat(
+                        [ohlc[(y_symbol, "close")].dropna(), ohlc[(x_symbol, "close")].dropna()],
+                        axis=1,
+                        keys=["Y", "X"],
+                    ).dropna()
+                    return ohlc, aligned
+
+                stages["pivot"], (ohlc, aligned) = timed(pivot, repeat)
+                bars = len(aligned)
+                if bars < window:
+                    results[f"{timeframe}/{window}"] = {"bars": bars, "skipped": "fewer bars than the window"}
+                    continue
+
+                y, x = aligned["Y"].to_numpy(), aligned["X"].to_numpy()
+                stages["ols"], kernel = timed(lambda: pair_kernel(y, x), repeat)
+                spread = pd.Series(kernel["spread"], index=aligned.index)
+                stages["adf"], _ = timed(lambda: run_adf_test(spread), repeat)
+                stages["rolling_corr"], rolling = timed(
+                    lambda: calculate_rolling_correlation(aligned["Y"], aligned["X"], window), repeat
+                )
+                series = {
+                    "spread": spread,
+                    "z_score": pd.Series(kernel["z_score"], index=aligned.index),
+                    "rolling_corr": rolling,
+                    "regression_line_value": pd.Series(kernel["regression_line"], index=aligned.index),
+                }
+                stages["frame"], frame = timed(
+                    lambda: build_timeseries_frame(ohlc, y_symbol, x_symbol, series), repeat
+                )
+                stages["serialize"], _ = timed(
+                    lambda: json_response({"timeseries_data": frame_to_rows(frame)}).body, repeat
+                )
+
+                params = {"y_symbol": y_symbol, "x_symbol": x_symbol, "timeframe": timeframe, "window": window}
+
+                def endpoint_cold():
+                    main.pair_cache.invalidate()
+                    response = client.get("/api/chart-data", params=params)
+                    response.raise_for_status()
+                    return response
+
+                stages["endpoint_cold"], response = timed(endpoint_cold, repeat)
+                stages["endpoint_warm"], _ = timed(
+                    lambda: client.get("/api/chart-data", params=params), repeat
+                )
+                results[f"{timeframe}/{window}"] = {
+                    "bars": bars,
+                    "response_bytes": len(response.content),
+                    "stages": stages,
+                }
+    finally:
+        conn.close()
+        # The next database must not be served from this one's cache or connections.
+        main.pair_cache.invalidate()
+        main.db_pool.close()
+    return results
+
+
+# --- Ingest ---
+
+
+def bench_ingest(path: str, rows: int, symbols, seed: int = 7) -> dict:
+    """Rows/second through the TickWriter (ticks plus bar upserts) into an empty database."""
+    from tick_writer import TickWriter
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    database.DB_FILE_PATH = path
+    database.create_tables()
+
+    timestamps, symbol_index, prices, quantities, trade_ids = synthetic_ticks(rows, symbols, seed)
+    names = np.array(symbols, dtype=object)[symbol_index]
+    ticks = list(zip(timestamps.tolist(), names.tolist(), prices.tolist(), quantities.tolist(), trade_ids.tolist()))
+
+    writer = TickWriter(stats_interval=0)
+    writer.start()
+    started = time.perf_counter()
+    for tick in ticks:
+        writer.put(tick)
+    queued_s = time.perf_counter() - started
+    # Wait for the queue to drain (or for the writer to stop making progress).
+    last_written, last_progress = -1, time.perf_counter()
+    while True:
+        stats = writer.stats()
+        if stats["queue_depth"] == 0 and stats["rows_written"] + stats["errors"] * writer.batch_size >= rows:
+            break
+        if stats["rows_written"] != last_written:
+            last_written, last_progress = stats["rows_written"], time.perf_counter()
+        elif time.perf_counter() - last_progress > 10.0:
+            break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    writer.stop()
+    stats = writer.stats()
+    return {
+        "rows": rows,
+        "rows_written": stats["rows_written"],
+        "seconds": elapsed,
+        "rows_per_s": stats["rows_written"] / elapsed,
+        "queue_put_rows_per_s": rows / queued_s,
+        "avg_batch_size": stats["avg_batch_size"],
+        "avg_flush_ms": stats["avg_flush_ms"],
+        "max_flush_ms": stats["max_flush_ms"],
+    }
+
+
+# --- Live fan-out ---
+
+
+async def _fanout(clients: int, packets: int, encoding: str) -> dict:
+    from live_encoding import encode_values
+    from live_feed import PairPublisher, Subscription
+
+    publisher = PairPublisher("Y", "X", None, None)
+    subscriptions = [Subscription(max_rate=None, encoding=encoding) for _ in range(clients)]
+    for subscription in subscriptions:
+        publisher.add(subscription)
+
+    latencies = []
+    for i in range(packets):
+        timestamp = START_MS + i * 100
+        packet = {
+            "time": pd.Timestamp(timestamp, unit="ms", tz="UTC").isoformat(),
+            "y_price": 100.0 + i * 0.01,
+            "x_price": 50.0 + i * 0.005,
+            "spread": 1.0,
+            "z_score": 0.5,
+            "regression_line_value": 99.0,
+        }
+        started = time.perf_counter()
+        publisher.publish(packet, timestamp, encode_values(packet))
+        for subscription in subscriptions:
+            await subscription.get()
+        latencies.append((time.perf_counter() - started) * 1000.0)
+
+    latencies.sort()
+    return {
+        "median_ms": statistics.median(latencies),
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "max_ms": latencies[-1],
+        "per_client_us": statistics.median(latencies) * 1000.0 / clients,
+    }
+
+
+def bench_fanout(client_counts, packets: int = 200) -> dict:
+    """
+    Time from a publisher handing out one live packet until every subscription
+    has dequeued it (encoding included), per client count and encoding. Network
+    sends are not included.
+    """
+    return {
+        encoding: {str(clients): asyncio.run(_fanout(clients, packets, encoding)) for clients in client_counts}
+        for encoding in ("json", "binary")
+    }
+
+
+# --- Reporting ---
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _flatten(node, prefix=""):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from _flatten(value, f"{prefix}/{key}" if prefix else str(key))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, float(node)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list:
+    """
+    Timings (keys ending in _ms or _s) and throughputs (_per_s) that changed by
+    more than `threshold` between two result files, as (key, before, after, change)
+    with change > 0 meaning slower.
+    """
+    before = dict(_flatten(baseline.get("results", {})))
+    after = dict(_flatten(current.get("results", {})))
+    changes = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        if old <= 0 or "reused" in key:
+            continue
+        if key.endswith("_per_s"):
+            change = old / new - 1.0 if new > 0 else float("inf")
+        elif key.endswith("_ms") or key.endswith("_s"):
+            change = new / old - 1.0
+        else:
+            continue
+        if abs(change) > threshold:
+            changes.append((key, old, new, change))
+    return changes
+
+
+def run(args) -> dict:
+    symbols = args.symbols or list(SUPPORTED_SYMBOLS)
+    os.makedirs(args.dir, exist_ok=True)
+    results = {"databases": {}}
+
+    for rows in args.rows:
+        path = os.path.join(args.dir, f"bench_{rows}_{args.seed}.db")
+        print(f"--- Benchmark database: {rows:,} ticks ({path}) ---", file=sys.stderr)
+        build = build_database(path, rows, symbols, args.seed)
+        chart = bench_chart(symbols[0], symbols[1], args.timeframes, args.windows, args.repeat)
+        results["databases"][str(rows)] = {"build": build, "chart": chart}
+
+    if args.ingest_rows:
+        print(f"--- Benchmark: ingest of {args.ingest_rows:,} ticks ---", file=sys.stderr)
+        results["ingest"] = bench_ingest(
+            os.path.join(args.dir, "bench_ingest.db"), args.ingest_rows, symbols
+        )
+    if args.fanout_clients:
+        print("--- Benchmark: live fan-out ---", file=sys.stderr)
+        results["fanout"] = bench_fanout(args.fanout_clients)
+
+    return {"environment": _environment(), "settings": vars(args), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QuantStream benchmark suite (JSON output).")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS))
+    parser.add_argument("--symbols", nargs="+", default=None)
+    parser.add_argument("--timeframes", nargs="+", default=list(TIMEFRAME_MS), choices=list(TIMEFRAME_MS))
+    parser.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_WINDOWS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ingest-rows", type=int, default=200_000, help="0 to skip")
+    parser.add_argument("--fanout-clients", type=int, nargs="*", default=list(DEFAULT_FANOUT_CLIENTS))
+    parser.add_argument("--dir", default=BENCH_DIR, help="where benchmark databases are kept")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON to report changes against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    # Setup code prints progress; keep stdout for the JSON.
+    with redirect_stdout(sys.stderr):
+        report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            changes = compare(json.load(f), report, args.threshold)
+        for key, old, new, change in changes:
+            label = "slower" if change > 0 else "faster"
+            print(f"{key}: {old:.3f} -> {new:.3f} ({abs(change):.0%} {label})", file=sys.stderr)
+        if not changes:
+            print(f"No change above {args.threshold:.0%}.", file=sys.stderr)
@@ -0,0 +1,180 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import Response
+
+from kernels import lttb_buckets, lttb_indices
+
+
+OHLC_FIELDS = ("open", "high", "low", "close", "volume")
+SERIES_FIELDS = ("spread", "z_score", "rolling_corr", "regression_line_value")
+# Only in the rolling and EWMA hedge modes, where they change from bar to bar.
+DYNAMIC_SERIES_FIELDS = ("hedge_ratio", "spread_mean", "spread_std")
+
+# NaN/inf are written as null by orjson, so no sanitising pass is needed.
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+
+
+def build_timeseries_frame(
+    ohlc_df: pd.DataFrame,
+    y_symbol: str,
+    x_symbol: str,
+    series: dict,
+) -> pd.DataFrame:
+    """
+    Joins the OHLC bars of both symbols with the analytics series in one pass.
+
+    `series` maps each name in SERIES_FIELDS (and optionally DYNAMIC_SERIES_FIELDS)
+    to a Series indexed by bar time; its index (the aligned bar times) defines the
+    rows of the result. Columns are flat: 'y_open' ... 'x_volume' followed by the
+    analytics series.
+    """
+    index = series["spread"].index
+    columns = {}
+    for prefix, symbol in (("y", y_symbol), ("x", x_symbol)):
+        bars = ohlc_df[symbol].reindex(index)
+        for field in OHLC_FIELDS:
+            columns[f"{prefix}_{field}"] = bars[field].to_numpy(dtype="float64")
+    for name in SERIES_FIELDS + DYNAMIC_SERIES_FIELDS:
+        if name in series:
+            columns[name] = series[name].reindex(index).to_numpy(dtype="float64")
+    return pd.DataFrame(columns, index=index)
+
+
+def _series_fields(frame: pd.DataFrame) -> list:
+    return [name for name in SERIES_FIELDS + DYNAMIC_SERIES_FIELDS if name in frame.columns]
+
+
+def _time_array(frame: pd.DataFrame) -> np.ndarray:
+    """Bar times as naive UTC datetime64[ms]; orjson writes them as ISO strings."""
+    return frame.index.tz_convert(None).to_numpy().astype("datetime64[ms]")
+
+
+def frame_to_columns(frame: pd.DataFrame) -> dict:
+    """
+    Columnar format: parallel arrays that all share the `time` array.
+    Every value stays a NumPy array, so there are no per-row Python objects.
+    """
+    return {
+        "time": _time_array(frame),
+        "y_ohlc": {f: frame[f"y_{f}"].to_numpy() for f in OHLC_FIELDS},
+        "x_ohlc": {f: frame[f"x_{f}"].to_numpy() for f in OHLC_FIELDS},
+        **{name: frame[name].to_numpy() for name in _series_fields(frame)},
+    }
+
+
+def frame_to_rows(frame: pd.DataFrame) -> list:
+    """
+    Row format: one object per bar, the shape the dashboard consumes.
+    Built column-wise from the same frame, so it is O(n) in the number of bars.
+    """
+    times = frame.index.strftime("%Y-%m-%dT%H:%M:%S+00:00").tolist()
+    y_cols = [frame[f"y_{f}"].tolist() for f in OHLC_FIELDS]
+    x_cols = [frame[f"x_{f}"].tolist() for f in OHLC_FIELDS]
+    series_names = _series_fields(frame)
+    series_cols = [frame[name].tolist() for name in series_names]
+
+    rows = []
+    for i, time in enumerate(times):
+        y_ohlc = {"timestamp": time}
+        x_ohlc = {"timestamp": time}
+        for field, y_col, x_col in zip(OHLC_FIELDS, y_cols, x_cols):
+            y_ohlc[field] = y_col[i]
+            x_ohlc[field] = x_col[i]
+        row = {"time": time, "y_ohlc": y_ohlc, "x_ohlc": x_ohlc}
+        for name, col in zip(series_names, series_cols):
+            row[name] = col[i]
+        rows.append(row)
+    return rows
+
+
+def downsample_frame(frame: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """
+    At most `max_points` rows of a bar frame, for display. The bars are split into
+    LTTB buckets: the OHLC fields are aggregated per bucket (first open, highest
+    high, lowest low, last close, summed volume) and the analytics series take the
+    row that LTTB keeps on the z-score, so spikes survive. Each row is stamped
+    with the open time of its bucket.
+    """
+    n = len(frame)
+    if max_points is None or n <= max_points or max_points < 3:
+        return frame
+
+    edges = lttb_buckets(n, max_points)
+    starts, lasts = edges[:-1], edges[1:] - 1
+    kept = lttb_indices(frame.index.asi8, frame["z_score"].to_numpy(), max_points)
+
+    columns = {}
+    for prefix in ("y", "x"):
+        columns[f"{prefix}_open"] = frame[f"{prefix}_open"].to_numpy()[starts]
+        columns[f"{prefix}_high"] = np.fmax.reduceat(frame[f"{prefix}_high"].to_numpy(), starts)
+        columns[f"{prefix}_low"] = np.fmin.reduceat(frame[f"{prefix}_low"].to_numpy(), starts)
+        columns[f"{prefix}_close"] = frame[f"{prefix}_close"].to_numpy()[lasts]
+        columns[f"{prefix}_volume"] = np.add.reduceat(
+            np.nan_to_num(frame[f"{prefix}_volume"].to_numpy()), starts
+        )
+    for name in _series_fields(frame):
+        columns[name] = frame[name].to_numpy()[kept]
+    return pd.DataFrame(columns, index=frame.index[starts])
+
+
+def frame_since(frame: pd.DataFrame, since_ms: int) -> pd.DataFrame:
+    """The rows of a bar frame whose bar time is at or after `since_ms`."""
+    since = pd.Timestamp(since_ms, unit="ms", tz="UTC")
+    return frame.iloc[frame.index.searchsorted(since) :]
+
+
+def json_response(payload: dict, headers: dict = None) -> Response:
+    """Serialises straight from NumPy/Python values to JSON bytes."""
+    return Response(
+        content=orjson.dumps(payload, option=ORJSON_OPTIONS),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+# --- Conditional requests ---
+# A chart response is fully determined by the request parameters and the watermark
+# (the newest stored tick of the pair), so both validators are derived from them:
+# an unchanged request is answered with 304 before any analytics run.
+
+
+def validators(watermark: int, params: tuple) -> dict:
+    """ETag / Last-Modified headers for a response computed at `watermark`."""
+    digest = hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+    modified = datetime.fromtimestamp(watermark / 1000.0, tz=timezone.utc)
+    return {
+        "ETag": f'W/"{watermark}-{digest}"',
+        "Last-Modified": format_datetime(modified, usegmt=True),
+        # Let browsers keep the body but revalidate on every request.
+        "Cache-Control": "no-cache",
+    }
+
+
+def not_modified(headers: dict, watermark: int, if_none_match=None, if_modified_since=None) -> bool:
+    """
+    Whether the client's copy is current. If-None-Match is exact and takes
+    precedence; If-Modified-Since only has one-second resolution.
+    """
+    if if_none_match is not None:
+        etag = headers["ETag"]
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: a W/ prefix on either side is ignored.
+        return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return watermark // 1000 <= int(since.timestamp())
+    return False
+
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
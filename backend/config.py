@@ -1,6 +1,14 @@
 # THis is central configuration for the application.
 
+import json
+import math
+import os
+
 # --- Symbol Configuration ---
+# The defaults below can be replaced at startup, without editing this file, by
+# QUANTSTREAM_SYMBOLS (comma-separated) or QUANTSTREAM_SYMBOLS_FILE: a JSON list of
+# symbols or of {"symbol", "name", "link"} objects, or a text file with one symbol
+# per line. Every process (API, ingestor, shards) reads the same list on import.
 SUPPORTED_SYMBOLS = [
     "BTCUSDT",
     "ETHUSDT",
@@ -36,3 +44,201 @@ SUPPORTED_SYMBOLS_DETAIL = [
         "link": "https://assets.coingecko.com/coins/images/5/large/dogecoin.png",
     },
 ]
+
+
+def _load_symbols():
+    """Returns (symbols, details) from the environment, or None to keep the defaults."""
+    entries = None
+    if os.environ.get("QUANTSTREAM_SYMBOLS"):
+        entries = os.environ["QUANTSTREAM_SYMBOLS"].split(",")
+    elif os.environ.get("QUANTSTREAM_SYMBOLS_FILE"):
+        with open(os.environ["QUANTSTREAM_SYMBOLS_FILE"]) as f:
+            text = f.read()
+        try:
+            entries = json.loads(text)
+        except ValueError:
+            entries = text.splitlines()
+    if entries is None:
+        return None
+
+    known = {detail["symbol"]: detail for detail in SUPPORTED_SYMBOLS_DETAIL}
+    symbols, details = [], []
+    for entry in entries:
+        detail = dict(entry) if isinstance(entry, dict) else {"symbol": entry}
+        symbol = detail["symbol"].strip().upper()
+        if not symbol or symbol in symbols:
+            continue
+        base = symbol[:-4] if symbol.endswith("USDT") else symbol
+        detail = {**known.get(symbol, {"name": base, "link": ""}), **detail, "symbol": symbol}
+        symbols.append(symbol)
+        details.append(detail)
+    return symbols, details
+
+
+_loaded = _load_symbols()
+if _loaded:
+    SUPPORTED_SYMBOLS, SUPPORTED_SYMBOLS_DETAIL = _loaded
+
+# --- Ingestor Writer Configuration ---
+# Ticks are queued by the websocket thread and written in batches by a single writer.
+# A batch is flushed when it reaches WRITER_BATCH_SIZE rows or after WRITER_FLUSH_INTERVAL seconds.
+WRITER_BATCH_SIZE = 500
+WRITER_FLUSH_INTERVAL = 0.1
+# How often (seconds) the writer prints its queue depth / flush latency stats. 0 disables it.
+WRITER_STATS_INTERVAL = 60
+
+# --- Timeframe Configuration ---
+# Bar length in milliseconds for every chart timeframe. The ingestor keeps an
+# OHLCV bar table up to date for each of these as ticks arrive.
+TIMEFRAME_MS = {
+    "1s": 1_000,
+    "1m": 60_000,
+    "5m": 300_000,
+}
+
+# Number of bar periods served by /api/chart-data.
+CHART_MAX_BARS = 20_000
+# Number of 1s bar periods used to fit the live websocket parameters.
+LIVE_BOOTSTRAP_BARS = 3_600
+
+# --- Metrics ---
+# /metrics serves Prometheus text format. The ingestor's counters live in a small
+# shared-memory block the API reads on scrape. Histogram bucket bounds are in seconds.
+METRICS_SHM_NAME = "quantstream_metrics"
+DB_WRITE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# --- Market Data Stream ---
+# Combined-stream websocket endpoint the ingestor subscribes to ("?streams=..." is
+# appended). Set QUANTSTREAM_STREAM_URL to replay ticks from the local simulator
+# instead, e.g. ws://127.0.0.1:9443/stream (see simulator.py).
+STREAM_BASE_URL = os.environ.get("QUANTSTREAM_STREAM_URL", "wss://stream.binance.com:9443/stream")
+SIMULATOR_HOST = "127.0.0.1"
+SIMULATOR_PORT = 9443
+
+# --- Ingest Shards ---
+# With more than one shard, the ingestor spreads the symbols over INGEST_SHARDS
+# websocket connections, each in its own process that parses trades and sends them
+# in batches (every INGEST_SHARD_FLUSH_INTERVAL seconds or INGEST_SHARD_BATCH_SIZE
+# ticks) to the ingestor process, which keeps the tick rings and the single writer.
+# 0 (the default) picks one shard per INGEST_SYMBOLS_PER_SHARD symbols.
+# Every INGEST_REBALANCE_INTERVAL seconds the per-symbol trade rates are compared and,
+# when the busiest shard carries more than INGEST_REBALANCE_THRESHOLD times the mean
+# load, up to INGEST_REBALANCE_MAX_MOVES symbols move to lighter shards (subscribed on
+# the new shard before they are dropped from the old one, so no trade is missed).
+# While both deliver a moving symbol, the trade ids of its last INGEST_HANDOVER_IDS
+# trades are remembered and repeats are dropped.
+INGEST_SYMBOLS_PER_SHARD = 50
+INGEST_SHARDS = int(os.environ.get("QUANTSTREAM_INGEST_SHARDS", "0")) or max(
+    1, math.ceil(len(SUPPORTED_SYMBOLS) / INGEST_SYMBOLS_PER_SHARD)
+)
+INGEST_SHARD_FLUSH_INTERVAL = 0.005
+INGEST_SHARD_BATCH_SIZE = 200
+INGEST_SHARD_STATS_INTERVAL = 60
+INGEST_REBALANCE_INTERVAL = 60
+INGEST_REBALANCE_THRESHOLD = 1.5
+INGEST_REBALANCE_MAX_MOVES = 8
+INGEST_SUBSCRIBE_TIMEOUT = 10.0
+INGEST_HANDOVER_IDS = 100_000
+
+# --- Shared-Memory Tick Rings ---
+# The ingestor publishes every tick into a per-symbol ring buffer in shared memory,
+# which the API reads for live updates. Capacity is the number of ticks kept per symbol.
+TICK_RING_PREFIX = "quantstream"
+TICK_RING_CAPACITY = 65_536
+
+# --- Live (Streaming) Analytics ---
+# The websocket analytics are updated once per closed 1s bar. With a window they use
+# the last N bars, with a half-life (in bars) they use exponential decay instead.
+LIVE_ANALYTICS_WINDOW = LIVE_BOOTSTRAP_BARS
+LIVE_ANALYTICS_HALFLIFE = None
+LIVE_CORRELATION_WINDOW = 50
+
+# --- Pair Analytics Cache ---
+# Computed /api/chart-data results are cached per (y_symbol, x_symbol, timeframe, window)
+# and extended when newer ticks arrive. Bounded by entry count and approximate bytes.
+PAIR_CACHE_MAX_ENTRIES = 64
+PAIR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# --- Live Feed ---
+# One publisher per pair computes a live packet whenever either symbol has a new tick
+# (it checks the tick rings every LIVE_POLL_INTERVAL seconds; without rings it polls
+# SQLite every LIVE_UPDATE_INTERVAL) and fans it out to all websockets. Each client
+# gets at most max_rate packets per second (LIVE_DEFAULT_MAX_RATE unless it asks for
+# another rate, up to LIVE_MAX_RATE); in between, packets are coalesced to the newest.
+# Alert events use a bounded queue per client; when it is full the oldest is dropped.
+LIVE_POLL_INTERVAL = 0.02
+LIVE_UPDATE_INTERVAL = 0.5
+LIVE_DEFAULT_MAX_RATE = 2.0
+LIVE_MAX_RATE = 50.0
+LIVE_SEND_QUEUE_SIZE = 32
+
+# --- Alerts ---
+# How often (seconds) pairs with active alerts are re-checked for a running publisher
+# and triggered alert statuses are written back to the database in one batch.
+# A pair whose publisher cannot be started yet (e.g. no data) is retried after
+# ALERT_PIN_RETRY_MIN seconds, doubling up to ALERT_PIN_RETRY_MAX while it keeps failing.
+ALERT_MONITOR_INTERVAL = 1.0
+ALERT_PIN_RETRY_MIN = 5.0
+ALERT_PIN_RETRY_MAX = 300.0
+
+# --- Tick Archive ---
+# Ticks older than ARCHIVE_AGE_HOURS are moved out of SQLite into per-symbol, per-day
+# columnar .npy files (memory-mapped on read). The ingestor runs the job every
+# ARCHIVE_INTERVAL seconds.
+ARCHIVE_AGE_HOURS = 24
+ARCHIVE_INTERVAL = 3600
+
+# --- Pair Scanner ---
+# /api/scanner regresses every ordered pair of symbols in one batch, then runs the
+# batched ADF test on the SCANNER_ADF_PAIRS most correlated pairs, spread over
+# SCANNER_PROCESSES worker processes (None = one per CPU).
+SCANNER_MAX_BARS = 5_000
+SCANNER_ADF_PAIRS = 1_000
+SCANNER_PROCESSES = None
+
+# --- Backtests ---
+# /api/backtest sweeps a grid of z-score strategy parameters over at most
+# BACKTEST_MAX_BARS bars of a pair (a day of 1s bars), at most BACKTEST_MAX_GRID
+# grid points per request, in the scanner's process pool. Each worker simulates
+# threshold sets in chunks of BACKTEST_CHUNK_ELEMENTS (bars x sides) to keep its
+# arrays in cache. Fees default to BACKTEST_FEE_BPS of the filled notional, plus
+# BACKTEST_IMPACT_BPS scaled by the fill's share of the bar volume.
+BACKTEST_MAX_BARS = 86_400
+BACKTEST_MAX_GRID = 5_000
+BACKTEST_CHUNK_ELEMENTS = 250_000
+BACKTEST_FEE_BPS = 10.0
+BACKTEST_IMPACT_BPS = 0.0
+
+# --- Bulk Backfill ---
+# backfill.py parses trade dumps BACKFILL_CHUNK_ROWS lines at a time and merges the
+# staged rows into `ticks` every BACKFILL_TRANSACTION_ROWS rows (one write
+# transaction each, which is how long the ingestor's writer may have to wait). Bars
+# are then rebuilt in spans of BACKFILL_BAR_SPAN_MS (a multiple of every timeframe
+# that divides a day) around the imported ticks.
+BACKFILL_CHUNK_ROWS = 500_000
+BACKFILL_TRANSACTION_ROWS = 2_000_000
+BACKFILL_BAR_SPAN_MS = 3_600_000
+
+# --- Database Access (API) ---
+# Sync endpoints borrow connections from a pool of DB_POOL_SIZE connections, waiting
+# at most DB_POOL_TIMEOUT seconds. Async code (websockets, background tasks) runs
+# its SQLite reads on DB_READ_THREADS threads, each with its own read-only connection.
+DB_POOL_SIZE = 8
+DB_POOL_TIMEOUT = 10.0
+DB_READ_THREADS = 4
+
+# --- API Workers ---
+# Number of uvicorn worker processes. With more than one, every worker opens SQLite
+# read-only and the ingestor stays the only writer: alert writes are sent to it over
+# the local control channel, and computed pair analytics are shared between workers
+# through a private directory app.py creates per run under SHARED_CACHE_ROOT (tmpfs
+# where available) and hands to the workers in SHARED_CACHE_DIR_ENV.
+API_WORKERS = 1
+API_READ_ONLY = API_WORKERS > 1
+CONTROL_ADDRESS = ("127.0.0.1", 8765)
+SHARED_CACHE_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
+SHARED_CACHE_DIR_ENV = "QUANTSTREAM_SHARED_CACHE_DIR"
+SHARED_CACHE_DIR = os.environ.get(SHARED_CACHE_DIR_ENV)
+INGESTOR_RESTART_DELAY = 5.0
@@ -0,0 +1,106 @@
+import os
+import secrets
+import threading
+from multiprocessing.connection import Client, Listener
+
+from alert_store import WRITE_COMMANDS
+from config import API_READ_ONLY, CONTROL_ADDRESS
+from db_pool import db_pool
+
+
+# Shared secret of the control channel. app.py generates it before starting the
+# ingestor and the API workers, which inherit it through the environment.
+CONTROL_KEY_ENV = "QUANTSTREAM_CONTROL_KEY"
+
+
+class ControlError(Exception):
+    """Raised when a write could not be executed through the control channel."""
+
+
+def ensure_control_key() -> str:
+    """Creates the control channel secret for this process tree if it is missing."""
+    return os.environ.setdefault(CONTROL_KEY_ENV, secrets.token_hex(16))
+
+
+def _authkey() -> bytes:
+    key = os.environ.get(CONTROL_KEY_ENV)
+    if not key:
+        raise ControlError("The control channel is not configured (start the app via app.py).")
+    return key.encode()
+
+
+class ControlServer:
+    """
+    Runs in the ingestor: executes the writes of read-only API workers on the
+    ingestor's own connection, so it remains the only process writing to SQLite.
+
+    Requests are (command, args) tuples naming an entry of WRITE_COMMANDS and are
+    handled one at a time; the reply is ("ok", result) or ("error", message).
+    """
+
+    def __init__(self, connect, address=CONTROL_ADDRESS):
+        self._connect = connect
+        self.address = address
+        self._listener = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._listener = Listener(self.address, authkey=_authkey())
+        self._thread = threading.Thread(target=self._run, name="ControlServer", daemon=True)
+        self._thread.start()
+        print(f"--- Control channel listening on {self.address} ---")
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                try:
+                    client = self._listener.accept()
+                except OSError:
+                    return  # listener closed
+                except Exception as e:
+                    print(f"--- Control channel rejected a client: {e} ---")
+                    continue
+                with client:
+                    try:
+                        command, args = client.recv()
+                        handler = WRITE_COMMANDS[command]
+                        client.send(("ok", handler(conn, *args)))
+                    except EOFError:
+                        continue
+                    except Exception as e:
+                        client.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            conn.close()
+
+
+def control_call(command: str, *args, address=CONTROL_ADDRESS):
+    """Sends one write command to the ingestor and returns its result."""
+    try:
+        with Client(address, authkey=_authkey()) as client:
+            client.send((command, args))
+            status, result = client.recv()
+    except ControlError:
+        raise
+    except Exception as e:
+        raise ControlError(f"Control channel unavailable: {e}")
+    if status != "ok":
+        raise ControlError(result)
+    return result
+
+
+def execute_write(command: str, *args):
+    """
+    Runs a database write for the API. Read-only workers hand it to the ingestor;
+    a single read-write API process runs it on a pooled connection.
+    """
+    if API_READ_ONLY:
+        return control_call(command, *args)
+    with db_pool.connection() as conn:
+        return WRITE_COMMANDS[command](conn, *args)
@@ -1,33 +1,80 @@
 import sqlite3
 import os
+from urllib.request import pathname2url
+
+from bars import rebuild_bars
 
 
 DB_FOLDER = "database_storage"
 DATABASE_NAME = "quantstreamdb.db"
 
-# Full path to the database file.
-DB_FILE_PATH = os.path.join(os.path.dirname(__file__), DB_FOLDER, DATABASE_NAME)
+# Full path to the database file (QUANTSTREAM_DB_PATH points it elsewhere, e.g. at a
+# benchmark database).
+DB_FILE_PATH = os.environ.get(
+    "QUANTSTREAM_DB_PATH",
+    os.path.join(os.path.dirname(__file__), DB_FOLDER, DATABASE_NAME),
+)
 
 
-def get_db_connection():
+def get_db_connection(read_only: bool = False, shared: bool = False):
     """
     Creates and returns a connection to the SQLite database.
     Ensures the database directory exists.
+
+    read_only opens the file with mode=ro (the database must already exist);
+    shared allows the connection to be handed between threads, e.g. by a pool.
     """
     # Get the directory part of the path.
     db_dir = os.path.dirname(DB_FILE_PATH)
     # Create the directory if it doesn't exist.
     os.makedirs(db_dir, exist_ok=True)
 
-    conn = sqlite3.connect(DB_FILE_PATH, timeout=15.0)
+    if read_only:
+        uri = f"file:{pathname2url(DB_FILE_PATH)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=15.0, check_same_thread=not shared)
+        conn.execute("PRAGMA query_only=ON")
+    else:
+        conn = sqlite3.connect(DB_FILE_PATH, timeout=15.0, check_same_thread=not shared)
 
     conn.row_factory = sqlite3.Row
 
-    conn.execute("PRAGMA journal_mode=WAL")
+    if not read_only:
+        conn.execute("PRAGMA journal_mode=WAL")
 
     return conn
 
 
+def migrate_raw_ticks(conn):
+    """
+    One-time migration of the legacy `raw_ticks` table (text symbols, rowid plus a
+    (timestamp, symbol) index) into `ticks`. The old table is dropped and the file
+    vacuumed so the space is actually returned.
+    """
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'raw_ticks'"
+    ).fetchone()
+    if not legacy:
+        return
+
+    print("Migrating 'raw_ticks' into 'ticks'...")
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO symbols (name) SELECT DISTINCT symbol FROM raw_ticks ORDER BY symbol"
+        )
+        moved = conn.execute(
+            """
+            INSERT OR IGNORE INTO ticks (symbol_id, timestamp, trade_id, price, quantity)
+            SELECT s.id, r.timestamp, r.id, r.price, r.quantity
+            FROM raw_ticks r JOIN symbols s ON s.name = r.symbol
+            ORDER BY s.id, r.timestamp, r.id
+            """
+        ).rowcount
+        conn.execute("DROP TABLE raw_ticks")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    print(f"Migrated {moved} ticks.")
+
+
 def create_tables():
     """
     Connects to the database and creates the necessary tables
@@ -36,23 +83,41 @@ def create_tables():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    print("Creating 'raw_ticks' table...")
+    print("Creating 'symbols' table...")
     cursor.execute(
         """
-        CREATE TABLE IF NOT EXISTS raw_ticks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS symbols (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """
+    )
+
+    # Clustered on (symbol, time): per-symbol range scans read the table itself,
+    # with no separate index and no rowid. trade_id keeps ticks of the same
+    # millisecond apart (the exchange trade id, or the old row id for migrated ticks).
+    print("Creating 'ticks' table...")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ticks (
+            symbol_id INTEGER NOT NULL,
             timestamp INTEGER NOT NULL,
-            symbol TEXT NOT NULL,
+            trade_id INTEGER NOT NULL,
             price REAL NOT NULL,
-            quantity REAL NOT NULL
-        )
+            quantity REAL NOT NULL,
+            PRIMARY KEY (symbol_id, timestamp, trade_id)
+        ) WITHOUT ROWID
     """
     )
 
+    migrate_raw_ticks(conn)
+
+    # Read-only view with the old row layout, for ad-hoc queries and tools.
     cursor.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_raw_ticks_timestamp_symbol
-        ON raw_ticks (timestamp, symbol)
+        CREATE VIEW IF NOT EXISTS raw_ticks AS
+        SELECT t.trade_id AS id, t.timestamp, s.name AS symbol, t.price, t.quantity
+        FROM ticks t JOIN symbols s ON s.id = t.symbol_id
     """
     )
 
@@ -71,6 +136,45 @@ def create_tables():
     """
     )
 
+    print("Creating 'ohlc_bars' table...")
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ohlc_bars (
+            symbol TEXT NOT NULL,
+            timeframe TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            volume REAL NOT NULL,
+            trade_count INTEGER NOT NULL,
+            first_ts INTEGER NOT NULL,
+            last_ts INTEGER NOT NULL,
+            PRIMARY KEY (symbol, timeframe, bucket)
+        ) WITHOUT ROWID
+    """
+    )
+
+    # Small key/value store, e.g. the time of the last bulk backfill.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """
+    )
+
     conn.commit()
+
+    # Backfill the bars once for databases that already contain ticks.
+    has_bars = cursor.execute("SELECT 1 FROM ohlc_bars LIMIT 1").fetchone()
+    has_ticks = cursor.execute("SELECT 1 FROM ticks LIMIT 1").fetchone()
+    if has_ticks and not has_bars:
+        print("Building 'ohlc_bars' from existing ticks...")
+        rebuilt = rebuild_bars(conn)
+        print(f"Aggregated {rebuilt} ticks into bars.")
+
     conn.close()
     print(f"Database setup complete. DB located at: {DB_FILE_PATH}")
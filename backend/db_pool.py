@@ -0,0 +1,221 @@
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import API_READ_ONLY, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_READ_THREADS
+from database import get_db_connection
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the pool timeout."""
+
+
+class _WaitStats:
+    """Thread-safe count / mean / max of wait times."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "waits": self.count,
+                "avg_wait_ms": (self.total / self.count * 1000.0) if self.count else 0.0,
+                "max_wait_ms": self.max * 1000.0,
+            }
+
+
+class ConnectionPool:
+    """
+    A bounded pool of reusable SQLite connections for the sync endpoints.
+
+    Connections are opened lazily, up to `size`, and handed out with
+    `with pool.connection() as conn:`. A caller that finds every connection busy
+    waits up to `timeout` seconds and then gets PoolTimeout. An open transaction
+    is rolled back when a connection is returned.
+    """
+
+    def __init__(self, connect, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._timeouts = 0
+        self._wait = _WaitStats()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection free after {self.timeout:.1f}s."
+                    )
+
+        self._wait.record(time.perf_counter() - started)
+        with self._lock:
+            self._in_use += 1
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # A broken connection is dropped; the next caller opens a new one.
+            conn.close()
+            with self._lock:
+                self._created -= 1
+                self._in_use -= 1
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def close(self):
+        """Closes the idle connections (call once nothing uses the pool any more)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "timeouts": self._timeouts,
+            }
+        stats.update(self._wait.snapshot())
+        return stats
+
+
+class AsyncReader:
+    """
+    Runs SQLite reads for async code on a bounded thread pool, so a slow query or
+    a locked database never blocks the event loop.
+
+    Each thread keeps one persistent read-only connection. `await reader.run(fn,
+    *args)` calls fn(conn, *args) on one of the threads. The wait time is the
+    time a call spends queued before a thread picks it up.
+    """
+
+    def __init__(self, connect, threads: int = DB_READ_THREADS):
+        self._connect = connect
+        self.threads = threads
+        self._executor = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._calls_in_flight = 0
+        self._wait = _WaitStats()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.threads, thread_name_prefix="db-read"
+                )
+            return self._executor
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    async def run(self, fn, *args):
+        submitted = time.perf_counter()
+
+        def call():
+            self._wait.record(time.perf_counter() - submitted)
+            return fn(self._thread_connection(), *args)
+
+        with self._lock:
+            self._calls_in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            with self._lock:
+                self._calls_in_flight -= 1
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        # Threads created later get fresh connections.
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "threads": self.threads,
+                "connections": len(self._connections),
+                "in_flight": self._calls_in_flight,
+            }
+        stats.update(self._wait.snapshot())
+        return stats
+
+
+# Shared by the API process: a pool for the sync endpoints (read-only when several
+# workers run, see control.py for their writes), read-only threads for the event loop.
+db_pool = ConnectionPool(lambda: get_db_connection(read_only=API_READ_ONLY, shared=True))
+async_reader = AsyncReader(lambda: get_db_connection(read_only=True, shared=True))
@@ -0,0 +1,594 @@
+# Sharded ingestion for a large symbol universe. The symbols are spread over several
+# websocket connections, each owned by a shard process that parses trades and sends
+# them in batches to the ingestor process. There a single collector thread publishes
+# them to the tick rings and hands them to the tick writer, so the rings, the metrics
+# block and SQLite each keep exactly one writer.
+#
+# Shards change their subscriptions on the live connection with the combined stream's
+# SUBSCRIBE / UNSUBSCRIBE methods. A symbol moved by the rebalancer is subscribed on
+# its new shard first and dropped from the old one only once that is confirmed;
+# trades delivered by both during the handover are dropped by trade id (the two
+# connections' batches interleave, so every id seen recently is remembered).
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import orjson
+import websocket
+
+from config import (
+    INGEST_HANDOVER_IDS,
+    INGEST_REBALANCE_INTERVAL,
+    INGEST_REBALANCE_MAX_MOVES,
+    INGEST_REBALANCE_THRESHOLD,
+    INGEST_SHARD_BATCH_SIZE,
+    INGEST_SHARD_FLUSH_INTERVAL,
+    INGEST_SHARD_STATS_INTERVAL,
+    INGEST_SUBSCRIBE_TIMEOUT,
+    STREAM_BASE_URL,
+)
+from metrics import ingest_metrics
+
+RECONNECT_DELAY = 5.0
+
+
+# --- Stream messages ---
+
+
+def stream_url(symbols) -> str:
+    """Combined-stream URL subscribing to the `@trade` stream of every symbol."""
+    return STREAM_BASE_URL + "?streams=" + "/".join(f"{s.lower()}@trade" for s in symbols)
+
+
+def parse_trade(data: dict):
+    """
+    The (timestamp, symbol, price, quantity, trade_id) tick of a decoded
+    combined-stream trade message, or None for any other message (such as a
+    SUBSCRIBE response). Raises ValueError for a malformed trade.
+    """
+    trade = data.get("data")
+    if trade is None:
+        return None
+    try:
+        return trade["T"], trade["s"], float(trade["p"]), float(trade["q"]), trade["t"]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed trade message: {e!r}") from e
+
+
+# --- Assignment ---
+
+
+def assign_symbols(symbols, shards: int, rates: dict = None) -> list:
+    """
+    Spreads `symbols` over `shards` lists, busiest first, each onto the shard with
+    the lowest load so far. Without `rates` (trades per second by symbol) every
+    symbol weighs the same, which deals them out in turn.
+    """
+    rates = rates or {}
+    assignment = [[] for _ in range(shards)]
+    loads = [0.0] * shards
+    for symbol in sorted(symbols, key=lambda s: -rates.get(s, 1.0)):
+        shard = min(range(shards), key=lambda i: (loads[i], len(assignment[i])))
+        assignment[shard].append(symbol)
+        loads[shard] += rates.get(symbol, 1.0)
+    return assignment
+
+
+def plan_moves(
+    assignment,
+    rates: dict,
+    threshold: float = INGEST_REBALANCE_THRESHOLD,
+    max_moves: int = INGEST_REBALANCE_MAX_MOVES,
+) -> list:
+    """
+    Returns (symbol, from_shard, to_shard) moves that even out the shard loads,
+    the sum of their symbols' trade rates. Nothing moves while the busiest shard
+    is within `threshold` times the mean. Each move takes the symbol of the
+    busiest shard whose rate is closest to half the gap to the idlest shard,
+    which always lowers the larger of the two loads. A shard keeps at least one
+    symbol.
+    """
+    shards = [list(symbols) for symbols in assignment]
+    loads = [sum(rates.get(s, 0.0) for s in symbols) for symbols in shards]
+    mean = sum(loads) / len(loads) if loads else 0.0
+    if mean <= 0 or max(loads) <= threshold * mean:
+        return []
+
+    moves = []
+    while len(moves) < max_moves and max(loads) > threshold * mean:
+        hot = max(range(len(shards)), key=loads.__getitem__)
+        cold = min(range(len(shards)), key=loads.__getitem__)
+        gap = loads[hot] - loads[cold]
+        candidates = [s for s in shards[hot] if 0 < rates.get(s, 0.0) < gap]
+        if len(shards[hot]) < 2 or not candidates:
+            break
+        symbol = min(candidates, key=lambda s: abs(rates[s] - gap / 2))
+        shards[hot].remove(symbol)
+        shards[cold].append(symbol)
+        loads[hot] -= rates[symbol]
+        loads[cold] += rates[symbol]
+        moves.append((symbol, hot, cold))
+    return moves
+
+
+# --- Shard process ---
+
+
+class ShardConnection:
+    """
+    One shard's websocket connection, run inside the shard process.
+
+    Trades are parsed on the websocket thread and sent to the ingestor through
+    `output` in batches, every INGEST_SHARD_FLUSH_INTERVAL seconds or as soon as
+    INGEST_SHARD_BATCH_SIZE ticks are waiting. Messages put on `output`:
+
+        ("ticks", shard, ticks, invalid)   parsed ticks and malformed message count
+        ("connected", shard)  /  ("disconnected", shard)
+        ("ack", shard, generation, ok)     assignment `generation` is live
+
+    assign() changes the subscriptions of the open connection (or of the next
+    one, while disconnected).
+    """
+
+    def __init__(self, shard: int, symbols, output):
+        self.shard = shard
+        self._output = output
+        self._lock = threading.Lock()
+        self._batch = []
+        self._invalid = 0
+        self._stop = threading.Event()
+
+        self._ws = None
+        self._symbols = list(symbols)  # wanted
+        self._connect_symbols = []  # in the URL of the current connection
+        self._live = None  # subscribed on the open connection, None while disconnected
+        self._generation = 0
+        self._next_request = 1
+        self._pending = {}  # request id -> generation it belongs to
+
+    # --- Batching ---
+
+    def _take_batch(self):
+        with self._lock:
+            batch, invalid = self._batch, self._invalid
+            self._batch, self._invalid = [], 0
+        if batch or invalid:
+            self._output.put(("ticks", self.shard, batch, invalid))
+
+    def _flush_loop(self):
+        while not self._stop.wait(INGEST_SHARD_FLUSH_INTERVAL):
+            self._take_batch()
+
+    # --- Websocket callbacks ---
+
+    def _on_open(self, ws):
+        print(f"--- Ingest shard {self.shard}: connected ({len(self._symbols)} symbols) ---")
+        self._output.put(("connected", self.shard))
+        with self._lock:
+            self._live = set(self._connect_symbols)
+        self._sync()
+
+    def _on_message(self, ws, message):
+        try:
+            data = orjson.loads(message)
+            tick = parse_trade(data)
+        except ValueError:
+            with self._lock:
+                self._invalid += 1
+            return
+        if tick is None:
+            if "id" in data:
+                self._on_response(data)
+            return
+        with self._lock:
+            self._batch.append(tick)
+            full = len(self._batch) >= INGEST_SHARD_BATCH_SIZE
+        if full:
+            self._take_batch()
+
+    def _on_error(self, ws, error):
+        print(f"--- Ingest shard {self.shard} error: {error} ---")
+
+    def _on_close(self, ws, close_status_code, close_msg):
+        with self._lock:
+            self._live = None
+            self._pending.clear()
+        self._output.put(("disconnected", self.shard))
+
+    # --- Subscriptions ---
+
+    def _on_response(self, data: dict):
+        ok = data.get("error") is None
+        if not ok:
+            print(f"--- Ingest shard {self.shard}: subscription request failed: {data['error']} ---")
+        with self._lock:
+            generation = self._pending.pop(data["id"], None)
+            done = generation is not None and generation not in self._pending.values()
+        if done:
+            self._ack(generation, ok)
+
+    def _ack(self, generation: int, ok: bool = True):
+        # Ticks received before the acknowledgement go out first.
+        self._take_batch()
+        self._output.put(("ack", self.shard, generation, ok))
+
+    def _sync(self):
+        """Sends the SUBSCRIBE / UNSUBSCRIBE requests that turn the live set into the wanted one."""
+        with self._lock:
+            if self._live is None:
+                return
+            generation = self._generation
+            wanted = set(self._symbols)
+            requests = []
+            for method, symbols in (
+                ("SUBSCRIBE", wanted - self._live),
+                ("UNSUBSCRIBE", self._live - wanted),
+            ):
+                if symbols:
+                    request_id = self._next_request
+                    self._next_request += 1
+                    self._pending[request_id] = generation
+                    params = [f"{s.lower()}@trade" for s in sorted(symbols)]
+                    requests.append({"method": method, "params": params, "id": request_id})
+            self._live = wanted
+            ws = self._ws
+        if not requests:
+            self._ack(generation)
+            return
+        for request in requests:
+            try:
+                ws.send(orjson.dumps(request).decode())
+            except Exception as e:
+                # The connection is going away; the next one subscribes from the URL.
+                print(f"--- Ingest shard {self.shard}: could not send {request['method']}: {e} ---")
+
+    def assign(self, generation: int, symbols):
+        with self._lock:
+            self._generation = generation
+            self._symbols = list(symbols)
+        self._sync()
+
+    # --- Lifecycle ---
+
+    def run_forever(self):
+        threading.Thread(target=self._flush_loop, name="ShardFlush", daemon=True).start()
+        while not self._stop.is_set():
+            with self._lock:
+                self._connect_symbols = list(self._symbols)
+            self._ws = websocket.WebSocketApp(
+                stream_url(self._connect_symbols),
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            self._ws.run_forever()
+            if self._stop.wait(RECONNECT_DELAY):
+                break
+            print(f"--- Ingest shard {self.shard}: reconnecting... ---")
+
+    def stop(self):
+        self._stop.set()
+        if self._ws is not None:
+            self._ws.close()
+
+
+def run_shard(shard: int, symbols, output, commands):
+    """
+    Entry point of a shard process. Runs the connection on a thread and applies
+    ("assign", generation, symbols) commands until ("stop",) or until the
+    ingestor process is gone.
+    """
+    connection = ShardConnection(shard, symbols, output)
+    threading.Thread(target=connection.run_forever, name="ShardConnection", daemon=True).start()
+    parent = os.getppid()
+    while True:
+        try:
+            command = commands.get(timeout=1.0)
+        except queue.Empty:
+            if os.getppid() != parent:
+                break
+            continue
+        if command[0] == "assign":
+            connection.assign(command[1], command[2])
+        elif command[0] == "stop":
+            break
+    connection.stop()
+    # Anything still buffered is dropped with the process.
+    output.cancel_join_thread()
+
+
+# --- Coordinator (ingestor process) ---
+
+
+class _RecentIds:
+    """The last `capacity` distinct trade ids of a symbol, in arrival order."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ids = set()
+        self._order = deque()
+
+    def add(self, trade_id: int) -> bool:
+        """Remembers a trade id; False if it was already seen."""
+        if trade_id in self._ids:
+            return False
+        self._ids.add(trade_id)
+        self._order.append(trade_id)
+        if len(self._order) > self.capacity:
+            self._ids.discard(self._order.popleft())
+        return True
+
+
+class _Shard:
+    def __init__(self, index: int, symbols):
+        self.index = index
+        self.symbols = list(symbols)
+        self.process = None
+        self.commands = None
+        self.generation = 0
+        self.acked = 0
+        self.failed = False
+        self.connected = False
+        self.ticks = 0
+        self.invalid = 0
+        self.connects = 0
+        self.restarts = 0
+
+
+class ShardCoordinator:
+    """
+    Runs the shard processes of the ingestor and feeds their ticks to `sink`.
+
+    `sink(ticks)` is called on the collector thread with each batch of
+    (timestamp, symbol, price, quantity, trade_id) ticks. run() supervises the
+    shards (restarting any that died), logs per-shard throughput and rebalances
+    hot symbols; it blocks until stop().
+    """
+
+    def __init__(self, symbols, shards: int, sink):
+        self.symbols = list(symbols)
+        self._sink = sink
+        # Shard processes are spawned: the ingestor already runs threads, which
+        # a forked child would inherit in an undefined state.
+        self._context = multiprocessing.get_context("spawn")
+        self._output = self._context.Queue()
+        self._shards = [
+            _Shard(i, symbols)
+            for i, symbols in enumerate(assign_symbols(self.symbols, min(shards, len(self.symbols))))
+        ]
+        self._lock = threading.Lock()
+        self._acked = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._counts = Counter()  # ticks received per symbol
+        self._handover = {}  # symbol -> _RecentIds of its trades while it moves
+        self.duplicates = 0
+        self.rebalances = 0
+        self.moved = 0
+        self._logged = {}  # shard -> ticks at the previous stats line
+
+    # --- Shard processes ---
+
+    def _start_shard(self, shard: _Shard):
+        shard.commands = self._context.Queue()
+        shard.process = self._context.Process(
+            target=run_shard,
+            args=(shard.index, shard.symbols, self._output, shard.commands),
+            name=f"IngestShard-{shard.index}",
+            daemon=True,
+        )
+        shard.process.start()
+        with self._lock:
+            # The new process subscribes to shard.symbols from its URL.
+            shard.acked = shard.generation
+        ingest_metrics.shard_symbols(shard.index, len(shard.symbols))
+
+    def _assign(self, shard: _Shard, symbols) -> int:
+        with self._lock:
+            shard.generation += 1
+            shard.symbols = list(symbols)
+            generation = shard.generation
+        shard.commands.put(("assign", generation, list(symbols)))
+        ingest_metrics.shard_symbols(shard.index, len(symbols))
+        return generation
+
+    def _wait_acked(self, generations: dict, timeout: float) -> bool:
+        """Waits until every shard in {shard: generation} confirmed it; False on timeout or error."""
+        deadline = time.monotonic() + timeout
+        with self._acked:
+            while True:
+                if any(shard.failed for shard in generations):
+                    return False
+                if all(shard.acked >= generation for shard, generation in generations.items()):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._acked.wait(remaining)
+
+    # --- Collector ---
+
+    def _collect(self):
+        while not self._stop.is_set():
+            try:
+                message = self._output.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            kind, shard = message[0], self._shards[message[1]]
+            if kind == "ticks":
+                ticks, invalid = message[2], message[3]
+                if self._handover:
+                    ticks = self._drop_duplicates(ticks)
+                if ticks:
+                    self._sink(ticks)
+                    self._counts.update(tick[1] for tick in ticks)
+                shard.ticks += len(ticks)
+                shard.invalid += invalid
+                ingest_metrics.shard_ticks(shard.index, len(ticks))
+                if invalid:
+                    ingest_metrics.message_invalid(invalid)
+            elif kind == "connected":
+                shard.connected = True
+                shard.connects += 1
+                ingest_metrics.connected(shard.index)
+            elif kind == "disconnected":
+                shard.connected = False
+                ingest_metrics.disconnected(shard.index)
+            elif kind == "ack":
+                with self._acked:
+                    shard.acked = max(shard.acked, message[2])
+                    shard.failed = shard.failed or not message[3]
+                    self._acked.notify_all()
+
+    def _drop_duplicates(self, ticks: list) -> list:
+        kept = []
+        with self._lock:
+            for tick in ticks:
+                seen = self._handover.get(tick[1])
+                if seen is not None and not seen.add(tick[4]):
+                    self.duplicates += 1
+                    continue
+                kept.append(tick)
+        return kept
+
+    def _start_handover(self, symbols):
+        with self._lock:
+            for symbol in symbols:
+                self._handover[symbol] = _RecentIds(INGEST_HANDOVER_IDS)
+
+    # --- Rebalancing ---
+
+    def rebalance(self, rates: dict) -> list:
+        """
+        Moves hot symbols off overloaded shards (see plan_moves). Each symbol is
+        subscribed on its new shard, and only once every new shard confirmed it
+        unsubscribed from its old one. Returns the moves made.
+        """
+        moves = plan_moves([shard.symbols for shard in self._shards], rates)
+        if not moves:
+            return []
+
+        moving = [symbol for symbol, _, _ in moves]
+        self._start_handover(moving)
+        with self._lock:
+            for shard in self._shards:
+                shard.failed = False
+
+        incoming, outgoing = {}, {}
+        for symbol, source, target in moves:
+            incoming.setdefault(self._shards[target], []).append(symbol)
+            outgoing.setdefault(self._shards[source], []).append(symbol)
+
+        previous = {shard: list(shard.symbols) for shard in incoming}
+        generations = {
+            shard: self._assign(shard, shard.symbols + symbols) for shard, symbols in incoming.items()
+        }
+        if not self._wait_acked(generations, INGEST_SUBSCRIBE_TIMEOUT):
+            print("--- Ingest shards: rebalancing aborted (new subscriptions not confirmed) ---")
+            for shard, symbols in previous.items():
+                self._assign(shard, symbols)
+            with self._lock:
+                for symbol in moving:
+                    self._handover.pop(symbol, None)
+            return []
+
+        generations = {
+            shard: self._assign(shard, [s for s in shard.symbols if s not in symbols])
+            for shard, symbols in outgoing.items()
+        }
+        if not self._wait_acked(generations, INGEST_SUBSCRIBE_TIMEOUT):
+            # Still subscribed on both: duplicates are dropped until the next round.
+            print("--- Ingest shards: old subscriptions not confirmed removed ---")
+        else:
+            with self._lock:
+                for symbol in moving:
+                    self._handover.pop(symbol, None)
+
+        self.rebalances += 1
+        self.moved += len(moves)
+        ingest_metrics.rebalanced(len(moves))
+        print(
+            "--- Ingest shards rebalanced: "
+            + ", ".join(f"{symbol} {source}->{target}" for symbol, source, target in moves)
+            + " ---"
+        )
+        return moves
+
+    # --- Lifecycle ---
+
+    def start(self):
+        for shard in self._shards:
+            self._start_shard(shard)
+        threading.Thread(target=self._collect, name="ShardCollector", daemon=True).start()
+        print(
+            f"--- Started {len(self._shards)} ingest shards for {len(self.symbols)} symbols ---"
+        )
+
+    def run(self):
+        next_stats = time.monotonic() + INGEST_SHARD_STATS_INTERVAL
+        next_rebalance = time.monotonic() + INGEST_REBALANCE_INTERVAL
+        counts_at = dict(self._counts)
+        while not self._stop.wait(1.0):
+            for shard in self._shards:
+                if not shard.process.is_alive():
+                    print(f"--- Ingest shard {shard.index} exited; restarting ---")
+                    shard.restarts += 1
+                    shard.connected = False
+                    ingest_metrics.disconnected(shard.index)
+                    self._start_shard(shard)
+
+            now = time.monotonic()
+            if INGEST_SHARD_STATS_INTERVAL and now >= next_stats:
+                self._log_stats()
+                next_stats = now + INGEST_SHARD_STATS_INTERVAL
+            if INGEST_REBALANCE_INTERVAL and now >= next_rebalance:
+                counts = dict(self._counts)
+                rates = {
+                    symbol: (count - counts_at.get(symbol, 0)) / INGEST_REBALANCE_INTERVAL
+                    for symbol, count in counts.items()
+                }
+                counts_at = counts
+                self.rebalance(rates)
+                next_rebalance = time.monotonic() + INGEST_REBALANCE_INTERVAL
+
+    def stop(self):
+        self._stop.set()
+        for shard in self._shards:
+            if shard.process is not None and shard.process.is_alive():
+                shard.commands.put(("stop",))
+        for shard in self._shards:
+            if shard.process is not None:
+                shard.process.join(5.0)
+                if shard.process.is_alive():
+                    shard.process.terminate()
+
+    def stats(self) -> dict:
+        return {
+            "shards": [
+                {
+                    "shard": shard.index,
+                    "symbols": len(shard.symbols),
+                    "connected": shard.connected,
+                    "ticks": shard.ticks,
+                    "invalid": shard.invalid,
+                    "connects": shard.connects,
+                    "restarts": shard.restarts,
+                }
+                for shard in self._shards
+            ],
+            "rebalances": self.rebalances,
+            "symbols_moved": self.moved,
+            "duplicates_dropped": self.duplicates,
+        }
+
+    def _log_stats(self):
+        parts = []
+        for shard in self._shards:
+            rate = (shard.ticks - self._logged.get(shard.index, 0)) / INGEST_SHARD_STATS_INTERVAL
+            parts.append(f"#{shard.index} {len(shard.symbols)} sym {rate:,.0f}/s")
+        self._logged = {shard.index: shard.ticks for shard in self._shards}
+        print(f"--- Ingest shards: {' | '.join(parts)} ---")
@@ -1,22 +1,40 @@
+import signal
 import websocket
-import json
-import sqlite3
+import orjson
 import time
+from config import API_READ_ONLY, INGEST_SHARDS, SUPPORTED_SYMBOLS
+from ingest_shards import ShardCoordinator, parse_trade, stream_url
+from tick_writer import TickWriter
+from tick_ring import open_rings
+from archive import ArchiveWorker
+from control import ControlServer
 from database import get_db_connection
-from config import SUPPORTED_SYMBOLS
+from metrics import ingest_metrics
 
 
-streams = [f"{s.lower()}@trade" for s in SUPPORTED_SYMBOLS]
-STREAM_URL = "wss://stream.binance.com:9443/stream?streams=" + "/".join(streams)
+STREAM_URL = stream_url(SUPPORTED_SYMBOLS)
 
 print(STREAM_URL)
 
+# Single writer shared by every websocket connection of this process.
+tick_writer = TickWriter()
+
+# Moves aged ticks from SQLite into the columnar archive.
+archive_worker = ArchiveWorker(get_db_connection)
+
+# Executes the database writes of read-only API workers (multi-worker mode only).
+control_server = ControlServer(get_db_connection)
+
+# Shared-memory rings the API reads live ticks from. Opened in run_ingestor().
+tick_rings = {}
+
 
 def on_open(ws):
     """
     Called when the WebSocket connection is successfully opened.
     """
     print("--- Ingestor WebSocket Connection Opened ---")
+    ingest_metrics.connected()
     print(f"--- Subscribed to streams: {', '.join(SUPPORTED_SYMBOLS)} ---")
 
 
@@ -32,45 +50,39 @@ def on_close(ws, close_status_code, close_msg):
     Called when the WebSocket connection is closed.
     """
     print("--- Ingestor WebSocket Connection Closed ---")
+    ingest_metrics.disconnected()
 
 
-def on_message(ws, message):
+def accept_ticks(ticks):
     """
-    For every message received from the WebSocket.
+    Takes parsed (timestamp, symbol, price, quantity, trade_id) ticks from a single
+    thread (the websocket thread, or the shard collector with several shards).
     """
-    # The message from Binance is a JSON string.
-    data = json.loads(message)
+    for tick in ticks:
+        timestamp, symbol, price, quantity, _ = tick
+        ingest_metrics.tick(symbol, timestamp)
 
-    if "data" in data:
-        trade_data = data["data"]
+        # Publish to the live path first, then hand the tick over to the writer
+        # thread for durability; no database work happens here.
+        ring = tick_rings.get(symbol)
+        if ring is not None:
+            ring.publish(timestamp, price, quantity)
+        tick_writer.put(tick)
 
-        # Extract the relevant fields from the trade data.
-        timestamp = trade_data["T"]
-        symbol = trade_data["s"]
-        price = float(trade_data["p"])
-        quantity = float(trade_data["q"])
 
-        # print(f"Tick: {symbol} - Price: {price}, Qty: {quantity}")
-
-        try:
-            # Get a new database connection for this transaction
-            conn = get_db_connection()
-            cursor = conn.cursor()
-
-            # Execute the INSERT statement to save the tick data
-            cursor.execute(
-                "INSERT INTO raw_ticks (timestamp, symbol, price, quantity) VALUES (?, ?, ?, ?)",
-                (timestamp, symbol, price, quantity),
-            )
-
-            # Commit the transaction to make the changes permanent
-            conn.commit()
-            conn.close()
+def on_message(ws, message):
+    """
+    For every message received from the WebSocket.
+    """
+    # The message from Binance is a JSON string.
+    try:
+        tick = parse_trade(orjson.loads(message))
+    except ValueError:
+        ingest_metrics.message_invalid()
+        return
 
-        except sqlite3.Error as e:
-            print(f"--- Database Error: {e} ---")
-        except Exception as e:
-            print(f"--- An error occurred: {e} ---")
+    if tick is not None:
+        accept_ticks((tick,))
 
 
 def start_websocket_app():
@@ -97,6 +109,41 @@ def run_ingestor():
     """
     print("--- Starting Ingestor Process ---")
 
+    # app.py stops the ingestor with SIGTERM: exit through the finally blocks, so
+    # the shards are stopped and the queued ticks are written.
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
+    # The writer thread, the archive job, the control channel, the rings and the
+    # metrics block outlive individual websocket connections.
+    ingest_metrics.open()
+    tick_writer.start()
+    archive_worker.start()
+    if API_READ_ONLY:
+        control_server.start()
+    tick_rings.update(open_rings(SUPPORTED_SYMBOLS))
+
+    try:
+        if INGEST_SHARDS > 1:
+            # Several connections in shard processes; this process collects their ticks.
+            coordinator = ShardCoordinator(SUPPORTED_SYMBOLS, INGEST_SHARDS, accept_ticks)
+            coordinator.start()
+            try:
+                coordinator.run()
+            finally:
+                coordinator.stop()
+        else:
+            run_connection_loop()
+    finally:
+        tick_writer.stop()
+        print("--- Ingestor Process stopped ---")
+
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(0)
+
+
+def run_connection_loop():
+    """Keeps the single websocket connection alive, reconnecting after every disconnect."""
     while True:
         try:
             # Start the WebSocket app. This function will block until it disconnects.
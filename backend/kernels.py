@@ -0,0 +1,221 @@
+import numpy as np
+
+
+def _as_float64(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def ols_fit(y, x) -> tuple:
+    """
+    Closed-form OLS of y = a + b*x. Returns (slope b, intercept a), or (nan, nan)
+    when x is constant.
+
+    The moments are accumulated in one pass of dot products over the data shifted
+    by its first observation, which keeps price-level series well conditioned.
+    """
+    y = _as_float64(y)
+    x = _as_float64(x)
+    n = len(x)
+    if n < 2:
+        return float("nan"), float("nan")
+
+    dx = x - x[0]
+    dy = y - y[0]
+    sx, sy = dx.sum(), dy.sum()
+    sxx = np.dot(dx, dx) - sx * sx / n
+    sxy = np.dot(dx, dy) - sx * sy / n
+    if sxx <= 0.0:
+        return float("nan"), float("nan")
+
+    slope = sxy / sxx
+    intercept = (y[0] + sy / n) - slope * (x[0] + sx / n)
+    return float(slope), float(intercept)
+
+
+def pair_kernel(y, x) -> dict:
+    """
+    Everything the pair chart needs from one regression, on float64 arrays:
+    hedge_ratio, intercept, spread (y - b*x), spread_mean, spread_std (ddof=1),
+    z_score and regression_line (a + b*x).
+
+    Matches calculate_hedge_ratio / calculate_spread / calculate_zscore and the
+    statsmodels prediction the endpoint used to make, including a zero z-score
+    for a flat spread.
+    """
+    y = _as_float64(y)
+    x = _as_float64(x)
+    slope, intercept = ols_fit(y, x)
+
+    spread = y - slope * x
+    spread_mean = spread.mean() if len(spread) else float("nan")
+    spread_std = spread.std(ddof=1) if len(spread) > 1 else float("nan")
+    if spread_std == 0:
+        z_score = np.zeros_like(spread)
+    else:
+        z_score = (spread - spread_mean) / spread_std
+
+    return {
+        "hedge_ratio": slope,
+        "intercept": intercept,
+        "spread": spread,
+        "spread_mean": float(spread_mean),
+        "spread_std": float(spread_std),
+        "z_score": z_score,
+        "regression_line": intercept + slope * x,
+    }
+
+
+# --- Time-varying fits ---
+# The rolling and EWMA kernels fit Y = a + b*X at every bar on the bars up to and
+# including it, so no value depends on later data. Both derive everything from the
+# means and (co)variances of the lookback, like OnlinePairAnalytics:
+#
+#     hedge_ratio = cov(x, y) / var(x)      spread_mean = intercept
+#     spread_var  = var(y) - 2 * hedge_ratio * cov(x, y) + hedge_ratio^2 * var(x)
+#
+# and the z-score of a bar is its spread against the mean/std of its own lookback.
+
+
+_KERNEL_FIELDS = ("hedge_ratio", "intercept", "spread", "spread_mean", "spread_std", "z_score", "regression_line")
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of every trailing window of `window` values, from prefix sums (NaN before the first full window)."""
+    prefix = np.concatenate(([0.0], np.cumsum(values)))
+    sums = np.full(len(values), np.nan)
+    sums[window - 1 :] = prefix[window:] - prefix[:-window]
+    return sums
+
+
+def _ewm_mean(values: np.ndarray, alpha: float) -> np.ndarray:
+    """pandas ewm(alpha=alpha, adjust=False).mean(), as a first-order IIR filter."""
+    from scipy.signal import lfilter
+
+    if len(values) == 0:
+        return values.copy()
+    filtered, _ = lfilter([alpha], [1.0, alpha - 1.0], values, zi=[(1.0 - alpha) * values[0]])
+    return filtered
+
+
+def _moments_kernel(y, x, mean_x, mean_y, var_x, var_y, cov_xy, scale_x) -> dict:
+    """
+    Per-bar fit from the lookback moments. A lookback whose var(x) is zero, up to
+    the rounding of the moment sums relative to `scale_x`, has no hedge ratio.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        flat = ~(var_x > 1e-9 * scale_x)
+        hedge_ratio = np.where(flat, np.nan, cov_xy / var_x)
+        intercept = mean_y - hedge_ratio * mean_x
+        spread_var = var_y - 2 * hedge_ratio * cov_xy + hedge_ratio * hedge_ratio * var_x
+        spread_std = np.sqrt(np.maximum(spread_var, 0.0))
+        spread = y - hedge_ratio * x
+        z_score = (spread - intercept) / spread_std
+        z_score[spread_std == 0] = 0.0
+    return {
+        "hedge_ratio": hedge_ratio,
+        "intercept": intercept,
+        "spread": spread,
+        "spread_mean": intercept,
+        "spread_std": spread_std,
+        "z_score": z_score,
+        "regression_line": intercept + hedge_ratio * x,
+    }
+
+
+def rolling_pair_kernel(y, x, window: int) -> dict:
+    """
+    pair_kernel refitted on every trailing window of `window` bars, in O(n): the
+    window moments come from prefix sums of the data shifted by its first
+    observation. Every value is an array; the first window - 1 bars are NaN.
+    From the first full window on it matches OnlinePairAnalytics(window=window)
+    fed the same bars.
+    """
+    y = _as_float64(y)
+    x = _as_float64(x)
+    n = len(x)
+    if window < 2 or n < window:
+        nan = np.full(n, np.nan)
+        return {name: nan.copy() for name in _KERNEL_FIELDS}
+
+    dx = x - x[0]
+    dy = y - y[0]
+    sx, sy = _window_sums(dx, window), _window_sums(dy, window)
+    sxx = _window_sums(dx * dx, window)
+    syy = _window_sums(dy * dy, window)
+    sxy = _window_sums(dx * dy, window)
+
+    d = window - 1
+    var_x = (sxx - sx * sx / window) / d
+    var_y = (syy - sy * sy / window) / d
+    cov_xy = (sxy - sx * sy / window) / d
+    mean_x = x[0] + sx / window
+    mean_y = y[0] + sy / window
+    return _moments_kernel(y, x, mean_x, mean_y, var_x, var_y, cov_xy, sxx / d)
+
+
+def ewma_pair_kernel(y, x, halflife: float) -> dict:
+    """
+    pair_kernel with exponentially decaying weights (half-life in bars) instead
+    of a window, in O(n). Means and variances are those of pandas
+    ewm(adjust=False) with bias=True, starting at the first bar, which is NaN.
+    Matches OnlinePairAnalytics(halflife=halflife) fed the same bars.
+    """
+    y = _as_float64(y)
+    x = _as_float64(x)
+    alpha = 1 - 0.5 ** (1.0 / halflife)
+
+    dx = x - x[0] if len(x) else x
+    dy = y - y[0] if len(y) else y
+    mx, my = _ewm_mean(dx, alpha), _ewm_mean(dy, alpha)
+    mxx = _ewm_mean(dx * dx, alpha)
+    var_x = mxx - mx * mx
+    var_y = _ewm_mean(dy * dy, alpha) - my * my
+    cov_xy = _ewm_mean(dx * dy, alpha) - mx * my
+    if len(x):
+        var_x[0] = np.nan
+    return _moments_kernel(y, x, x[0] + mx if len(x) else mx, y[0] + my if len(y) else my, var_x, var_y, cov_xy, mxx)
+
+
+def lttb_buckets(n: int, n_out: int) -> np.ndarray:
+    """
+    Bucket edges of Largest-Triangle-Three-Buckets over n points: the first and
+    the last point are buckets of their own and the rest is split into n_out - 2
+    buckets of (almost) equal size. Returns n_out + 1 offsets, bucket i being
+    [edges[i], edges[i + 1]). Requires 3 <= n_out <= n.
+    """
+    edges = np.empty(n_out + 1, dtype=np.int64)
+    edges[0] = 0
+    edges[1:-1] = 1 + (np.arange(n_out - 1) * (n - 2)) // (n_out - 2)
+    edges[-1] = n
+    return edges
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Indices of the n_out points Largest-Triangle-Three-Buckets keeps of the line
+    (x, y): per bucket, the point spanning the largest triangle with the point
+    kept before it and the mean of the next bucket, which preserves peaks and
+    troughs. NaN y values count as 0. Returns every index when n_out >= len(x).
+    """
+    x = _as_float64(x)
+    y = np.nan_to_num(_as_float64(y))
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = lttb_buckets(n, n_out)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / counts
+    mean_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    a = 0
+    for i in range(1, n_out - 1):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - mean_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (mean_y[i + 1] - ay))
+        a = lo + int(np.argmax(area))
+        kept[i] = a
+    return kept
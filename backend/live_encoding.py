@@ -0,0 +1,65 @@
+import struct
+
+import orjson
+
+
+# Wire formats of /ws/live-data, chosen per connection with ?encoding=.
+#
+# "json" (default): one text frame per packet, the packet dict as JSON. A NaN or
+# infinite value (a z-score before the spread has any variance) is sent as null.
+#
+# "binary": one binary frame per packet, little-endian:
+#   byte 0      frame type: FRAME_KEY or FRAME_DELTA
+#   KEY:        int64 timestamp (ms since epoch)
+#   DELTA:      uint32 milliseconds since the previous frame on this connection
+#   then        5 x float64: y_price, x_price, spread, z_score, regression_line_value
+# The first frame of a connection is always a KEY frame. Alert events stay JSON
+# text frames in both encodings.
+ENCODINGS = ("json", "binary")
+
+FRAME_KEY = 1
+FRAME_DELTA = 2
+
+VALUE_FIELDS = ("y_price", "x_price", "spread", "z_score", "regression_line_value")
+
+_VALUES = struct.Struct("<5d")
+_KEY_HEADER = struct.Struct("<Bq")
+_DELTA_HEADER = struct.Struct("<BI")
+_MAX_DELTA = 2**32 - 1
+
+
+def encode_json(packet: dict) -> str:
+    # orjson writes NaN/inf as null; json.dumps would emit bare NaN, which is not JSON.
+    return orjson.dumps(packet, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def encode_values(packet: dict) -> bytes:
+    """The timestamp-independent part of a binary frame, shared by all clients."""
+    return _VALUES.pack(*(packet[name] for name in VALUE_FIELDS))
+
+
+def binary_frame(timestamp: int, values: bytes, previous_timestamp=None) -> bytes:
+    """Prefixes encoded values with a KEY or DELTA header for one connection."""
+    if previous_timestamp is not None:
+        delta = timestamp - previous_timestamp
+        if 0 <= delta <= _MAX_DELTA:
+            return _DELTA_HEADER.pack(FRAME_DELTA, delta) + values
+    return _KEY_HEADER.pack(FRAME_KEY, timestamp) + values
+
+
+def decode_binary_frame(frame: bytes, previous_timestamp=None) -> dict:
+    """Decodes one binary frame; `previous_timestamp` is the last decoded timestamp."""
+    if frame[0] == FRAME_KEY:
+        _, timestamp = _KEY_HEADER.unpack_from(frame)
+        offset = _KEY_HEADER.size
+    elif frame[0] == FRAME_DELTA:
+        if previous_timestamp is None:
+            raise ValueError("DELTA frame without a preceding KEY frame.")
+        _, delta = _DELTA_HEADER.unpack_from(frame)
+        timestamp = previous_timestamp + delta
+        offset = _DELTA_HEADER.size
+    else:
+        raise ValueError(f"Unknown frame type {frame[0]}.")
+    packet = dict(zip(VALUE_FIELDS, _VALUES.unpack_from(frame, offset)))
+    packet["timestamp"] = timestamp
+    return packet
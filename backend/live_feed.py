@@ -0,0 +1,487 @@
+import asyncio
+import time
+from collections import deque
+
+import pandas as pd
+
+from config import (
+    ALERT_PIN_RETRY_MAX,
+    ALERT_PIN_RETRY_MIN,
+    API_READ_ONLY,
+    LIVE_DEFAULT_MAX_RATE,
+    LIVE_POLL_INTERVAL,
+    LIVE_SEND_QUEUE_SIZE,
+    LIVE_UPDATE_INTERVAL,
+)
+from control import execute_write
+from db_pool import async_reader
+from live_encoding import binary_frame, encode_json, encode_values
+from metrics import tick_to_send_lag
+from tick_ring import TickRingRegistry
+from tick_store import latest_tick
+
+
+class LiveFeedError(Exception):
+    """Raised when the live feed for a pair cannot be started."""
+
+
+# Shared-memory rings published by the ingestor process (attached lazily).
+tick_rings = TickRingRegistry()
+
+
+async def get_latest_tick(symbol: str):
+    """
+    Returns the newest tick for a symbol as {"price", "timestamp"}.
+    Reads the shared-memory ring when the ingestor publishes one, and only falls
+    back to SQLite when it doesn't (e.g. the API is running without the ingestor).
+    The fallback query runs on the read threads, never on the event loop.
+    """
+    ring = tick_rings.get(symbol)
+    if ring is not None:
+        tick = ring.latest()
+        if tick is not None:
+            return {"timestamp": tick[0], "price": tick[1]}
+
+    return await async_reader.run(latest_tick, symbol)
+
+
+class Subscription:
+    """
+    One client's view of a pair publisher.
+
+    Live packets are coalesced: only the newest one is kept, and it is released
+    at most `max_rate` times per second (None = as fast as they come), so a client
+    gets the latest state at its own pace and never blocks the publisher. Events
+    such as alerts go through a bounded queue and are released immediately; when
+    the client falls behind, the oldest queued event is dropped.
+
+    `encoding` is one of live_encoding.ENCODINGS. get() returns str for text
+    frames and bytes for binary frames. Releasing a packet that carries the
+    exchange time of its newest trade records the tick-to-send lag.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = LIVE_SEND_QUEUE_SIZE,
+        max_rate: float = None,
+        encoding: str = "json",
+    ):
+        self.encoding = encoding
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self._maxsize = maxsize
+        self._events = deque()
+        self._latest = None  # (timestamp, payload, trade_time) of the newest unsent packet
+        self._last_timestamp = None  # of the last packet sent, for delta frames
+        self._next_send = 0.0
+        self._wake = asyncio.Event()
+        self.dropped = 0
+        self.coalesced = 0
+        self.sent = 0
+
+    def offer(self, message: str):
+        """Queues an event message."""
+        if len(self._events) >= self._maxsize:
+            self._events.popleft()
+            self.dropped += 1
+        self._events.append(message)
+        self._wake.set()
+
+    def offer_packet(self, timestamp: int, payload, trade_time: int = None):
+        """
+        Replaces the pending live packet. `payload` is the JSON text, or the
+        encoded values of a binary frame; `trade_time` is the exchange time (ms)
+        of the newest trade behind it, if the lag should be measured.
+        """
+        if self._latest is not None:
+            self.coalesced += 1
+        self._latest = (timestamp, payload, trade_time)
+        self._wake.set()
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._events:
+                return self._events.popleft()
+
+            timeout = None
+            if self._latest is not None:
+                now = loop.time()
+                if now >= self._next_send:
+                    timestamp, payload, trade_time = self._latest
+                    self._latest = None
+                    self._next_send = now + self.min_interval
+                    if self.encoding == "binary":
+                        payload = binary_frame(timestamp, payload, self._last_timestamp)
+                    self._last_timestamp = timestamp
+                    self.sent += 1
+                    if trade_time is not None:
+                        tick_to_send_lag.observe(max(time.time() - trade_time / 1000.0, 0.0))
+                    return payload
+                timeout = self._next_send - now
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+class PairPublisher:
+    """
+    Computes the live packets of one pair once and fans them out to every
+    subscribed websocket.
+
+    `bootstrap` is a blocking callable returning the seeded OnlinePairAnalytics for
+    the pair (or raising LiveFeedError); it runs once, when the publisher starts.
+    Every new z-score is handed to the alert engine, and triggered alerts are
+    broadcast to this pair's subscribers.
+
+    The publisher is driven by the tick rings: it recomputes only when either
+    symbol has a new tick (checking the ring sequence counters every
+    LIVE_POLL_INTERVAL), and a packet whose values did not change is not sent.
+    Without rings it falls back to polling SQLite every LIVE_UPDATE_INTERVAL.
+
+    A publisher can be pinned, which keeps it running without subscribers so that
+    alerts on pairs nobody is watching still fire.
+    """
+
+    def __init__(self, y_symbol: str, x_symbol: str, bootstrap, alert_engine):
+        self.y_symbol = y_symbol
+        self.x_symbol = x_symbol
+        self.pair = f"{y_symbol}/{x_symbol}"
+        self._bootstrap = bootstrap
+        self._alert_engine = alert_engine
+        self.pinned = False
+        self._subscribers = set()
+        self._task = None
+        # Set once start() has finished; start_error is what it raised, if anything.
+        self.ready = asyncio.Event()
+        self.start_error = None
+        self.online = None
+        self._last_packet = None  # (packet, timestamp, encoded values)
+        self.packets = 0
+        self.suppressed = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def start(self):
+        """Bootstraps the analytics and starts the publishing task."""
+        # The bootstrap reads and fits history: keep it off the event loop.
+        self.online = await asyncio.to_thread(self._bootstrap)
+        self._task = asyncio.create_task(self._run(), name=f"publisher:{self.pair}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def add(self, subscription: Subscription):
+        self._subscribers.add(subscription)
+        # A new client gets the current state right away, even if it is unchanged.
+        if self._last_packet is not None:
+            packet, timestamp, values = self._last_packet
+            subscription.offer_packet(
+                timestamp, values if subscription.encoding == "binary" else encode_json(packet)
+            )
+
+    def remove(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def broadcast(self, event: dict):
+        """Encodes an event once and queues it for every subscriber."""
+        message = encode_json(event)
+        for subscription in self._subscribers:
+            subscription.offer(message)
+
+    def publish(self, packet: dict, timestamp: int, values: bytes, trade_time: int = None):
+        """Hands a live packet to every subscriber, encoded once per encoding in use."""
+        self._last_packet = (packet, timestamp, values)
+        self.packets += 1
+        message = None
+        for subscription in self._subscribers:
+            if subscription.encoding == "binary":
+                subscription.offer_packet(timestamp, values, trade_time)
+            else:
+                if message is None:
+                    message = encode_json(packet)
+                subscription.offer_packet(timestamp, message, trade_time)
+
+    async def wait_for_ticks(self, previous):
+        """
+        Returns once either symbol has a tick newer than the ring sequences in
+        `previous` (None on the first call returns immediately). The result is
+        the value to pass next time.
+        """
+        ring_y = tick_rings.get(self.y_symbol)
+        ring_x = tick_rings.get(self.x_symbol)
+        if ring_y is None or ring_x is None:
+            if previous is not None:
+                await asyncio.sleep(LIVE_UPDATE_INTERVAL)
+            return ()
+
+        while True:
+            sequences = (ring_y.sequence, ring_x.sequence)
+            if sequences != previous:
+                return sequences
+            await asyncio.sleep(LIVE_POLL_INTERVAL)
+
+    async def compute_packet(self, open_bar):
+        """
+        Reads the latest ticks and scores them. Returns (packet, timestamp,
+        trade_time, open_bar), where timestamp is the packet time in ms,
+        trade_time the time of the newer of the two ticks and open_bar is
+        (bucket, y_price, x_price) of the 1s bar that is still forming.
+        """
+        # Get the single most recent tick for each symbol
+        latest_y = await get_latest_tick(self.y_symbol)
+        latest_x = await get_latest_tick(self.x_symbol)
+        if not (latest_y and latest_x):
+            return None, None, None, open_bar
+
+        # When a new second starts, the previous 1s bar is closed: fold its
+        # closing prices into the streaming statistics (O(1)).
+        trade_time = max(latest_y["timestamp"], latest_x["timestamp"])
+        bucket = trade_time // 1000
+        if open_bar is not None and bucket > open_bar[0]:
+            self.online.update(open_bar[1], open_bar[2])
+        open_bar = (bucket, latest_y["price"], latest_x["price"])
+
+        # Score the live prices against the current parameters
+        live = self.online.evaluate(latest_y["price"], latest_x["price"])
+
+        # The timestamp from the DB in common format with timezone data
+        aware_timestamp = pd.to_datetime(latest_y["timestamp"], unit="ms", utc=True)
+
+        packet = {
+            "time": aware_timestamp.isoformat(),
+            "y_price": latest_y["price"],
+            "x_price": latest_x["price"],
+            "spread": live["spread"],
+            "z_score": live["z_score"],
+            "regression_line_value": live["regression_line_value"],
+        }
+        return packet, latest_y["timestamp"], trade_time, open_bar
+
+    async def _run(self):
+        open_bar = None
+        sequences = None
+        while True:
+            # Wait for the next tick of either symbol
+            sequences = await self.wait_for_ticks(sequences)
+            try:
+                packet, timestamp, trade_time, open_bar = await self.compute_packet(open_bar)
+                if packet is None:
+                    continue
+                # Alerts see every packet: a rule added since the last one may
+                # already be triggered by an unchanged z-score.
+                for event in self._alert_engine.evaluate(self.pair, packet["z_score"]):
+                    self.broadcast(event)
+                # Compared as encoded bytes, so an unchanged NaN counts as unchanged.
+                values = encode_values(packet)
+                if self._last_packet is not None and values == self._last_packet[2]:
+                    self.suppressed += 1
+                    continue
+                self.publish(packet, timestamp, values, trade_time)
+            except Exception as e:
+                print(f"An error occurred in the {self.pair} publisher: {e}")
+
+
+class PublisherRegistry:
+    """
+    Keeps one PairPublisher per pair. The publisher is created with the first
+    subscriber (or when the pair gets an alert) and torn down once it has neither.
+
+    A new publisher is registered under the lock but bootstrapped outside it, so a
+    slow bootstrap holds up only the subscribers of its own pair, which wait for
+    its `ready` event.
+    """
+
+    def __init__(self, bootstrap_factory, alert_engine):
+        # bootstrap_factory(y_symbol, x_symbol) -> OnlinePairAnalytics
+        self._bootstrap_factory = bootstrap_factory
+        self._alert_engine = alert_engine
+        self._publishers = {}
+        self._lock = asyncio.Lock()
+        # Pinned pairs whose publisher failed to start: key -> (failures, retry time).
+        self._pin_failures = {}
+
+    def _new_publisher(self, y_symbol: str, x_symbol: str) -> PairPublisher:
+        return PairPublisher(
+            y_symbol,
+            x_symbol,
+            lambda: self._bootstrap_factory(y_symbol, x_symbol),
+            self._alert_engine,
+        )
+
+    async def _start(self, key, publisher: PairPublisher):
+        """
+        Starts a publisher the caller has registered, without holding the lock, and
+        wakes everyone waiting for it. One that fails is unregistered and the
+        error re-raised.
+        """
+        try:
+            await publisher.start()
+        except BaseException as e:
+            publisher.start_error = (
+                e if isinstance(e, Exception) else LiveFeedError("Publisher start was cancelled.")
+            )
+            async with self._lock:
+                if self._publishers.get(key) is publisher:
+                    del self._publishers[key]
+            raise
+        finally:
+            publisher.ready.set()
+
+        async with self._lock:
+            if self._publishers.get(key) is not publisher:
+                # Unpinned or stopped while it was bootstrapping.
+                await publisher.stop()
+                return
+        print(f"[{publisher.pair}] Live publisher started.")
+
+    async def _stop_if_idle(self, key):
+        # Must be called with self._lock held.
+        publisher = self._publishers.get(key)
+        if publisher is not None and publisher.subscriber_count == 0 and not publisher.pinned:
+            del self._publishers[key]
+            await publisher.stop()
+            print(f"[{publisher.pair}] Live publisher stopped (no subscribers).")
+
+    async def subscribe(
+        self,
+        y_symbol: str,
+        x_symbol: str,
+        max_rate: float = LIVE_DEFAULT_MAX_RATE,
+        encoding: str = "json",
+    ) -> Subscription:
+        key = (y_symbol, x_symbol)
+        async with self._lock:
+            publisher = self._publishers.get(key)
+            starting = publisher is None
+            if starting:
+                publisher = self._publishers[key] = self._new_publisher(y_symbol, x_symbol)
+            subscription = Subscription(max_rate=max_rate, encoding=encoding)
+            # Added right away, so the publisher is not idle while it starts.
+            publisher.add(subscription)
+
+        try:
+            if starting:
+                await self._start(key, publisher)
+            else:
+                await publisher.ready.wait()
+                if publisher.start_error is not None:
+                    raise publisher.start_error
+        except BaseException:
+            async with self._lock:
+                publisher.remove(subscription)
+                if self._publishers.get(key) is publisher:
+                    await self._stop_if_idle(key)
+            raise
+        return subscription
+
+    async def sync_pins(self, symbol_pairs):
+        """
+        Pins the publishers of every pair in `symbol_pairs` ('Y/X' strings) and
+        unpins the rest. Missing publishers are bootstrapped outside the lock, like
+        a subscriber's; a pair that cannot be bootstrapped yet is retried with
+        exponential backoff (ALERT_PIN_RETRY_MIN .. ALERT_PIN_RETRY_MAX).
+        """
+        wanted = {tuple(pair.split("/", 1)) for pair in symbol_pairs if "/" in pair}
+        now = time.monotonic()
+        async with self._lock:
+            missing = []
+            for key in wanted:
+                publisher = self._publishers.get(key)
+                if publisher is not None:
+                    publisher.pinned = True
+                    self._pin_failures.pop(key, None)
+                elif self._pin_failures.get(key, (0, 0.0))[1] <= now:
+                    missing.append(key)
+
+            for key, publisher in list(self._publishers.items()):
+                if key not in wanted and publisher.pinned:
+                    publisher.pinned = False
+                    await self._stop_if_idle(key)
+            for key in list(self._pin_failures):
+                if key not in wanted:
+                    del self._pin_failures[key]
+
+        for key in missing:
+            await self._start_pinned(key)
+
+    async def _start_pinned(self, key):
+        async with self._lock:
+            publisher = self._publishers.get(key)
+            if publisher is not None:
+                # A subscriber started one since sync_pins looked.
+                publisher.pinned = True
+                return
+            publisher = self._publishers[key] = self._new_publisher(*key)
+            publisher.pinned = True
+
+        try:
+            await self._start(key, publisher)
+        except Exception as e:
+            failures = self._pin_failures.get(key, (0, 0.0))[0] + 1
+            delay = min(ALERT_PIN_RETRY_MAX, ALERT_PIN_RETRY_MIN * 2 ** (failures - 1))
+            self._pin_failures[key] = (failures, time.monotonic() + delay)
+            print(
+                f"[{publisher.pair}] Could not start alert publisher: {e} "
+                f"(retrying in {delay:.0f}s)"
+            )
+            return
+        self._pin_failures.pop(key, None)
+
+    async def unsubscribe(self, y_symbol: str, x_symbol: str, subscription: Subscription):
+        async with self._lock:
+            key = (y_symbol, x_symbol)
+            publisher = self._publishers.get(key)
+            if publisher is None:
+                return
+            publisher.remove(subscription)
+            await self._stop_if_idle(key)
+
+    async def stop_all(self):
+        async with self._lock:
+            for publisher in self._publishers.values():
+                await publisher.stop()
+            self._publishers.clear()
+
+    def stats(self) -> dict:
+        return {
+            f"{y}/{x}": {
+                "subscribers": publisher.subscriber_count,
+                "pinned": publisher.pinned,
+                "packets": publisher.packets,
+                "suppressed": publisher.suppressed,
+            }
+            for (y, x), publisher in self._publishers.items()
+        }
+
+
+def flush_alerts(alert_engine) -> int:
+    """Persists pending alert triggers (blocking), via the ingestor when read-only."""
+    return alert_engine.flush(lambda alert_ids: execute_write("mark_triggered", alert_ids))
+
+
+async def run_alert_monitor(registry: PublisherRegistry, alert_engine, interval: float):
+    """
+    Background task of the API process: keeps a publisher running for every pair
+    with active alerts and persists triggered statuses in batches. With several
+    API workers it also picks up the alerts the other workers created or deleted.
+    """
+    while True:
+        try:
+            if API_READ_ONLY:
+                await async_reader.run(alert_engine.sync)
+            await registry.sync_pins(alert_engine.pairs())
+            await asyncio.to_thread(flush_alerts, alert_engine)
+        except Exception as e:
+            print(f"--- Alert monitor error: {e} ---")
+        await asyncio.sleep(interval)
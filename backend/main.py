@@ -1,48 +1,117 @@
-from fastapi import FastAPI, Query, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Header, Query, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+import time
+from contextlib import asynccontextmanager
 from typing import List, Optional
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Literal
 from fastapi.staticfiles import StaticFiles
 import os
-
-from config import SUPPORTED_SYMBOLS, SUPPORTED_SYMBOLS_DETAIL
-from database import get_db_connection
+import json
+from datetime import datetime, timezone
+
+from config import (
+    SUPPORTED_SYMBOLS,
+    SUPPORTED_SYMBOLS_DETAIL,
+    TIMEFRAME_MS,
+    CHART_MAX_BARS,
+    LIVE_BOOTSTRAP_BARS,
+    LIVE_ANALYTICS_WINDOW,
+    LIVE_ANALYTICS_HALFLIFE,
+    LIVE_CORRELATION_WINDOW,
+    ALERT_MONITOR_INTERVAL,
+    LIVE_DEFAULT_MAX_RATE,
+    LIVE_MAX_RATE,
+    SCANNER_ADF_PAIRS,
+    BACKTEST_MAX_GRID,
+    BACKTEST_FEE_BPS,
+    BACKTEST_IMPACT_BPS,
+    API_READ_ONLY,
+    SHARED_CACHE_DIR,
+)
+from db_pool import PoolTimeout, async_reader, db_pool
+from control import ControlError, execute_write
+from bars import (
+    load_bars,
+    load_pair_bars,
+    pair_bar_range,
+    get_watermark,
+    get_backfill_time,
+    merge_bars,
+    combine_pair_bars,
+)
+from pair_cache import PairAnalyticsCache, SharedResultStore
+from live_feed import (
+    LiveFeedError,
+    PublisherRegistry,
+    Subscription,
+    flush_alerts,
+    run_alert_monitor,
+    tick_rings,
+)
+from alert_engine import AlertEngine
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    chart_data_duration,
+    http_request_duration,
+    registry as metrics_registry,
+    websocket_connections,
+)
+from scanner import load_close_matrix, scan_pairs, shutdown_pool
+from backtest import load_pair_prices, parameter_grid, run_sweep
+from chart_response import (
+    build_timeseries_frame,
+    downsample_frame,
+    frame_since,
+    frame_to_columns,
+    frame_to_rows,
+    json_response,
+    not_modified,
+    not_modified_response,
+    validators,
+)
+from adf import MIN_OBSERVATIONS as ADF_MIN_OBSERVATIONS
+from kernels import ewma_pair_kernel, pair_kernel, rolling_pair_kernel
 from analytics import (
-    calculate_hedge_ratio,
-    calculate_spread,
-    calculate_zscore,
+    ols_diagnostics,
     run_adf_test,
     calculate_rolling_correlation,
+    OnlinePairAnalytics,
 )
 
 
-def sanitize_for_json(data):
+# --- App Definition ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-    Recursively walk a dictionary or list and convert non-JSON-compliant
-    values (like NaN, inf, -inf) to None.
+    Loads the alert rules into memory and runs the alert monitor, which keeps a
+    publisher evaluating every pair that has alerts and persists trigger statuses.
     """
-    if isinstance(data, dict):
-        return {k: sanitize_for_json(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_for_json(v) for v in data]
-    elif isinstance(data, (np.floating, float)):
-        if np.isnan(data) or np.isinf(data):
-            return None
-        return data
-    # Add any other type conversions you need here
-    return data
+    with db_pool.connection() as conn:
+        alert_engine.load(conn)
+
+    monitor = asyncio.create_task(
+        run_alert_monitor(live_publishers, alert_engine, ALERT_MONITOR_INTERVAL)
+    )
+    yield
+    monitor.cancel()
+    await live_publishers.stop_all()
+    shutdown_pool()
+
+    # Persist anything that triggered since the last monitor cycle.
+    flush_alerts(alert_engine)
+    async_reader.close()
+    db_pool.close()
 
 
-# --- App Definition ---
 app = FastAPI(
     title="QuantStream API",
     description="API to ingest data from Binance and perform analysis on the pair of symbols",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -60,6 +129,31 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Times every request by route template (not raw path, so path parameters do
+    not create new series); /api/chart-data is also timed per timeframe.
+    """
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "other"
+        http_request_duration.observe(
+            elapsed, method=request.method, endpoint=endpoint, status=status
+        )
+        if endpoint == "/api/chart-data":
+            timeframe = request.query_params.get("timeframe", "1m")
+            if timeframe in TIMEFRAME_MS:
+                chart_data_duration.observe(elapsed, timeframe=timeframe)
+
+
 # --- API Endpoints ---
 
 
@@ -73,6 +167,255 @@ def get_supported_symbols():
     return SUPPORTED_SYMBOLS
 
 
+def compute_pair_analytics(
+    conn,
+    y_symbol: str,
+    x_symbol: str,
+    timeframe: str,
+    window: int,
+    previous=None,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    hedge_mode: str = "static",
+    hedge_lookback: Optional[float] = None,
+) -> dict:
+    """
+    Runs the full analytics pipeline for a pair on the persisted bars.
+
+    `hedge_mode` picks the fit behind the spread and z-score: "static" is one OLS
+    over every bar, "rolling" refits on the trailing `hedge_lookback` bars and
+    "ewma" weights bars with a half-life of `hedge_lookback` bars. The last two
+    never look ahead and add per-bar hedge_ratio / spread_mean / spread_std series.
+
+    The bars are those of [start_ms, end_ms] (open-ended when not given), capped
+    to the last CHART_MAX_BARS of that range. With `previous` (a stale result for
+    the same key) only the bars since its last bar are read and merged in.
+    Returns the raw bars, aligned close prices, the joined timeseries frame and
+    the summary.
+    """
+    # --- 1. Data Fetching ---
+    # The ingestor keeps OHLC bars up to date, so we read the pre-built bars
+    # instead of re-aggregating raw ticks on every request.
+    if previous is None:
+        loaded = load_pair_bars(
+            conn, y_symbol, x_symbol, timeframe, CHART_MAX_BARS, start_ms, end_ms
+        )
+        if loaded is None:
+            raise HTTPException(
+                status_code=404, detail="Not enough data available to perform analysis."
+            )
+        y_bars, x_bars = loaded
+    else:
+        # The last cached bar may still have been open, so it is read again.
+        start_bucket, end_bucket = pair_bar_range(
+            conn, (y_symbol, x_symbol), timeframe, CHART_MAX_BARS, start_ms, end_ms
+        )
+        new_y = load_bars(
+            conn, y_symbol, timeframe, _last_bucket(previous["y_bars"]), end_bucket
+        )
+        new_x = load_bars(
+            conn, x_symbol, timeframe, _last_bucket(previous["x_bars"]), end_bucket
+        )
+        start = pd.to_datetime(start_bucket, unit="ms", utc=True)
+        y_bars = merge_bars(previous["y_bars"], new_y, start)
+        x_bars = merge_bars(previous["x_bars"], new_x, start)
+
+    ohlc_df = combine_pair_bars(y_symbol, y_bars, x_symbol, x_bars)
+
+    # --- 2. Data Processing & Analysis ---
+    # Get just the close prices for our calculations
+    y_prices = ohlc_df[(y_symbol, "close")].dropna()
+    x_prices = ohlc_df[(x_symbol, "close")].dropna()
+
+    # Align the two series by their index (timestamps)
+    aligned_prices = pd.concat([y_prices, x_prices], axis=1, keys=["Y", "X"]).dropna()
+
+    if len(aligned_prices) < window:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Not enough data for the given timeframe to meet the rolling window size of {window}.",
+        )
+    if hedge_mode == "rolling" and len(aligned_prices) < hedge_lookback:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Not enough data for the given timeframe to fill the hedge lookback of {hedge_lookback:.0f} bars.",
+        )
+
+    # Run all our analytics functions. The regression, spread, z-score and
+    # regression line come from one closed-form kernel over the float64 arrays
+    # (for the rolling and EWMA fits, one O(n) pass over prefix moments).
+    y_values = aligned_prices["Y"].to_numpy()
+    x_values = aligned_prices["X"].to_numpy()
+    if hedge_mode == "rolling":
+        kernel = rolling_pair_kernel(y_values, x_values, int(hedge_lookback))
+    elif hedge_mode == "ewma":
+        kernel = ewma_pair_kernel(y_values, x_values, hedge_lookback)
+    else:
+        kernel = pair_kernel(y_values, x_values)
+    index = aligned_prices.index
+    spread = pd.Series(kernel["spread"], index=index)
+    z_score = pd.Series(kernel["z_score"], index=index)
+    regression_line = pd.Series(kernel["regression_line"], index=index)
+    # The rolling and EWMA fits leave the spread undefined during their warm-up
+    # (and everywhere when the fit degenerates, e.g. a tiny half-life).
+    defined = int(spread.notna().sum())
+    if defined < ADF_MIN_OBSERVATIONS:
+        raise HTTPException(
+            status_code=404,
+            detail=(
+                f"Not enough data for the given timeframe: only {defined} bars have a defined "
+                f"spread after the hedge fit, at least {ADF_MIN_OBSERVATIONS} are needed for the ADF test."
+            ),
+        )
+    adf_result = run_adf_test(spread)
+    rolling_corr = calculate_rolling_correlation(
+        aligned_prices["Y"], aligned_prices["X"], window
+    )
+
+    series = {
+        "spread": spread,
+        "z_score": z_score,
+        "rolling_corr": rolling_corr,
+        "regression_line_value": regression_line,
+    }
+    if hedge_mode == "static":
+        hedge_ratio = kernel["hedge_ratio"]
+        spread_mean = kernel["spread_mean"]
+    else:
+        # The summary reports the fit at the last bar.
+        hedge_ratio = float(kernel["hedge_ratio"][-1])
+        spread_mean = float(kernel["spread_mean"][-1])
+        for name in ("hedge_ratio", "spread_mean", "spread_std"):
+            series[name] = pd.Series(kernel[name], index=index)
+
+    # One vectorized join of the bars and every analytics series.
+    frame = build_timeseries_frame(ohlc_df, y_symbol, x_symbol, series)
+
+    return {
+        "y_bars": y_bars,
+        "x_bars": x_bars,
+        "aligned_prices": aligned_prices,
+        "frame": frame,
+        "summary": {
+            "hedge_ratio": hedge_ratio,
+            "adf_p_value": adf_result["p_value"],
+            "pair": f"{y_symbol}/{x_symbol}",
+            "spread_mean": spread_mean,
+            "hedge_mode": hedge_mode,
+        },
+    }
+
+
+def _last_bucket(bars: pd.DataFrame) -> int:
+    """Open time (ms) of the last bar in a loaded bar frame (0 when empty)."""
+    if bars.empty:
+        return 0
+    return int(bars.index[-1].value // 1_000_000)
+
+
+def _to_epoch_ms(value: Optional[datetime]) -> Optional[int]:
+    """Epoch milliseconds of a query datetime; naive values are taken as UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _analytics_nbytes(result: dict) -> int:
+    """Approximate memory held by a cached analytics result."""
+    return sum(
+        int(result[name].memory_usage(index=True).sum())
+        for name in ("y_bars", "x_bars", "aligned_prices", "frame")
+        if name in result
+    )
+
+
+def _shared_analytics(result: dict) -> dict:
+    """
+    The part of a result other workers serve from: the frame, the aligned closes
+    and the summary. The raw bars are only needed to extend a result, and each
+    worker extends its own.
+    """
+    return {name: result[name] for name in ("aligned_prices", "frame", "summary")}
+
+
+def _shared_store():
+    if not (API_READ_ONLY and SHARED_CACHE_DIR):
+        return None
+    try:
+        return SharedResultStore(SHARED_CACHE_DIR)
+    except OSError as e:
+        print(f"--- Shared analytics cache disabled: {e} ---")
+        return None
+
+
+# Computed pair analytics, shared by the REST endpoint and the websocket bootstrap,
+# and with several API workers also between the workers.
+pair_cache = PairAnalyticsCache(
+    sizeof=_analytics_nbytes,
+    shared=_shared_store(),
+    share=_shared_analytics,
+)
+
+
+def get_pair_analytics(
+    y_symbol: str,
+    x_symbol: str,
+    timeframe: str,
+    window: int,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    is_current=None,
+    hedge_mode: str = "static",
+    hedge_lookback: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    Returns the analytics for a pair from the cache, computing or extending them
+    when the newest stored tick has moved past the cached watermark.
+
+    `is_current(watermark, backfilled_at)` is called before anything is computed;
+    when it returns True the caller's copy is up to date and None is returned.
+    A bulk backfill (backfill.py) changes past bars without moving the watermark,
+    so results are also keyed on the time of the last one.
+    """
+    try:
+        with db_pool.connection() as conn:
+            # One read transaction: the watermark and the bars come from the same
+            # snapshot even while the ingestor keeps writing.
+            conn.execute("BEGIN")
+            watermark = get_watermark(conn, (y_symbol, x_symbol))
+            if watermark is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Not enough data available to perform analysis.",
+                )
+            if end_ms is not None:
+                # Ticks after the end of the range cannot change it: a range in the
+                # past stays cached for good.
+                watermark = min(watermark, end_ms)
+            backfilled_at = get_backfill_time(conn)
+            if is_current is not None and is_current(watermark, backfilled_at):
+                return None
+            return pair_cache.get(
+                (
+                    y_symbol, x_symbol, timeframe, window, start_ms, end_ms, hedge_mode, hedge_lookback,
+                    backfilled_at,
+                ),
+                watermark,
+                lambda previous: compute_pair_analytics(
+                    conn, y_symbol, x_symbol, timeframe, window, previous, start_ms, end_ms,
+                    hedge_mode, hedge_lookback,
+                ),
+            )
+    except HTTPException:
+        raise
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+
 # This is our main new endpoint
 @app.get("/api/chart-data", tags=["Analytics"])
 def get_chart_data(
@@ -84,9 +427,57 @@ def get_chart_data(
     window: int = Query(
         50, description="The rolling window for correlation calculation."
     ),
+    format: Literal["rows", "columns"] = Query(
+        "rows",
+        description="'rows' returns one object per bar, 'columns' returns parallel arrays.",
+    ),
+    start: Optional[datetime] = Query(
+        None, description="Start of the time range (ISO 8601, UTC if no offset)."
+    ),
+    end: Optional[datetime] = Query(
+        None, description="End of the time range (ISO 8601, UTC if no offset)."
+    ),
+    diagnostics: bool = Query(
+        False, description="Include the full OLS regression diagnostics (slower)."
+    ),
+    since: Optional[datetime] = Query(
+        None,
+        description="Time of the last bar the client holds: only bars from then on are returned.",
+    ),
+    max_points: Optional[int] = Query(
+        None,
+        ge=3,
+        description="Downsample the returned bars to at most this many points (analytics use every bar).",
+    ),
+    hedge_mode: Literal["static", "rolling", "ewma"] = Query(
+        "static",
+        description="'static' fits one hedge ratio over all bars; 'rolling' and 'ewma' refit at every bar without look-ahead.",
+    ),
+    hedge_lookback: Optional[float] = Query(
+        None,
+        gt=0,
+        description="Bars in the rolling fit, or the EWMA half-life in bars (default: `window`).",
+    ),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
 ):
     """
     Provides all necessary data to render the historical analytics charts.
+    Without a range the most recent bars are returned; a range returns the bars
+    between `start` and `end` (at most CHART_MAX_BARS, the most recent first).
+
+    With `since` only the bars at or after it are returned (the client's last bar
+    may have been still open), with the current summary. The spread and z-score
+    of older bars move with every refit, so a client that keeps them shows them
+    as of the fit it fetched them with.
+
+    `max_points` downsamples what is returned for display (see downsample_frame):
+    OHLC is aggregated per bucket and the analytics series keep their extremes.
+    The summary is always computed on every bar.
+
+    Responses carry ETag / Last-Modified validators from the newest stored tick;
+    a conditional request whose copy is still current gets 304 Not Modified
+    without running the pipeline.
     """
     # --- 1. Validation ---
     if y_symbol not in SUPPORTED_SYMBOLS or x_symbol not in SUPPORTED_SYMBOLS:
@@ -98,128 +489,246 @@ def get_chart_data(
             status_code=400, detail="Base and hedge symbols cannot be the same."
         )
 
-    timeframe_map = {"1s": "1s", "1m": "1T", "5m": "5T"}
-    if timeframe not in timeframe_map:
+    if timeframe not in TIMEFRAME_MS:
         raise HTTPException(status_code=400, detail="Unsupported timeframe.")
 
-    resample_code = timeframe_map[timeframe]
+    start_ms = _to_epoch_ms(start)
+    end_ms = _to_epoch_ms(end)
+    if start_ms is not None and end_ms is not None and start_ms >= end_ms:
+        raise HTTPException(status_code=400, detail="'start' must be before 'end'.")
 
-    # --- 2. Data Fetching ---
-    try:
-        conn = get_db_connection()
-        # Fetch a reasonable amount of data for analysis, e.g., last 100,000 ticks for each
-        # A more advanced query would fetch by time, e.g., last 24 hours
-        query = f"""
-            SELECT timestamp, symbol, price 
-            FROM raw_ticks 
-            WHERE symbol IN ('{y_symbol}', '{x_symbol}')
-            ORDER BY timestamp DESC
-            LIMIT 200000 
-        """
-        raw_df = pd.read_sql_query(query, conn)
-        conn.close()
-
-        if raw_df.empty:
-            raise HTTPException(
-                status_code=404, detail="Not enough data available to perform analysis."
-            )
+    since_ms = _to_epoch_ms(since)
+
+    if hedge_mode == "static":
+        hedge_lookback = None
+    elif hedge_lookback is None:
+        hedge_lookback = float(window)
+    if hedge_lookback is not None and hedge_lookback <= 0:
+        raise HTTPException(status_code=400, detail="'hedge_lookback' must be positive.")
+    if hedge_mode == "rolling" and (hedge_lookback < 2 or hedge_lookback != int(hedge_lookback)):
+        raise HTTPException(
+            status_code=400, detail="'hedge_lookback' must be a whole number of at least 2 bars."
+        )
+
+    # --- 2. Analytics (cached per pair, timeframe, window and range) ---
+    params = (
+        y_symbol, x_symbol, timeframe, window, format, start_ms, end_ms, diagnostics, since_ms, max_points,
+        hedge_mode, hedge_lookback,
+    )
+    headers = {}
+
+    def is_current(watermark, backfilled_at):
+        modified = max(watermark, backfilled_at)
+        headers.update(validators(modified, params + (backfilled_at,)))
+        return not_modified(headers, modified, if_none_match, if_modified_since)
+
+    result = get_pair_analytics(
+        y_symbol, x_symbol, timeframe, window, start_ms, end_ms, is_current,
+        hedge_mode, hedge_lookback,
+    )
+    if result is None:
+        return not_modified_response(headers)
+
+    # --- 3. Format the Response ---
+    frame = result["frame"]
+    if since_ms is not None:
+        frame = frame_since(frame, since_ms)
+    frame = downsample_frame(frame, max_points)
+    if format == "columns":
+        timeseries_data = frame_to_columns(frame)
+    else:
+        timeseries_data = frame_to_rows(frame)
+
+    summary = result["summary"]
+    if diagnostics:
+        # Computed once per cached result, and only for clients that ask for it.
+        if "diagnostics" not in result:
+            aligned = result["aligned_prices"]
+            result["diagnostics"] = ols_diagnostics(aligned["Y"], aligned["X"])
+        summary = {**summary, "diagnostics": result["diagnostics"]}
+
+    final_response = {
+        "analytics_summary": summary,
+        "format": format,
+        "timeseries_data": timeseries_data,
+    }
+
+    return json_response(final_response, headers)
+
+
+@app.get("/api/scanner", tags=["Analytics"])
+def get_pair_scanner(
+    timeframe: str = Query("1m", description="The bar timeframe, e.g., '1s', '1m', '5m'."),
+    symbols: Optional[List[str]] = Query(
+        None, description="Symbols to scan (default: every supported symbol)."
+    ),
+    adf_pairs: int = Query(
+        SCANNER_ADF_PAIRS,
+        ge=0,
+        description="How many of the most correlated pairs get an ADF test.",
+    ),
+    limit: int = Query(100, ge=1, description="Maximum number of ranked pairs returned."),
+):
+    """
+    Scans every ordered pair of symbols for cointegration. Closes are loaded once
+    for all symbols, hedge ratios, half-lives and z-scores are solved for all pairs
+    in one batch, and the ADF tests run in a process pool. Pairs are ranked by
+    ADF p-value.
+    """
+    symbols = symbols or SUPPORTED_SYMBOLS
+    if any(symbol not in SUPPORTED_SYMBOLS for symbol in symbols):
+        raise HTTPException(status_code=400, detail="One or more symbols are not supported.")
+    if len(set(symbols)) < 2:
+        raise HTTPException(status_code=400, detail="At least two symbols are required.")
+    if timeframe not in TIMEFRAME_MS:
+        raise HTTPException(status_code=400, detail="Unsupported timeframe.")
 
+    try:
+        with db_pool.connection() as conn:
+            closes = load_close_matrix(conn, list(dict.fromkeys(symbols)), timeframe)
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
-    # --- 3. Data Processing & Analysis ---
-    # Convert timestamp and set as index
-    raw_df["timestamp"] = pd.to_datetime(raw_df["timestamp"], unit="ms")
-    raw_df.set_index("timestamp", inplace=True)
-    raw_df.sort_index(inplace=True)  # Sort chronologically
+    # The ADF regression with automatic lag selection needs a reasonable sample.
+    if len(closes) < 20:
+        raise HTTPException(
+            status_code=404, detail="Not enough common data to scan these symbols."
+        )
 
-    # Pivot to get symbols as columns, then forward-fill missing values
-    price_df = raw_df.pivot_table(
-        index="timestamp", columns="symbol", values="price"
-    ).ffill()
+    scanned, ranked = scan_pairs(closes, adf_pairs, limit)
+    return json_response(
+        {
+            "timeframe": timeframe,
+            "bars": len(closes),
+            "start": closes.index[0].isoformat(),
+            "end": closes.index[-1].isoformat(),
+            "pairs_scanned": scanned,
+            "pairs": ranked,
+        }
+    )
 
-    # Resample to the desired timeframe (OHLC)
-    ohlc_df = price_df.resample(resample_code).ohlc()
 
-    # --- ENSURE THE INDEX IS UTC ---
+class BacktestRequest(BaseModel):
+    y_symbol: str
+    x_symbol: str
+    timeframe: str = "1s"
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    windows: List[int] = Field(..., min_length=1, description="Lookback windows (bars) of the rolling fit.")
+    entry_z: List[float] = Field(..., min_length=1)
+    exit_z: List[float] = Field([0.0], min_length=1)
+    stop_z: List[Optional[float]] = Field([None], min_length=1, description="None: no stop.")
+    quantity: float = Field(1.0, gt=0, description="Units of Y per position.")
+    fee_bps: float = Field(BACKTEST_FEE_BPS, ge=0, description="Fee on the notional of every fill.")
+    impact_bps: float = Field(
+        BACKTEST_IMPACT_BPS, ge=0, description="Extra cost of a fill as large as its bar's volume."
+    )
 
-    if ohlc_df.index.tz is None:
-        ohlc_df.index = ohlc_df.index.tz_localize("UTC")
-    else:
-        ohlc_df.index = ohlc_df.index.tz_convert("UTC")
 
-    # Get just the close prices for our calculations
-    y_prices = ohlc_df[(y_symbol, "close")].dropna()
-    x_prices = ohlc_df[(x_symbol, "close")].dropna()
+@app.post("/api/backtest", tags=["Analytics"])
+def run_backtest(request: BacktestRequest):
+    """
+    Backtests a z-score mean-reversion strategy on a pair over the stored bars,
+    for every combination of the windows and entry / exit / stop z-scores. Each
+    combination is simulated vectorized over the bars and the grid is spread over
+    the scanner's process pool. Returns PnL, Sharpe ratio, maximum drawdown and
+    trade count per grid point, in grid order, and the best point by Sharpe.
+    """
+    if request.y_symbol not in SUPPORTED_SYMBOLS or request.x_symbol not in SUPPORTED_SYMBOLS:
+        raise HTTPException(status_code=400, detail="One or more symbols are not supported.")
+    if request.y_symbol == request.x_symbol:
+        raise HTTPException(status_code=400, detail="The two symbols must differ.")
+    if request.timeframe not in TIMEFRAME_MS:
+        raise HTTPException(status_code=400, detail="Unsupported timeframe.")
+    if min(request.windows) < 2:
+        raise HTTPException(status_code=400, detail="Every window must be at least 2 bars.")
 
-    # Align the two series by their index (timestamps)
-    aligned_prices = pd.concat([y_prices, x_prices], axis=1, keys=["Y", "X"]).dropna()
+    grid, skipped = parameter_grid(
+        request.windows, request.entry_z, request.exit_z, request.stop_z
+    )
+    if not grid:
+        raise HTTPException(
+            status_code=400, detail="No combination satisfies 0 <= exit_z < entry_z < stop_z."
+        )
+    if len(grid) > BACKTEST_MAX_GRID:
+        raise HTTPException(
+            status_code=400, detail=f"The grid has {len(grid)} points, more than {BACKTEST_MAX_GRID}."
+        )
 
-    if len(aligned_prices) < window:
+    try:
+        with db_pool.connection() as conn:
+            prices = load_pair_prices(
+                conn, request.y_symbol, request.x_symbol, request.timeframe,
+                _to_epoch_ms(request.start), _to_epoch_ms(request.end),
+            )
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+    if len(prices) < max(request.windows):
         raise HTTPException(
             status_code=404,
-            detail=f"Not enough data for the given timeframe to meet the rolling window size of {window}.",
+            detail=f"Not enough data for the given timeframe to meet the window size of {max(request.windows)}.",
         )
 
-    # Run all our analytics functions
-    hedge_ratio, model = calculate_hedge_ratio(aligned_prices["Y"], aligned_prices["X"])
-    spread = calculate_spread(aligned_prices["Y"], aligned_prices["X"], hedge_ratio)
-    spread_mean = spread.mean()
-    z_score = calculate_zscore(spread)
-    adf_result = run_adf_test(spread)
-    rolling_corr = calculate_rolling_correlation(
-        aligned_prices["Y"], aligned_prices["X"], window
+    started = time.perf_counter()
+    results = run_sweep(
+        prices, grid, request.timeframe, request.quantity,
+        request.fee_bps / 10_000, request.impact_bps / 10_000,
+    )
+    ranked = [row for row in results if row["sharpe"] is not None]
+    return json_response(
+        {
+            "pair": f"{request.y_symbol}/{request.x_symbol}",
+            "timeframe": request.timeframe,
+            "bars": len(prices),
+            "start": prices.index[0].isoformat(),
+            "end": prices.index[-1].isoformat(),
+            "grid_points": len(grid),
+            "skipped": skipped,
+            "seconds": round(time.perf_counter() - started, 3),
+            "best": max(ranked, key=lambda row: row["sharpe"]) if ranked else None,
+            "results": results,
+        }
     )
 
-    # --- 4. Format the Response ---
-    # Convert our Pandas Series/DataFrames to a JSON-friendly format
-    # We will build the timeseries array of objects as discussed
-
-    spread = spread.where(pd.notna(spread), None)
-    z_score = z_score.where(pd.notna(z_score), None)
-    rolling_corr = rolling_corr.where(pd.notna(rolling_corr), None)
-    X_with_const_for_prediction = sm.add_constant(aligned_prices["X"])
-    regression_line = model.predict(X_with_const_for_prediction)
-
-    # Get the OHLC data for the response
-    y_ohlc_response = ohlc_df[y_symbol].dropna().reset_index()
-    x_ohlc_response = ohlc_df[x_symbol].dropna().reset_index()
-
-    timeseries_data = []
-    for i, timestamp in enumerate(aligned_prices.index):
-        # Find the corresponding OHLC data (this is not super efficient, but ok for now)
-        y_ohlc_row = y_ohlc_response[y_ohlc_response["timestamp"] == timestamp]
-        x_ohlc_row = x_ohlc_response[x_ohlc_response["timestamp"] == timestamp]
-
-        timeseries_data.append(
-            {
-                "time": timestamp.isoformat(),
-                "y_ohlc": (
-                    y_ohlc_row.iloc[0].to_dict() if not y_ohlc_row.empty else None
-                ),
-                "x_ohlc": (
-                    x_ohlc_row.iloc[0].to_dict() if not x_ohlc_row.empty else None
-                ),
-                "spread": spread.iloc[i],
-                "z_score": z_score.iloc[i],
-                "rolling_corr": (
-                    rolling_corr.iloc[i] if pd.notna(rolling_corr.iloc[i]) else None
-                ),
-                "regression_line_value": regression_line.iloc[i],
-            }
-        )
 
-    final_response = {
-        "analytics_summary": {
-            "hedge_ratio": hedge_ratio,
-            "adf_p_value": adf_result["p_value"],
-            "pair": f"{y_symbol}/{x_symbol}",
-            "spread_mean": spread.mean(),
-        },
-        "timeseries_data": timeseries_data,
-    }
+@app.get("/api/cache/stats", tags=["General"])
+def get_cache_stats():
+    """Hit/miss/eviction counters of the pair analytics cache."""
+    return pair_cache.stats()
 
-    return sanitize_for_json(final_response)
+
+@app.get("/api/live/{symbol}/ticks", tags=["Live"])
+def get_recent_ticks(
+    symbol: str,
+    limit: int = Query(500, ge=1, description="Maximum number of recent ticks."),
+):
+    """
+    Returns the most recent ticks of a symbol from the shared-memory ring, as
+    parallel arrays in chronological order.
+    """
+    if symbol not in SUPPORTED_SYMBOLS:
+        raise HTTPException(status_code=400, detail="Symbol is not supported.")
+
+    ring = tick_rings.get(symbol)
+    if ring is None:
+        raise HTTPException(status_code=503, detail="Live tick feed is not running.")
+
+    timestamps, prices, quantities, sequence = ring.history(limit)
+    # Serialised straight from the shared-memory views.
+    return json_response(
+        {
+            "symbol": symbol,
+            "sequence": sequence,
+            "timestamp": timestamps,
+            "price": prices,
+            "quantity": quantities,
+        }
+    )
 
 
 # ------ Alert management APIS ------------
@@ -233,6 +742,16 @@ class AlertCreate(BaseModel):
     condition: Literal[">", "<"]  # Ensures only ">" or "<" are accepted
     value: float = Field(..., ge=0.5, le=5.0)  # Value must be between -7 and 7
 
+    @field_validator("symbol_pair")
+    @classmethod
+    def check_symbol_pair(cls, symbol_pair: str) -> str:
+        # The alert monitor runs a live publisher for the pair, so it must be one
+        # the feed can serve.
+        symbols = symbol_pair.split("/")
+        if len(symbols) != 2 or symbols[0] == symbols[1] or not set(symbols) <= set(SUPPORTED_SYMBOLS):
+            raise ValueError("must be 'Y/X' with two different supported symbols")
+        return symbol_pair
+
 
 @app.post("/api/alerts", tags=["Alerts"], status_code=201)
 def create_alert(alert: AlertCreate):
@@ -241,53 +760,26 @@ def create_alert(alert: AlertCreate):
     Returns the full alert object, including its ID.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Check if an alert with these exact parameters already exists
-        cursor.execute(
-            "SELECT * FROM alerts WHERE symbol_pair = ? AND metric = ? AND condition = ? AND value = ?",
-            (alert.symbol_pair, alert.metric, alert.condition, alert.value),
+        # Inserts the alert, or re-activates an identical one, and returns the
+        # complete alert object for the frontend.
+        new_or_updated_alert = execute_write(
+            "upsert_alert", alert.symbol_pair, alert.metric, alert.condition, alert.value
         )
-        existing_alert_row = cursor.fetchone()
-
-        if existing_alert_row:
-            # --- The alert already exists ---
-            alert_id = existing_alert_row["id"]
-            if existing_alert_row["status"] != "active":
-                # If it was triggered or deleted, re-activate it
-                cursor.execute(
-                    "UPDATE alerts SET status = 'active' WHERE id = ?", (alert_id,)
-                )
-                conn.commit()
-        else:
-            # --- The alert is new, so insert it ---
-            cursor.execute(
-                "INSERT INTO alerts (symbol_pair, metric, condition, value, status) VALUES (?, ?, ?, ?, 'active')",
-                (alert.symbol_pair, alert.metric, alert.condition, alert.value),
-            )
-            # Get the ID of the row we just inserted
-            alert_id = cursor.lastrowid
-            conn.commit()
-
-        # --- Fetch the complete alert object to return to the frontend ---
-        cursor.execute("SELECT * FROM alerts WHERE id = ?", (alert_id,))
-        new_or_updated_alert = cursor.fetchone()
-
-        conn.close()
-
-        if not new_or_updated_alert:
-            raise HTTPException(
-                status_code=404, detail="Could not find the alert after creation."
-            )
-
-        # Convert the database row to a dictionary and return it
-        return dict(new_or_updated_alert)
-
+    except ControlError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error creating alert: {e}")
         raise HTTPException(status_code=500, detail="Could not save alert to database.")
 
+    if not new_or_updated_alert:
+        raise HTTPException(
+            status_code=404, detail="Could not find the alert after creation."
+        )
+
+    # Keep the in-memory alert index in sync without a full reload
+    alert_engine.add(new_or_updated_alert)
+    return new_or_updated_alert
+
 
 @app.get("/api/alerts/{y_symbol}/{x_symbol}", tags=["Alerts"])
 def get_alerts_for_pair(y_symbol: str, x_symbol: str):
@@ -295,12 +787,11 @@ def get_alerts_for_pair(y_symbol: str, x_symbol: str):
     Fetches all active alerts for a given symbol pair.
     """
     symbol_pair = f"{y_symbol}/{x_symbol}"
-    conn = get_db_connection()
-    alerts = conn.execute(
-        "SELECT * FROM alerts WHERE symbol_pair = ? AND status = 'active'",
-        (symbol_pair,),
-    ).fetchall()
-    conn.close()
+    with db_pool.connection() as conn:
+        alerts = conn.execute(
+            "SELECT * FROM alerts WHERE symbol_pair = ? AND status = 'active'",
+            (symbol_pair,),
+        ).fetchall()
     # Convert the database rows to a list of dictionaries
     return [dict(row) for row in alerts]
 
@@ -310,11 +801,10 @@ def get_alerts_for_pair():
     """
     Fetches all active alerts.
     """
-    conn = get_db_connection()
-    alerts = conn.execute(
-        "SELECT * FROM alerts WHERE status = 'active'",
-    ).fetchall()
-    conn.close()
+    with db_pool.connection() as conn:
+        alerts = conn.execute(
+            "SELECT * FROM alerts WHERE status = 'active'",
+        ).fetchall()
     # Convert the database rows to a list of dictionaries
     return [dict(row) for row in alerts]
 
@@ -325,12 +815,12 @@ def delete_alert(alert_id: int):
     Deletes an alert by its ID.
     """
     try:
-        conn = get_db_connection()
-        conn.execute("DELETE FROM alerts WHERE id = ?", (alert_id,))
-        conn.commit()
-        conn.close()
+        execute_write("delete_alert", alert_id)
+        alert_engine.remove(alert_id)
         # Return No Content on successful deletion
         return
+    except ControlError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error deleting alert: {e}")
         raise HTTPException(
@@ -339,191 +829,180 @@ def delete_alert(alert_id: int):
 
 
 # --- WebSocket Endpoint for Live Updates ---
-@app.websocket("/ws/live-data/{y_symbol}/{x_symbol}")
-async def websocket_endpoint(websocket: WebSocket, y_symbol: str, x_symbol: str):
+
+
+def bootstrap_live_analytics(y_symbol: str, x_symbol: str) -> OnlinePairAnalytics:
     """
-    WebSocket endpoint for streaming live analytics data for a given pair.
+    Seeds the streaming analytics of a pair from its historical 1s bars.
+    Called once per pair when its live publisher starts.
     """
-    # --- 1. Accept the connection ---
-    await websocket.accept()
-    print(f"WebSocket connection accepted for pair: {y_symbol}/{x_symbol}")
+    # Live parameters are fitted on the 1s bars, shared with /api/chart-data
+    # through the analytics cache.
+    try:
+        analytics = get_pair_analytics(y_symbol, x_symbol, "1s", LIVE_CORRELATION_WINDOW)
+    except HTTPException:
+        raise LiveFeedError("Not enough data to initialize.")
+
+    aligned_prices = analytics["aligned_prices"].tail(LIVE_BOOTSTRAP_BARS)
+
+    # From here on the engine is updated once per closed 1s bar, so the
+    # parameters never go stale.
+    online = OnlinePairAnalytics(
+        window=LIVE_ANALYTICS_WINDOW,
+        corr_window=LIVE_CORRELATION_WINDOW,
+        halflife=LIVE_ANALYTICS_HALFLIFE,
+    )
+    for y_close, x_close in zip(
+        aligned_prices["Y"].to_numpy(), aligned_prices["X"].to_numpy()
+    ):
+        online.update(y_close, x_close)
 
-    # --- 2. Initial parameters calculation (one-time) ---
-    # We need to get the historical hedge_ratio, spread_mean, and spread_std
-    # This is a simplified version. In a real app, you might cache this
-    # or pass it from the initial HTTP request.
+    params = online.parameters()
+    if not np.isfinite(params["hedge_ratio"]):
+        raise LiveFeedError("Model calculation failed.")
 
-    # For now, we'll calculate it once at the start of the WebSocket connection.
-    # Note: This is slightly inefficient as it duplicates the work from the HTTP endpoint.
-    # A more advanced design would use a shared cache (like Redis).
-    # But for this project, this is a clear and functional approach.
+    print(
+        f"[{y_symbol}/{x_symbol}] Historical params calculated: Ratio={params['hedge_ratio']:.4f}, Mean={params['spread_mean']:.4f}, Std={params['spread_std']:.4f}"
+    )
+    return online
 
-    try:
-        conn = get_db_connection()
-        query = f"""
-            SELECT timestamp, symbol, price 
-            FROM raw_ticks WHERE symbol IN ('{y_symbol}', '{x_symbol}')
-            ORDER BY timestamp DESC LIMIT 100000
-        """
-        raw_df = pd.read_sql_query(query, conn)
-        conn.close()
-
-        if raw_df.empty:
-            await websocket.close(code=1000, reason="Not enough data to initialize.")
-            return
-
-        raw_df["timestamp"] = pd.to_datetime(raw_df["timestamp"], unit="ms")
-        raw_df.set_index("timestamp", inplace=True)
-        raw_df.sort_index(inplace=True)
-
-        price_df = raw_df.pivot_table(
-            index="timestamp", columns="symbol", values="price"
-        ).ffill()
-        ohlc_df = price_df.resample("1s").ohlc()  # Resample at 1s for live data
-        y_prices = ohlc_df[(y_symbol, "close")].dropna()
-        x_prices = ohlc_df[(x_symbol, "close")].dropna()
-        aligned_prices = pd.concat(
-            [y_prices, x_prices], axis=1, keys=["Y", "X"]
-        ).dropna()
-
-        # Calculate the historical parameters we need to reuse
-        historical_hedge_ratio, model = calculate_hedge_ratio(
-            aligned_prices["Y"], aligned_prices["X"]
-        )
 
-        if model is None:
-            await websocket.close(code=1000, reason="Model calculation failed.")
-            return
+# Active alert rules, indexed in memory and evaluated by the pair publishers.
+alert_engine = AlertEngine()
 
-        historical_intercept = model.params.iloc[0]
+# One publisher per pair, shared by every websocket watching that pair.
+live_publishers = PublisherRegistry(bootstrap_live_analytics, alert_engine)
 
-        historical_spread = calculate_spread(
-            aligned_prices["Y"], aligned_prices["X"], historical_hedge_ratio
-        )
-        historical_spread_mean = historical_spread.mean()
-        historical_spread_std = historical_spread.std()
 
-        print(
-            f"[{y_symbol}/{x_symbol}] Historical params calculated: Ratio={historical_hedge_ratio:.4f}, Mean={historical_spread_mean:.4f}, Std={historical_spread_std:.4f}"
-        )
+async def forward_subscription(websocket: WebSocket, subscription: Subscription):
+    """
+    Sends a subscription's messages until the client disconnects. The client is
+    read concurrently, so a disconnect is noticed even while nothing is being sent
+    (the live feed is quiet when prices do not move). Raises WebSocketDisconnect
+    or the error that stopped sending.
+    """
 
-    except Exception as e:
-        print(f"Error during WebSocket initialization: {e}")
-        await websocket.close(code=1000, reason=f"Initialization failed: {e}")
-        return
+    async def send():
+        while True:
+            message = await subscription.get()
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
 
-    # --- 3. The Live Update Loop ---
-    try:
+    async def receive():
         while True:
-            # Get the single most recent tick for each symbol
-            conn = get_db_connection()
-            # This query is very fast because of our index
-            y_tick_query = f"SELECT price, timestamp FROM raw_ticks WHERE symbol = '{y_symbol}' ORDER BY timestamp DESC LIMIT 1"
-            x_tick_query = f"SELECT price, timestamp FROM raw_ticks WHERE symbol = '{x_symbol}' ORDER BY timestamp DESC LIMIT 1"
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+    route = websocket.scope.get("route")
+    endpoint = route.path if route is not None else websocket.url.path
+    websocket_connections.inc(endpoint=endpoint)
+    tasks = [asyncio.create_task(send()), asyncio.create_task(receive())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        websocket_connections.dec(endpoint=endpoint)
 
-            latest_y = conn.execute(y_tick_query).fetchone()
-            latest_x = conn.execute(x_tick_query).fetchone()
-            conn.close()
 
-            if latest_y and latest_x:
+@app.websocket("/ws/live-data/{y_symbol}/{x_symbol}")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    y_symbol: str,
+    x_symbol: str,
+    max_rate: float = Query(
+        LIVE_DEFAULT_MAX_RATE, gt=0, le=LIVE_MAX_RATE, description="Max packets per second."
+    ),
+    encoding: Literal["json", "binary"] = Query(
+        "json", description="'json' text frames or compact 'binary' frames (see live_encoding)."
+    ),
+):
+    """
+    WebSocket endpoint for streaming live analytics data for a given pair.
+    Packets are computed once per pair by its publisher, on new ticks only; this
+    connection forwards the newest one at most `max_rate` times per second.
+    """
+    # --- 1. Accept the connection ---
+    await websocket.accept()
+    print(f"WebSocket connection accepted for pair: {y_symbol}/{x_symbol}")
 
-                current_regression_line_value = historical_intercept + (
-                    historical_hedge_ratio * latest_x["price"]
-                )
-                # Perform the fast, "update" calculations
-                current_spread = latest_y["price"] - (
-                    historical_hedge_ratio * latest_x["price"]
-                )
+    # --- 2. Subscribe to the pair's publisher (started on first subscriber) ---
+    try:
+        subscription = await live_publishers.subscribe(y_symbol, x_symbol, max_rate, encoding)
+    except LiveFeedError as e:
+        await websocket.close(code=1000, reason=str(e))
+        return
+    except Exception as e:
+        print(f"Error during WebSocket initialization: {e}")
+        await websocket.close(code=1000, reason=f"Initialization failed: {e}")
+        return
 
-                # Avoid division by zero if std dev is 0
-                if historical_spread_std > 0:
-                    current_z_score = (
-                        current_spread - historical_spread_mean
-                    ) / historical_spread_std
-                else:
-                    current_z_score = 0.0
-
-                if latest_y and latest_x:
-                    # ... (all your calculations for spread, z_score, regression_line_value) ...
-
-                    # --- NEW: Alert Checking Logic ---
-                    # Get the symbol pair string for querying the database
-                    symbol_pair_str = f"{y_symbol}/{x_symbol}"
-
-                    conn_alerts = get_db_connection()
-                    # Find all 'active' alerts for this specific pair
-                    alerts_to_check = conn_alerts.execute(
-                        "SELECT * FROM alerts WHERE symbol_pair = ? AND status = 'active'",
-                        (symbol_pair_str,),
-                    ).fetchall()
-
-                    if alerts_to_check:
-                        for alert_row in alerts_to_check:
-                            triggered = False
-                            alert = dict(alert_row)  # Convert row to dictionary
-
-                            # Check if the condition is met
-                            if (
-                                alert["condition"] == ">"
-                                and current_z_score > alert["value"]
-                            ):
-                                triggered = True
-                            elif (
-                                alert["condition"] == "<"
-                                and current_z_score < alert["value"]
-                            ):
-                                triggered = True
-
-                            if triggered:
-                                print(f"--- ALERT TRIGGERED: {alert['id']} ---")
-                                alert_message = f"ALERT on {alert['symbol_pair']}: Z-Score ({current_z_score:.2f}) {alert['condition']} {alert['value']}"
-
-                                # Prepare a special alert packet to send to the frontend
-                                alert_packet = {
-                                    "type": "alert",
-                                    "message": alert_message,
-                                    "alert_id": alert["id"],
-                                }
-                                await websocket.send_json(alert_packet)
-
-                                # Deactivate the alert in the database so it doesn't fire again immediately
-                                conn_alerts.execute(
-                                    "UPDATE alerts SET status = 'triggered' WHERE id = ?",
-                                    (alert["id"],),
-                                )
-                                conn_alerts.commit()
-
-                    conn_alerts.close()
-
-                # The timestamp from the DB in common format with timezone data
-
-                timestamp_ms = latest_y["timestamp"]
-
-                aware_timestamp = pd.to_datetime(timestamp_ms, unit="ms", utc=True)
-
-                iso_timestamp = aware_timestamp.isoformat()
-
-                # Prepare the data packet to send to the client
-                live_data_packet = {
-                    "time": iso_timestamp,
-                    "y_price": latest_y["price"],
-                    "x_price": latest_x["price"],
-                    "spread": current_spread,
-                    "z_score": current_z_score,
-                    "regression_line_value": current_regression_line_value,
-                }
-
-                # Send the data packet as JSON over the WebSocket
-                await websocket.send_json(live_data_packet)
-
-            # Wait for 500 milliseconds before the next update
-            await asyncio.sleep(0.5)
+    # --- 3. Forward packets until the client goes away ---
+    try:
+        await forward_subscription(websocket, subscription)
 
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for pair: {y_symbol}/{x_symbol}")
     except Exception as e:
         print(f"An error occurred in the WebSocket loop: {e}")
         await websocket.close(code=1000, reason="An unexpected error occurred.")
+    finally:
+        await live_publishers.unsubscribe(y_symbol, x_symbol, subscription)
+
+
+@app.websocket("/ws/alerts")
+async def alerts_websocket(websocket: WebSocket):
+    """
+    Streams every alert trigger event, for all pairs, as it happens.
+    """
+    await websocket.accept()
+    subscription = Subscription()
+    loop = asyncio.get_running_loop()
+
+    def on_alert(event):
+        # Alerts can fire from any thread; hand the event to this loop.
+        message = json.dumps(event, separators=(",", ":"))
+        loop.call_soon_threadsafe(subscription.offer, message)
+
+    alert_engine.add_listener(on_alert)
+    try:
+        await forward_subscription(websocket, subscription)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        alert_engine.remove_listener(on_alert)
+
+
+@app.get("/api/alert-engine/stats", tags=["Alerts"])
+def get_alert_engine_stats():
+    """Counters of the in-memory alert engine."""
+    return alert_engine.stats()
+
+
+@app.get("/api/db/stats", tags=["General"])
+def get_db_stats():
+    """Usage and wait times of the connection pool and the async read threads."""
+    return {"pool": db_pool.stats(), "async_reader": async_reader.stats()}
+
+
+@app.get("/api/live/stats", tags=["Live"])
+def get_live_stats():
+    """Active live publishers and their subscriber counts."""
+    return live_publishers.stats()
+
+
+@app.get("/metrics", tags=["General"], include_in_schema=False)
+def get_metrics():
+    """
+    Prometheus scrape endpoint: request latencies, websocket counts and live lag
+    of this API process, plus the ingestor's counters read from shared memory.
+    """
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 static_files_path = os.path.join(os.path.dirname(__file__), "FrontEndApp", "dist")
@@ -0,0 +1,404 @@
+import math
+import os
+import threading
+from bisect import bisect_left
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from config import (
+    DB_WRITE_BUCKETS,
+    INGEST_SHARDS,
+    LAG_BUCKETS,
+    METRICS_SHM_NAME,
+    REQUEST_BUCKETS,
+    SUPPORTED_SYMBOLS,
+)
+from tick_ring import untrack_shared_memory
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Prometheus text format ---
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 2**53:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _header(name: str, help_text: str, kind: str) -> list:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _histogram_lines(name, label_names, label_values, bounds, counts, total, count) -> list:
+    """`counts` holds one non-cumulative count per bound plus the +Inf bucket."""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(list(bounds) + [math.inf], counts):
+        cumulative += bucket_count
+        le = ("le", "+Inf" if math.isinf(bound) else repr(float(bound)))
+        lines.append(f"{name}_bucket{_format_labels(label_names, label_values, le)} {_format_value(cumulative)}")
+    lines.append(f"{name}_sum{_format_labels(label_names, label_values)} {_format_value(total)}")
+    lines.append(f"{name}_count{_format_labels(label_names, label_values)} {_format_value(count)}")
+    return lines
+
+
+# --- In-process metrics (API) ---
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return _header(self.name, self.help, self.kind) + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = _header(self.name, self.help, self.kind)
+        for key, (counts, total, count) in items:
+            lines += _histogram_lines(self.name, self.label_names, key, self.buckets, counts, total, count)
+        return lines
+
+
+class Registry:
+    """The metrics of this process plus collectors that render their own lines."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """`collector()` returns a list of text format lines, rendered on every scrape."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+# --- Ingestor metrics in shared memory ---
+
+
+class IngestMetrics:
+    """
+    The ingestor's counters, in a shared-memory block of float64 slots that the
+    API process renders on every scrape, so no IPC happens per tick.
+
+    Each slot has a single writing thread (the thread receiving trades for
+    per-symbol, per-shard and connection counters, the tick writer for everything
+    about database writes, the shard monitor for shard assignments), so updates
+    are plain stores without locks. Every method is a no-op until the block has
+    been created or attached. Per-shard series are only rendered with several
+    shards (see ingest_shards.py).
+    """
+
+    def __init__(
+        self,
+        symbols=SUPPORTED_SYMBOLS,
+        write_buckets=DB_WRITE_BUCKETS,
+        shards=INGEST_SHARDS,
+        name=METRICS_SHM_NAME,
+    ):
+        self.symbols = list(symbols)
+        self.write_buckets = tuple(write_buckets)
+        self.shards = shards
+        self.name = name
+        self._shm = None
+        self._values = None
+        self.owner = False
+
+        slots = ["messages_invalid", "connections", "disconnects", "rows_written",
+                 "batches", "write_errors", "rows_dropped", "queue_depth",
+                 "write_sum", "write_count", "rebalances", "symbols_moved"]
+        for symbol in self.symbols:
+            slots += [f"ticks:{symbol}", f"last_trade:{symbol}"]
+        for shard in range(self.shards):
+            slots += [f"shard_ticks:{shard}", f"shard_symbols:{shard}", f"shard_connected:{shard}"]
+        self._slot = {slot: i for i, slot in enumerate(slots)}
+        self._write_buckets_at = len(slots)
+        self._size = (len(slots) + len(self.write_buckets) + 1) * 8
+
+    # --- Lifecycle ---
+
+    def create(self):
+        """Creates (or re-creates) the block. The creating process unlinks it in close()."""
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, create=True, size=self._size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=self.name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=self.name, create=True, size=self._size)
+        untrack_shared_memory(shm)
+        self._bind(shm, owner=True)
+        self._values[:] = 0.0
+
+    def attach(self) -> bool:
+        """Attaches to an existing block; returns False if nobody has created it."""
+        if self._values is not None:
+            return True
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return False
+        untrack_shared_memory(shm)
+        if shm.size < self._size:
+            shm.close()
+            return False
+        self._bind(shm, owner=False)
+        return True
+
+    def open(self):
+        """Attaches, creating the block when it is missing (e.g. a standalone ingestor)."""
+        if not self.attach():
+            self.create()
+
+    def _bind(self, shm, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        self._values = np.ndarray((self._size // 8,), dtype=np.float64, buffer=shm.buf)
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._values = None
+        self._shm.close()
+        if self.owner:
+            if os.name == "posix":
+                # unlink() unregisters from the tracker, so track it again first.
+                resource_tracker.register(self._shm._name, "shared_memory")
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._shm = None
+
+    # --- Writer side (ingestor) ---
+
+    def _add(self, slot: str, amount: float = 1.0):
+        values = self._values
+        if values is not None:
+            values[self._slot[slot]] += amount
+
+    def _set(self, slot: str, value: float):
+        values = self._values
+        if values is not None:
+            values[self._slot[slot]] = value
+
+    def tick(self, symbol: str, trade_time_ms: int):
+        values = self._values
+        index = self._slot.get(f"ticks:{symbol}")
+        if values is not None and index is not None:
+            values[index] += 1.0
+            values[index + 1] = trade_time_ms
+
+    def message_invalid(self, count: int = 1):
+        self._add("messages_invalid", count)
+
+    def connected(self, shard: int = None):
+        self._add("connections")
+        if shard is not None:
+            self._set(f"shard_connected:{shard}", 1.0)
+
+    def disconnected(self, shard: int = None):
+        self._add("disconnects")
+        if shard is not None:
+            self._set(f"shard_connected:{shard}", 0.0)
+
+    def shard_ticks(self, shard: int, count: int):
+        self._add(f"shard_ticks:{shard}", count)
+
+    def shard_symbols(self, shard: int, count: int):
+        self._set(f"shard_symbols:{shard}", count)
+
+    def rebalanced(self, moved: int):
+        self._add("rebalances")
+        self._add("symbols_moved", moved)
+
+    def batch_written(self, rows: int, seconds: float, queue_depth: int):
+        values = self._values
+        if values is None:
+            return
+        values[self._slot["rows_written"]] += rows
+        values[self._slot["batches"]] += 1.0
+        values[self._slot["queue_depth"]] = queue_depth
+        values[self._slot["write_sum"]] += seconds
+        values[self._slot["write_count"]] += 1.0
+        values[self._write_buckets_at + bisect_left(self.write_buckets, seconds)] += 1.0
+
+    def write_failed(self, rows: int):
+        self._add("write_errors")
+        self._add("rows_dropped", rows)
+
+    # --- Reader side (API) ---
+
+    def render(self) -> list:
+        if not self.attach():
+            return []
+        values = self._values.copy()
+        get = lambda slot: values[self._slot[slot]]
+
+        lines = []
+        lines += _header("quantstream_ingest_ticks_total", "Trades received from the exchange, by symbol.", "counter")
+        for symbol in self.symbols:
+            lines.append(f'quantstream_ingest_ticks_total{{symbol="{symbol}"}} {_format_value(get(f"ticks:{symbol}"))}')
+        lines += _header(
+            "quantstream_ingest_last_trade_timestamp_seconds", "Exchange time of the newest trade, by symbol.", "gauge"
+        )
+        for symbol in self.symbols:
+            lines.append(
+                f'quantstream_ingest_last_trade_timestamp_seconds{{symbol="{symbol}"}} '
+                f"{_format_value(get(f'last_trade:{symbol}') / 1000.0)}"
+            )
+
+        for name, slot, kind, help_text in (
+            ("quantstream_ingest_invalid_messages_total", "messages_invalid", "counter", "Stream messages that could not be parsed."),
+            ("quantstream_ingest_connections_total", "connections", "counter", "Websocket connections opened to the exchange."),
+            ("quantstream_ingest_disconnects_total", "disconnects", "counter", "Websocket connections lost (each is followed by a reconnect)."),
+            ("quantstream_db_rows_written_total", "rows_written", "counter", "Ticks written to SQLite."),
+            ("quantstream_db_write_batches_total", "batches", "counter", "Write transactions committed by the tick writer."),
+            ("quantstream_db_write_errors_total", "write_errors", "counter", "Write transactions that failed."),
+            ("quantstream_db_rows_dropped_total", "rows_dropped", "counter", "Ticks lost to failed writes."),
+            ("quantstream_db_write_queue_depth", "queue_depth", "gauge", "Ticks waiting for the writer after its last flush."),
+        ):
+            lines += _header(name, help_text, kind)
+            lines.append(f"{name} {_format_value(get(slot))}")
+
+        name = "quantstream_db_write_duration_seconds"
+        lines += _header(name, "Duration of one tick writer transaction (ticks and bars).", "histogram")
+        counts = values[self._write_buckets_at : self._write_buckets_at + len(self.write_buckets) + 1]
+        lines += _histogram_lines(name, (), (), self.write_buckets, counts, get("write_sum"), get("write_count"))
+
+        if self.shards > 1:
+            for name, slot, kind, help_text in (
+                ("quantstream_ingest_shard_ticks_total", "shard_ticks", "counter", "Trades received, by ingest shard."),
+                ("quantstream_ingest_shard_symbols", "shard_symbols", "gauge", "Symbols assigned to each ingest shard."),
+                ("quantstream_ingest_shard_connected", "shard_connected", "gauge", "1 while the shard's websocket is connected."),
+            ):
+                lines += _header(name, help_text, kind)
+                for shard in range(self.shards):
+                    lines.append(f'{name}{{shard="{shard}"}} {_format_value(get(f"{slot}:{shard}"))}')
+            for name, slot, help_text in (
+                ("quantstream_ingest_rebalances_total", "rebalances", "Shard rebalancing rounds that moved symbols."),
+                ("quantstream_ingest_symbols_moved_total", "symbols_moved", "Symbols moved between shards."),
+            ):
+                lines += _header(name, help_text, "counter")
+                lines.append(f"{name} {_format_value(get(slot))}")
+        return lines
+
+
+# Shared by the ingestor (writer) and the API (reader); each process has its own view.
+ingest_metrics = IngestMetrics()
+
+# --- API metrics ---
+# Per API process: with several workers each one reports its own requests.
+
+registry = Registry()
+registry.add_collector(ingest_metrics.render)
+
+http_request_duration = registry.register(
+    Histogram(
+        "quantstream_http_request_duration_seconds",
+        "HTTP request latency by route.",
+        labels=("method", "endpoint", "status"),
+    )
+)
+chart_data_duration = registry.register(
+    Histogram(
+        "quantstream_chart_data_duration_seconds",
+        "Latency of /api/chart-data by timeframe.",
+        labels=("timeframe",),
+    )
+)
+websocket_connections = registry.register(
+    Gauge("quantstream_websocket_connections", "Open websocket connections.", labels=("endpoint",))
+)
+tick_to_send_lag = registry.register(
+    Histogram(
+        "quantstream_tick_to_send_lag_seconds",
+        "Exchange trade time of the newest tick in a live packet to the moment it is sent.",
+        buckets=LAG_BUCKETS,
+    )
+)
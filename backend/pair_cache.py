@@ -0,0 +1,232 @@
+import hashlib
+import os
+import pickle
+import stat
+import threading
+from collections import OrderedDict
+
+from config import PAIR_CACHE_MAX_ENTRIES, PAIR_CACHE_MAX_BYTES
+
+
+class _Entry:
+    __slots__ = ("value", "watermark", "nbytes", "extendable")
+
+    def __init__(self, value, watermark, nbytes, extendable=True):
+        self.value = value
+        self.watermark = watermark
+        self.nbytes = nbytes
+        # False for values loaded from the shared store, which may lack what
+        # `compute` needs to extend them.
+        self.extendable = extendable
+
+
+class SharedResultStore:
+    """
+    Cache entries shared between API worker processes, one pickle file per key in
+    `directory` (on tmpfs, so this is shared memory in practice).
+
+    Unpickling runs code, so the directory must be private to this user: app.py
+    creates a fresh one per run (mkdtemp). Anything else is refused.
+
+    A file holds the pickled watermark followed by the pickled value, so a reader
+    can tell whether an entry is current before unpickling the value. Files are
+    written to a temporary name and renamed into place, so readers only ever see
+    complete entries. Beyond `max_files` the least recently written are removed.
+    """
+
+    def __init__(self, directory: str, max_files: int = PAIR_CACHE_MAX_ENTRIES):
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+            raise PermissionError(
+                f"Shared cache directory {directory} must be a directory owned by this "
+                "user with mode 0700."
+            )
+        self.directory = directory
+        self.max_files = max_files
+
+    def _path(self, key) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def load(self, key, newer_than=None):
+        """
+        Returns (value, watermark) of the stored entry, or None when there is none
+        or its watermark is not newer than `newer_than`.
+        """
+        try:
+            with open(self._path(key), "rb") as f:
+                watermark = pickle.load(f)
+                if newer_than is not None and watermark <= newer_than:
+                    return None
+                return pickle.load(f), watermark
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, key, watermark, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(watermark, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"--- Shared cache write failed: {e} ---")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._prune()
+
+    def _prune(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".pkl")]
+            if len(entries) <= self.max_files:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[: len(entries) - self.max_files]:
+                os.remove(entry.path)
+        except OSError:
+            pass  # another worker pruned the same files
+
+
+class PairAnalyticsCache:
+    """
+    In-process LRU cache of computed pair analytics.
+
+    Keys are any hashable tuple of the parameters a result depends on (for the
+    chart data: pair, timeframe, window, range, hedge mode and lookback, and the
+    time of the last backfill). Each entry remembers the watermark it was
+    computed at: the timestamp of the newest stored tick. When a
+    caller presents a newer watermark the entry is handed back to `compute` as the
+    previous value so it can be extended incrementally instead of rebuilt.
+
+    The cache is bounded both by entry count and by the approximate memory size
+    reported by `sizeof`, evicting least recently used entries first.
+
+    With a `shared` SharedResultStore, results computed by other worker processes
+    are used before computing when they are current at the requested watermark.
+    Only `share(value)` is written to the store (default: the whole value), so a
+    value loaded from it is served but never extended; the next stale lookup of
+    that key computes from scratch.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PAIR_CACHE_MAX_ENTRIES,
+        max_bytes: int = PAIR_CACHE_MAX_BYTES,
+        sizeof=None,
+        shared: SharedResultStore = None,
+        share=None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._shared = shared
+        self._share = share or (lambda value: value)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # One lock per key so concurrent requests for the same key compute once:
+        # key -> [lock, number of callers using it]. A lock is dropped when its
+        # last caller is done, so the table only holds keys being looked up.
+        self._key_locks = {}
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.evictions = 0
+
+    def get(self, key, watermark, compute):
+        """
+        Returns the cached value for `key` if it is current at `watermark`,
+        otherwise calls `compute(previous)` and caches the result. `previous` is the
+        stale cached value, or None on a miss.
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            return self._get(key, watermark, compute, key_lock[0])
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if key_lock[1] == 0:
+                    del self._key_locks[key]
+
+    def _get(self, key, watermark, compute, key_lock):
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and watermark is not None and entry.watermark >= watermark:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+
+            previous = entry.value if entry is not None and entry.extendable else None
+            if self._shared is not None and watermark is not None:
+                # Only an entry current at `watermark` is unpickled.
+                stored = self._shared.load(key, watermark - 1)
+                if stored is not None:
+                    shared_value, shared_watermark = stored
+                    with self._lock:
+                        self.shared_hits += 1
+                        self._store(
+                            key,
+                            _Entry(shared_value, shared_watermark, self._sizeof(shared_value), False),
+                        )
+                    return shared_value
+
+            value = compute(previous)
+            if self._shared is not None and watermark is not None:
+                self._shared.save(key, watermark, self._share(value))
+
+            with self._lock:
+                if previous is None:
+                    self.misses += 1
+                else:
+                    self.extensions += 1
+                self._store(key, _Entry(value, watermark, self._sizeof(value)))
+            return value
+
+    def invalidate(self, key=None):
+        """Drops one entry, or every entry when no key is given."""
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                entry = self._entries.pop(k, None)
+                if entry is not None:
+                    self._bytes -= entry.nbytes
+
+    def _store(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+
+        # Evict least recently used entries, but always keep the one just stored.
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses + self.extensions
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "extensions": self.extensions,
+                "evictions": self.evictions,
+                "hit_ratio": ((self.hits + self.shared_hits) / lookups) if lookups else 0.0,
+            }
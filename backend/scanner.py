@@ -0,0 +1,224 @@
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from adf import adf_test_batch
+from bars import load_bars, pair_bar_range
+from config import SCANNER_ADF_PAIRS, SCANNER_MAX_BARS, SCANNER_PROCESSES
+
+
+# --- 1. Data ---
+
+
+def load_close_matrix(
+    conn, symbols, timeframe: str, max_bars: int = SCANNER_MAX_BARS
+) -> pd.DataFrame:
+    """
+    Loads the bar closes of every symbol once, as one column per symbol over the
+    union of their bar times. A symbol without a bar in a period keeps its previous
+    close (as in combine_pair_bars); periods before every symbol has traded are
+    dropped, so all pairs are scanned on the same sample.
+    """
+    bounds = pair_bar_range(conn, symbols, timeframe, max_bars)
+    if bounds is None:
+        return pd.DataFrame(columns=list(symbols), dtype="float64")
+
+    closes = {
+        symbol: load_bars(conn, symbol, timeframe, *bounds)["close"] for symbol in symbols
+    }
+    return pd.DataFrame(closes).sort_index().ffill().dropna()
+
+
+# --- 2. Batched regressions ---
+
+
+def scan_regressions(prices: np.ndarray) -> dict:
+    """
+    Solves the OLS regression y = a + b*x for every ordered pair of columns of a
+    (T, N) price matrix at once, from its covariance matrix. Entry [i, j] of each
+    returned (N, N) array describes the pair y = column i, x = column j.
+
+    Also returns the standard deviation and current z-score of each pair's spread
+    (y - b*x) and its mean-reversion half-life in bars, from the AR(1) regression
+    d(spread) = c + lambda * spread(-1), also solved in closed form for all pairs.
+    """
+    n_obs = prices.shape[0]
+    means = prices.mean(axis=0)
+    centered = prices - means
+    cov = centered.T @ centered / (n_obs - 1)
+    var = np.diag(cov)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = cov / var[np.newaxis, :]
+        intercept = means[:, np.newaxis] - beta * means[np.newaxis, :]
+        corr = cov / np.sqrt(np.outer(var, var))
+
+        # Spread moments: the mean of y - b*x is the intercept, and
+        # var(y - b*x) = var(y) - 2b*cov(x, y) + b^2*var(x).
+        spread_mean = intercept
+        spread_var = var[:, np.newaxis] - 2 * beta * cov + beta**2 * var[np.newaxis, :]
+        spread_std = np.sqrt(np.clip(spread_var, 0.0, None))
+        last = prices[-1]
+        spread_last = last[:, np.newaxis] - beta * last[np.newaxis, :]
+        z_score = (spread_last - spread_mean) / spread_std
+
+        # Half-life: cov(d_s, s_lag) / var(s_lag) expands into the cross-covariances
+        # of the price changes with the lagged prices, shared by every pair.
+        lagged = prices[:-1] - prices[:-1].mean(axis=0)
+        diffs = np.diff(prices, axis=0)
+        diffs = diffs - diffs.mean(axis=0)
+        a = diffs.T @ lagged  # a[p, q] = cov(d_p, lag_q) * (T - 2)
+        b = lagged.T @ lagged
+        a_diag = np.diag(a)
+        b_diag = np.diag(b)
+        cov_ds = (
+            a_diag[:, np.newaxis]
+            - beta * a
+            - beta * a.T
+            + beta**2 * a_diag[np.newaxis, :]
+        )
+        var_lag = (
+            b_diag[:, np.newaxis] - 2 * beta * b + beta**2 * b_diag[np.newaxis, :]
+        )
+        lam = cov_ds / var_lag
+        half_life = np.where(lam < 0, -math.log(2) / lam, np.inf)
+
+    return {
+        "hedge_ratio": beta,
+        "intercept": intercept,
+        "correlation": corr,
+        "spread_std": spread_std,
+        "z_score": z_score,
+        "half_life": half_life,
+    }
+
+
+# --- 3. ADF tests in worker processes ---
+
+WORKERS = SCANNER_PROCESSES or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """The scanner's process pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads, which fork does not copy safely.
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _adf_chunk(spreads: list) -> list:
+    """Worker: (test statistic, p-value) of every spread series in a chunk."""
+    result = adf_test_batch(np.vstack(spreads))
+    return list(zip(result["test_statistic"].tolist(), result["p_value"].tolist()))
+
+
+def run_adf_batch(spreads: list, pool: ProcessPoolExecutor = None) -> list:
+    """Runs the ADF test on every spread, split into one chunk per worker."""
+    if not spreads:
+        return []
+    pool = pool or get_pool()
+    n_chunks = min(len(spreads), WORKERS)
+    chunks = [spreads[i::n_chunks] for i in range(n_chunks)]
+
+    results = [None] * len(spreads)
+    for offset, chunk_results in enumerate(pool.map(_adf_chunk, chunks)):
+        results[offset::n_chunks] = chunk_results
+    return results
+
+
+# --- 4. Scan ---
+
+
+def scan_pairs(
+    closes: pd.DataFrame,
+    max_adf_pairs: int = SCANNER_ADF_PAIRS,
+    limit: int = None,
+    pool=None,
+) -> tuple:
+    """
+    Ranks every ordered pair of the columns of `closes`.
+
+    All pairs get their hedge ratio, correlation, half-life and current z-score
+    from the batched regressions. The ADF test, which dominates the cost, is run
+    on the `max_adf_pairs` most correlated pairs whose spread moves only. Pairs are
+    ranked by ADF p-value (untested pairs last), then by |z-score|.
+
+    Returns (number of pairs scanned, the top `limit` rows).
+    """
+    symbols = list(closes.columns)
+    prices = np.ascontiguousarray(closes.to_numpy(dtype=np.float64))
+    stats = scan_regressions(prices)
+
+    # Flatten to one entry per ordered pair (y = i, x = j), dropping i == j and
+    # pairs whose x never moved.
+    y_idx, x_idx = np.nonzero(~np.eye(len(symbols), dtype=bool))
+    valid = np.isfinite(stats["hedge_ratio"][y_idx, x_idx])
+    y_idx, x_idx = y_idx[valid], x_idx[valid]
+    flat = {name: values[y_idx, x_idx] for name, values in stats.items()}
+
+    # A spread that never moves (a constant y gets b = 0) has nothing to test and
+    # would make its ADF regression singular, so it is left untested.
+    testable = np.flatnonzero(flat["spread_std"] > 0)
+    by_correlation = np.argsort(
+        -np.abs(np.nan_to_num(flat["correlation"][testable])), kind="stable"
+    )
+    tested = testable[by_correlation][:max_adf_pairs]
+    spreads = [
+        prices[:, y_idx[k]] - flat["hedge_ratio"][k] * prices[:, x_idx[k]] for k in tested
+    ]
+    adf_statistic = np.full(len(y_idx), np.nan)
+    adf_p_value = np.full(len(y_idx), np.nan)
+    for k, (statistic, p_value) in zip(tested, run_adf_batch(spreads, pool)):
+        adf_statistic[k] = statistic
+        adf_p_value[k] = p_value
+
+    # np.lexsort sorts by the last key first.
+    order = np.lexsort(
+        (
+            -np.abs(np.nan_to_num(flat["z_score"])),
+            np.nan_to_num(adf_p_value, nan=np.inf),
+        )
+    )
+    if limit is not None:
+        order = order[:limit]
+
+    def _value(value):
+        value = float(value)
+        return value if math.isfinite(value) else None
+
+    rows = [
+        {
+            "y_symbol": symbols[y_idx[k]],
+            "x_symbol": symbols[x_idx[k]],
+            "hedge_ratio": _value(flat["hedge_ratio"][k]),
+            "intercept": _value(flat["intercept"][k]),
+            "correlation": _value(flat["correlation"][k]),
+            "half_life": _value(flat["half_life"][k]),
+            "z_score": _value(flat["z_score"][k]),
+            "adf_statistic": _value(adf_statistic[k]),
+            "adf_p_value": _value(adf_p_value[k]),
+        }
+        for k in order
+    ]
+    return len(y_idx), rows
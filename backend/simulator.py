@@ -0,0 +1,288 @@
+# Local stand-in for the Binance combined-stream websocket, for load tests and offline
+# runs. Serves /stream?streams=btcusdt@trade/... in the same message format as
+# Binance and replays ticks from our database or from a synthetic generator at a
+# chosen speed. Point the ingestor at it with
+#
+#   QUANTSTREAM_STREAM_URL=ws://127.0.0.1:9443/stream python app.py
+#   python simulator.py --source db --speed 10
+#
+# Every connection gets its own replay from the beginning. Like Binance, a connection
+# can change its streams with {"method": "SUBSCRIBE" | "UNSUBSCRIBE", "params": [...],
+# "id": n}; the replay covers every symbol and only subscribed ones are sent.
+
+import argparse
+import asyncio
+import heapq
+import math
+import random
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import orjson
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+from config import SIMULATOR_HOST, SIMULATOR_PORT, SUPPORTED_SYMBOLS
+from database import get_db_connection
+from tick_store import RANGE_TICKS_SQL, latest_tick, list_symbols
+
+# Ticks sent between two yields to the event loop when replaying at full speed.
+MAX_SPEED_BATCH = 500
+
+# How tick timestamps are written: "shift" keeps the recorded spacing (scaled by the
+# speed) but moves the replay to start now, "original" sends them unchanged and
+# "wall" stamps every tick with the time it is sent (for end-to-end latency runs).
+CLOCKS = ("shift", "original", "wall")
+
+
+# --- Tick sources ---
+# A source is an iterator of (timestamp, symbol, price, quantity, trade_id) tuples in
+# timestamp order.
+
+
+def db_ticks(symbols, start_ms: int = 0, end_ms: int = 2**62):
+    """
+    Ticks stored in the `ticks` table for `symbols` within [start_ms, end_ms),
+    merged across symbols by timestamp. Each symbol is read with its own
+    primary-key range scan. Ticks already moved to the archive are not included.
+    """
+    conn = get_db_connection(read_only=True)
+    try:
+        ids = {name: symbol_id for symbol_id, name in list_symbols(conn)}
+
+        def one_symbol(name):
+            for timestamp, trade_id, price, quantity in conn.execute(
+                RANGE_TICKS_SQL, (ids[name], start_ms, end_ms)
+            ):
+                yield timestamp, name, price, quantity, trade_id
+
+        yield from heapq.merge(
+            *(one_symbol(name) for name in symbols if name in ids), key=lambda tick: tick[0]
+        )
+    finally:
+        conn.close()
+
+
+def synthetic_ticks(
+    symbols,
+    rate: float = 50.0,
+    start_prices: dict = None,
+    volatility: float = 0.5,
+    seed: int = None,
+    skew: float = 0.0,
+):
+    """
+    Endless synthetic trades. Arrivals are Poisson with `rate` ticks per second
+    over all symbols; with `skew` > 0 the k-th symbol trades in proportion to
+    1 / k**skew (Zipf), so a few symbols are hot. Log prices share one random-walk
+    factor, with annualised `volatility`, plus a mean-reverting idiosyncratic
+    part, so every pair is cointegrated. Prices start at `start_prices` (default:
+    the last stored tick, else 100).
+    """
+    rng = random.Random(seed)
+    symbols = list(symbols)
+    weights = [1.0 / (k + 1) ** skew for k in range(len(symbols))]
+    if start_prices is None:
+        start_prices = _last_prices(symbols)
+    log_start = {s: math.log(start_prices.get(s) or 100.0) for s in symbols}
+    betas = {s: rng.uniform(0.8, 1.2) for s in symbols}
+    residuals = dict.fromkeys(symbols, 0.0)
+    trade_ids = dict.fromkeys(symbols, 0)
+
+    seconds_per_year = 365.0 * 24 * 3600
+    factor_scale = volatility / math.sqrt(seconds_per_year)
+    residual_scale = factor_scale * 0.3
+    reversion = 1.0 / 300.0  # residual half-life of a few minutes
+
+    timestamp = time.time() * 1000.0
+    factor = 0.0
+    last_seen = dict.fromkeys(symbols, timestamp)
+    while True:
+        gap_ms = rng.expovariate(rate) * 1000.0
+        timestamp += gap_ms
+        factor += factor_scale * math.sqrt(gap_ms / 1000.0) * rng.gauss(0.0, 1.0)
+
+        symbol = rng.choices(symbols, weights)[0]
+        elapsed = (timestamp - last_seen[symbol]) / 1000.0
+        last_seen[symbol] = timestamp
+        decay = math.exp(-reversion * elapsed)
+        residuals[symbol] = residuals[symbol] * decay + residual_scale * math.sqrt(
+            elapsed
+        ) * rng.gauss(0.0, 1.0)
+
+        price = math.exp(log_start[symbol] + betas[symbol] * factor + residuals[symbol])
+        trade_ids[symbol] += 1
+        quantity = round(rng.expovariate(1.0), 5)
+        yield int(timestamp), symbol, price, quantity, trade_ids[symbol]
+
+
+def _last_prices(symbols) -> dict:
+    try:
+        conn = get_db_connection(read_only=True)
+    except Exception:
+        return {}
+    try:
+        prices = {}
+        for symbol in symbols:
+            tick = latest_tick(conn, symbol)
+            if tick:
+                prices[symbol] = tick["price"]
+        return prices
+    except Exception:
+        return {}
+    finally:
+        conn.close()
+
+
+# --- Binance message format ---
+
+
+def trade_message(timestamp: int, symbol: str, price: float, quantity: float, trade_id: int) -> str:
+    """One combined-stream `@trade` message, as Binance sends it (a text frame)."""
+    return orjson.dumps(
+        {
+            "stream": f"{symbol.lower()}@trade",
+            "data": {
+                "e": "trade",
+                "E": int(time.time() * 1000),
+                "s": symbol,
+                "t": trade_id,
+                "p": f"{price:.8f}",
+                "q": f"{quantity:.8f}",
+                "T": timestamp,
+                "m": False,
+                "M": True,
+            },
+        }
+    ).decode()
+
+
+def requested_symbols(path: str) -> list:
+    """Symbols of the `@trade` streams in a /stream?streams=a@trade/b@trade path."""
+    streams = parse_qs(urlsplit(path).query).get("streams", [""])[0]
+    return [
+        stream.split("@", 1)[0].upper()
+        for stream in streams.split("/")
+        if stream.endswith("@trade")
+    ]
+
+
+# --- Replay ---
+
+
+async def replay(send, ticks, speed: float = 1.0, clock: str = "shift", report_every: float = 5.0) -> int:
+    """
+    Sends `ticks` through `send(message)`, paced at `speed` times the recorded
+    rate (speed=None sends as fast as possible). Returns the number sent.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    wall_start_ms = int(time.time() * 1000)
+    first_ms = None
+    sent = 0
+    reported, reported_at = 0, started
+
+    for timestamp, symbol, price, quantity, trade_id in ticks:
+        if first_ms is None:
+            first_ms = timestamp
+
+        if speed is not None:
+            delay = started + (timestamp - first_ms) / 1000.0 / speed - loop.time()
+            if delay > 0.001:
+                await asyncio.sleep(delay)
+        elif sent % MAX_SPEED_BATCH == 0:
+            await asyncio.sleep(0)
+
+        if clock == "shift":
+            timestamp = wall_start_ms + timestamp - first_ms
+        elif clock == "wall":
+            timestamp = int(time.time() * 1000)
+        await send(trade_message(timestamp, symbol, price, quantity, trade_id))
+        sent += 1
+
+        now = loop.time()
+        if now - reported_at >= report_every:
+            rate = (sent - reported) / (now - reported_at)
+            print(f"--- Simulator: {sent} ticks sent ({rate:,.0f}/s) ---")
+            reported, reported_at = sent, now
+
+    elapsed = loop.time() - started
+    print(f"--- Simulator: replay finished, {sent} ticks in {elapsed:.1f}s ---")
+    return sent
+
+
+async def handle_requests(connection, subscribed: set):
+    """Applies SUBSCRIBE / UNSUBSCRIBE requests of a client to `subscribed`."""
+    async for message in connection:
+        try:
+            request = orjson.loads(message)
+            method, params = request["method"], request.get("params", [])
+        except (ValueError, KeyError, TypeError):
+            continue
+        symbols = {s.split("@", 1)[0].upper() for s in params if s.endswith("@trade")}
+        if method == "SUBSCRIBE":
+            subscribed |= symbols
+        elif method == "UNSUBSCRIBE":
+            subscribed -= symbols
+        await connection.send(orjson.dumps({"result": None, "id": request.get("id")}).decode())
+
+
+def make_handler(source_factory, speed, clock):
+    """
+    websockets handler replaying source_factory(SUPPORTED_SYMBOLS) to each
+    connection, filtered to the symbols it is subscribed to.
+    """
+
+    async def handler(connection):
+        subscribed = set(requested_symbols(connection.request.path) or SUPPORTED_SYMBOLS)
+        print(f"--- Simulator: client subscribed to {len(subscribed)} symbols ---")
+        ticks = (tick for tick in source_factory(list(SUPPORTED_SYMBOLS)) if tick[1] in subscribed)
+        requests = asyncio.create_task(handle_requests(connection, subscribed))
+        try:
+            await replay(connection.send, ticks, speed, clock)
+        except ConnectionClosed:
+            print("--- Simulator: client disconnected ---")
+        finally:
+            requests.cancel()
+
+    return handler
+
+
+async def run_simulator(source_factory, speed=1.0, clock="shift", host=SIMULATOR_HOST, port=SIMULATOR_PORT):
+    async with serve(make_handler(source_factory, speed, clock), host, port) as server:
+        print(f"--- Simulator listening on ws://{host}:{port}/stream ---")
+        await server.serve_forever()
+
+
+def _parse_speed(value: str):
+    if value.lower() in ("max", "0"):
+        return None
+    speed = float(value.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays ticks as a local Binance stream.")
+    parser.add_argument("--source", choices=("db", "synthetic"), default="db")
+    parser.add_argument("--speed", type=_parse_speed, default=1.0, help="1, 10, ... or 'max'")
+    parser.add_argument("--clock", choices=CLOCKS, default="shift")
+    parser.add_argument("--start", type=int, default=0, help="db: first tick time (ms)")
+    parser.add_argument("--end", type=int, default=2**62, help="db: end of the range (ms)")
+    parser.add_argument("--rate", type=float, default=50.0, help="synthetic: ticks per second, all symbols")
+    parser.add_argument("--skew", type=float, default=0.0, help="synthetic: Zipf exponent of symbol activity")
+    parser.add_argument("--seed", type=int, default=None, help="synthetic: random seed")
+    parser.add_argument("--host", default=SIMULATOR_HOST)
+    parser.add_argument("--port", type=int, default=SIMULATOR_PORT)
+    args = parser.parse_args()
+
+    if args.source == "db":
+        factory = lambda symbols: db_ticks(symbols, args.start, args.end)
+    else:
+        factory = lambda symbols: synthetic_ticks(symbols, args.rate, seed=args.seed, skew=args.skew)
+
+    try:
+        asyncio.run(run_simulator(factory, args.speed, args.clock, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
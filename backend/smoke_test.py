@@ -0,0 +1,97 @@
+# End-to-end smoke test of the sharded ingestor: starts the local simulator and the
+# ingestor the way app.py does, with INGEST_SHARDS=2, and checks that ticks of every
+# symbol (so from both shard processes) reach the database and that the ingestor
+# stops cleanly. Uses a throwaway database and its own symbols:
+#
+#   python smoke_test.py
+#
+# Exits with status 1 on failure. Don't run it next to a live app.py: both use the
+# same shared-memory metrics block.
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SMOKE_SYMBOLS = ["SMOKEAUSDT", "SMOKEBUSDT", "SMOKECUSDT", "SMOKEDUSDT"]
+SMOKE_SHARDS = 2
+TIMEOUT = 60.0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def smoke_sharded_ingestor(work_dir: str) -> bool:
+    port = _free_port()
+    # Read by config.py on import, here and in every spawned process.
+    os.environ["QUANTSTREAM_DB_PATH"] = os.path.join(work_dir, "smoke.db")
+    os.environ["QUANTSTREAM_STREAM_URL"] = f"ws://127.0.0.1:{port}/stream"
+    os.environ["QUANTSTREAM_INGEST_SHARDS"] = str(SMOKE_SHARDS)
+    os.environ["QUANTSTREAM_SYMBOLS"] = ",".join(SMOKE_SYMBOLS)
+
+    from app import start_ingestor, stop_ingestor
+    from database import create_tables, get_db_connection
+    from metrics import ingest_metrics
+    from tick_ring import create_rings
+
+    create_tables()
+    rings = create_rings(SMOKE_SYMBOLS)
+    ingest_metrics.create()
+    simulator = subprocess.Popen(
+        [sys.executable, "simulator.py", "--source", "synthetic", "--rate", "200",
+         "--seed", "1", "--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    ingestor = None
+    try:
+        time.sleep(1.0)  # let the simulator bind its port
+        ingestor = start_ingestor()
+        seen = set()
+        deadline = time.monotonic() + TIMEOUT
+        while time.monotonic() < deadline and ingestor.is_alive():
+            time.sleep(1.0)
+            conn = get_db_connection(read_only=True)
+            try:
+                seen = {
+                    row[0]
+                    for row in conn.execute(
+                        "SELECT DISTINCT symbol FROM ohlc_bars WHERE timeframe = '1s'"
+                    )
+                }
+            finally:
+                conn.close()
+            if seen >= set(SMOKE_SYMBOLS):
+                break
+
+        alive = ingestor.is_alive()
+        stop_ingestor(ingestor)
+        missing = sorted(set(SMOKE_SYMBOLS) - seen)
+        if not alive:
+            print(f"--- Smoke test FAILED: ingestor exited with code {ingestor.exitcode} ---")
+        elif missing:
+            print(f"--- Smoke test FAILED: no ticks for {', '.join(missing)} ---")
+        elif ingestor.exitcode != 0:
+            print(f"--- Smoke test FAILED: ingestor stopped with code {ingestor.exitcode} ---")
+        else:
+            print(f"--- Smoke test passed: {len(seen)} symbols over {SMOKE_SHARDS} shards ---")
+            return True
+        return False
+    finally:
+        if ingestor is not None and ingestor.is_alive():
+            stop_ingestor(ingestor)
+        simulator.terminate()
+        simulator.wait()
+        for ring in rings.values():
+            ring.close()
+        ingest_metrics.close()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as work_dir:
+        passed = smoke_sharded_ingestor(work_dir)
+    sys.exit(0 if passed else 1)
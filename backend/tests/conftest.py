@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules (as app.py runs them).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """A connection to a fresh database with every table created."""
+    monkeypatch.setattr(database, "DB_FILE_PATH", str(tmp_path / "test.db"))
+    database.create_tables()
+    conn = database.get_db_connection()
+    yield conn
+    conn.close()
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from adf import adf_test, adf_test_batch
+
+
+@pytest.mark.parametrize("maxlag, autolag", [(None, "AIC"), (4, None)])
+def test_degenerate_rows_do_not_fail_the_batch(maxlag, autolag):
+    rng = np.random.default_rng(3)
+    walk = np.cumsum(rng.normal(size=300))
+    with_nan = walk.copy()
+    with_nan[10] = np.nan
+    batch = np.vstack([walk, np.full(300, 7.0), np.arange(300.0), with_nan])
+
+    result = adf_test_batch(batch, maxlag, autolag)
+
+    expected = adf_test(walk, maxlag, autolag)
+    assert result["test_statistic"][0] == pytest.approx(expected["test_statistic"])
+    assert result["p_value"][0] == pytest.approx(expected["p_value"])
+    assert np.isnan(result["test_statistic"][1:]).all()
+    assert np.isnan(result["p_value"][1:]).all()
@@ -0,0 +1,32 @@
+import numpy as np
+
+from archive import DAY_MS, archive_old_ticks, read_archived_ticks
+from tick_store import SymbolIds, insert_ticks
+
+DAY = 1_700_006_400_000 - 1_700_006_400_000 % DAY_MS
+
+
+def _store(conn, ticks):
+    insert_ticks(conn, ticks, SymbolIds())
+    conn.commit()
+
+
+def test_rearchiving_ticks_left_in_sqlite_does_not_duplicate_them(conn):
+    ticks = [
+        (DAY + 1_000, "BTCUSDT", 100.0, 1.0, 1),
+        (DAY + 1_000, "BTCUSDT", 100.5, 2.0, 2),
+        (DAY + 2_000, "BTCUSDT", 101.0, 1.0, 3),
+    ]
+    _store(conn, ticks)
+    assert archive_old_ticks(conn, DAY + DAY_MS) == 3
+
+    # A crash between writing the day and deleting its rows leaves them in SQLite;
+    # the next run finds them again, next to a tick that arrived late.
+    _store(conn, ticks + [(DAY + 1_500, "BTCUSDT", 100.2, 3.0, 4)])
+    assert archive_old_ticks(conn, DAY + DAY_MS) == 4
+
+    timestamps, prices, quantities = read_archived_ticks("BTCUSDT", DAY, DAY + DAY_MS)
+    assert timestamps.tolist() == [DAY + 1_000, DAY + 1_000, DAY + 1_500, DAY + 2_000]
+    assert prices.tolist() == [100.0, 100.5, 100.2, 101.0]
+    assert np.sum(quantities) == 7.0
+    assert conn.execute("SELECT COUNT(*) FROM ticks").fetchone()[0] == 0
@@ -0,0 +1,21 @@
+from ingest_shards import ShardCoordinator
+
+
+def _ticks(symbol, trade_ids):
+    return [(1_700_000_000_000 + i, symbol, 100.0, 1.0, i) for i in trade_ids]
+
+
+def test_handover_keeps_trades_of_interleaved_shards_once():
+    coordinator = ShardCoordinator(["BTCUSDT", "ETHUSDT"], 2, lambda ticks: None)
+    coordinator._start_handover(["BTCUSDT"])
+
+    # The new shard's batch arrives before an older batch of the old shard, which
+    # still holds trade 10; both deliver 11 and 12.
+    kept = coordinator._drop_duplicates(_ticks("BTCUSDT", [11, 12, 13]))
+    kept += coordinator._drop_duplicates(_ticks("BTCUSDT", [10, 11, 12]))
+    kept += coordinator._drop_duplicates(_ticks("BTCUSDT", [14]) + _ticks("ETHUSDT", [1, 1]))
+
+    assert sorted(tick[4] for tick in kept if tick[1] == "BTCUSDT") == [10, 11, 12, 13, 14]
+    # Symbols that are not moving are passed through untouched.
+    assert [tick[4] for tick in kept if tick[1] == "ETHUSDT"] == [1, 1]
+    assert coordinator.duplicates == 2
@@ -0,0 +1,27 @@
+import json
+import math
+
+from live_encoding import binary_frame, decode_binary_frame, encode_json, encode_values
+
+
+def _reject_constant(name):
+    raise AssertionError(f"{name} is not valid JSON")
+
+
+def test_nan_z_score_is_sent_as_null():
+    packet = {
+        "timestamp": 1_700_000_000_000,
+        "y_price": 100.0,
+        "x_price": 50.0,
+        "spread": 0.0,
+        "z_score": float("nan"),
+        "regression_line_value": float("inf"),
+    }
+
+    decoded = json.loads(encode_json(packet), parse_constant=_reject_constant)
+    assert decoded["z_score"] is None and decoded["regression_line_value"] is None
+    assert decoded["y_price"] == 100.0
+
+    # The binary encoding carries the NaN itself.
+    frame = binary_frame(packet["timestamp"], encode_values(packet))
+    assert math.isnan(decode_binary_frame(frame)["z_score"])
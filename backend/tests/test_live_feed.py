@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+from live_feed import LiveFeedError, PublisherRegistry
+
+
+class _AlertEngine:
+    def evaluate(self, pair, z_score):
+        return []
+
+
+# The `conn` fixture points the database at a temporary file: started publishers
+# poll it for ticks.
+def test_slow_bootstrap_holds_up_only_its_own_pair(conn):
+    release = threading.Event()
+
+    def bootstrap(y_symbol, x_symbol):
+        if y_symbol == "SLOWUSDT":
+            release.wait(5)
+        return object()
+
+    async def scenario():
+        registry = PublisherRegistry(bootstrap, _AlertEngine())
+        first = asyncio.create_task(registry.subscribe("SLOWUSDT", "BTCUSDT"))
+        second = asyncio.create_task(registry.subscribe("SLOWUSDT", "BTCUSDT"))
+        await asyncio.sleep(0.05)
+
+        # The lock is free while SLOWUSDT/BTCUSDT bootstraps.
+        await asyncio.wait_for(registry.subscribe("ETHUSDT", "BTCUSDT"), 1)
+        assert not first.done() and not second.done()
+
+        release.set()
+        await asyncio.wait_for(asyncio.gather(first, second), 5)
+        assert registry.stats()["SLOWUSDT/BTCUSDT"]["subscribers"] == 2
+        await registry.stop_all()
+
+    asyncio.run(scenario())
+
+
+def test_failed_bootstrap_fails_every_waiting_subscriber(conn):
+    release = threading.Event()
+
+    def bootstrap(y_symbol, x_symbol):
+        release.wait(5)
+        raise LiveFeedError("Not enough data to initialize.")
+
+    async def scenario():
+        registry = PublisherRegistry(bootstrap, _AlertEngine())
+        first = asyncio.create_task(registry.subscribe("SLOWUSDT", "BTCUSDT"))
+        second = asyncio.create_task(registry.subscribe("SLOWUSDT", "BTCUSDT"))
+        await asyncio.sleep(0.05)
+        release.set()
+
+        for task in (first, second):
+            with pytest.raises(LiveFeedError):
+                await asyncio.wait_for(task, 5)
+        assert registry.stats() == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scanner import scan_pairs
+
+
+def test_constant_symbol_is_left_untested():
+    rng = np.random.default_rng(0)
+    closes = pd.DataFrame(
+        {
+            "AUSDT": 100.0 + np.cumsum(rng.normal(size=500)),
+            "BUSDT": 50.0 + np.cumsum(rng.normal(size=500)),
+            "CUSDT": np.full(500, 7.0),
+        }
+    )
+    with ThreadPoolExecutor(1) as pool:
+        scanned, rows = scan_pairs(closes, pool=pool)
+
+    # Pairs with the constant symbol as x have no hedge ratio and are dropped.
+    assert scanned == 4
+    by_pair = {(row["y_symbol"], row["x_symbol"]): row for row in rows}
+    assert by_pair[("AUSDT", "BUSDT")]["adf_p_value"] is not None
+    assert by_pair[("BUSDT", "AUSDT")]["adf_p_value"] is not None
+    for x_symbol in ("AUSDT", "BUSDT"):
+        row = by_pair[("CUSDT", x_symbol)]
+        assert row["hedge_ratio"] == 0.0
+        assert row["adf_statistic"] is None and row["adf_p_value"] is None
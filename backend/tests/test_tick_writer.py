@@ -0,0 +1,33 @@
+from tick_writer import TickWriter
+
+BATCH = [
+    (1_700_000_000_100, "BTCUSDT", 100.0, 1.0, 1),
+    (1_700_000_000_200, "BTCUSDT", 101.0, 2.0, 2),
+]
+
+
+def _bar(conn, timeframe="1s"):
+    return conn.execute(
+        "SELECT open, high, low, close, volume, trade_count FROM ohlc_bars "
+        "WHERE symbol = 'BTCUSDT' AND timeframe = ?",
+        (timeframe,),
+    ).fetchone()
+
+
+def test_replayed_batch_is_not_counted_twice(conn):
+    writer = TickWriter()
+    writer._flush(conn, BATCH)
+    writer._flush(conn, BATCH)
+
+    assert conn.execute("SELECT COUNT(*) FROM ticks").fetchone()[0] == 2
+    for timeframe in ("1s", "1m", "5m"):
+        assert tuple(_bar(conn, timeframe)) == (100.0, 101.0, 100.0, 101.0, 3.0, 2)
+
+
+def test_partly_replayed_batch_adds_only_new_ticks(conn):
+    writer = TickWriter()
+    writer._flush(conn, BATCH[:1])
+    writer._flush(conn, BATCH + [BATCH[1]])
+
+    assert conn.execute("SELECT COUNT(*) FROM ticks").fetchone()[0] == 2
+    assert tuple(_bar(conn)) == (100.0, 101.0, 100.0, 101.0, 3.0, 2)
@@ -0,0 +1,221 @@
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from config import TICK_RING_CAPACITY, TICK_RING_PREFIX
+
+
+# Header: [sequence, capacity]. `sequence` is the total number of ticks ever
+# published; the newest tick lives in slot (sequence - 1) % capacity.
+_HEADER_SLOTS = 2
+_HEADER_BYTES = _HEADER_SLOTS * 8
+
+
+def ring_name(symbol: str) -> str:
+    """Name of the shared-memory block that holds one symbol's ticks."""
+    return f"{TICK_RING_PREFIX}_{symbol.lower()}"
+
+
+def untrack_shared_memory(shm: shared_memory.SharedMemory):
+    """
+    Stops the resource tracker from unlinking the block when this process exits.
+    Every process (creator included) untracks, and the creator unlinks explicitly
+    in close(), so an API or ingestor restart never removes a live ring.
+    """
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+
+def _ring_size(capacity: int) -> int:
+    # timestamp (int64) + price (float64) + quantity (float64) per slot.
+    return _HEADER_BYTES + capacity * 24
+
+
+class TickRing:
+    """
+    Fixed-size ring buffer of one symbol's ticks in shared memory.
+
+    The ingestor is the only writer. Any process can attach by name and read the
+    latest tick or recent history straight from NumPy views over the shared block,
+    without touching SQLite. A reader detects that the writer lapped it by checking
+    the sequence counter again after reading.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self.owner = owner
+        buf = shm.buf
+        self._header = np.ndarray((_HEADER_SLOTS,), dtype=np.int64, buffer=buf)
+        self.capacity = int(self._header[1])
+        offset = _HEADER_BYTES
+        self.timestamps = np.ndarray(
+            (self.capacity,), dtype=np.int64, buffer=buf, offset=offset
+        )
+        offset += self.capacity * 8
+        self.prices = np.ndarray(
+            (self.capacity,), dtype=np.float64, buffer=buf, offset=offset
+        )
+        offset += self.capacity * 8
+        self.quantities = np.ndarray(
+            (self.capacity,), dtype=np.float64, buffer=buf, offset=offset
+        )
+
+    # --- Lifecycle ---
+
+    @classmethod
+    def create(cls, symbol: str, capacity: int = TICK_RING_CAPACITY) -> "TickRing":
+        """
+        Creates the ring for `symbol`, replacing a stale block left behind by a
+        previous run. The creating process is responsible for unlink().
+        """
+        name = ring_name(symbol)
+        try:
+            shm = shared_memory.SharedMemory(
+                name=name, create=True, size=_ring_size(capacity)
+            )
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(
+                name=name, create=True, size=_ring_size(capacity)
+            )
+        untrack_shared_memory(shm)
+        header = np.ndarray((_HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[0] = 0
+        header[1] = capacity
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, symbol: str):
+        """Attaches to an existing ring. Returns None if nobody has created it."""
+        try:
+            shm = shared_memory.SharedMemory(name=ring_name(symbol))
+        except FileNotFoundError:
+            return None
+        untrack_shared_memory(shm)
+        return cls(shm, owner=False)
+
+    def close(self):
+        """Releases this process's mapping (and removes the block if we own it)."""
+        del self._header, self.timestamps, self.prices, self.quantities
+        self._shm.close()
+        if self.owner:
+            if os.name == "posix":
+                # unlink() unregisters from the tracker, so track it again first.
+                resource_tracker.register(self._shm._name, "shared_memory")
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # --- Writer side ---
+
+    def publish(self, timestamp: int, price: float, quantity: float):
+        """Appends one tick. Must only be called from the single writer."""
+        seq = int(self._header[0])
+        slot = seq % self.capacity
+        self.timestamps[slot] = timestamp
+        self.prices[slot] = price
+        self.quantities[slot] = quantity
+        # Publish the slot only after its data is in place.
+        self._header[0] = seq + 1
+
+    # --- Reader side ---
+
+    @property
+    def sequence(self) -> int:
+        """Total number of ticks published so far."""
+        return int(self._header[0])
+
+    def latest(self):
+        """
+        Returns (timestamp, price, quantity, sequence) of the newest tick,
+        or None if nothing has been published yet.
+        """
+        while True:
+            seq = int(self._header[0])
+            if seq == 0:
+                return None
+            slot = (seq - 1) % self.capacity
+            tick = (
+                int(self.timestamps[slot]),
+                float(self.prices[slot]),
+                float(self.quantities[slot]),
+                seq,
+            )
+            # Retry if the writer wrapped all the way round onto our slot meanwhile.
+            if int(self._header[0]) - seq < self.capacity - 1:
+                return tick
+
+    def history(self, count: int, since: int = 0):
+        """
+        Returns up to `count` of the most recent ticks with sequence > `since`, as
+        (timestamps, prices, quantities, sequence) in chronological order.
+
+        When the requested range does not wrap around the end of the ring the arrays
+        are views into shared memory (zero-copy); they stay valid only until the
+        writer laps them, so consume or copy them promptly.
+        """
+        seq = int(self._header[0])
+        start = max(seq - count, since, seq - self.capacity + 1, 0)
+        if start >= seq:
+            empty = np.empty(0)
+            return empty.astype(np.int64), empty, empty, seq
+
+        first = start % self.capacity
+        last = seq % self.capacity
+        if first < last:
+            parts = (
+                self.timestamps[first:last],
+                self.prices[first:last],
+                self.quantities[first:last],
+            )
+        else:
+            parts = tuple(
+                np.concatenate((column[first:], column[:last]))
+                for column in (self.timestamps, self.prices, self.quantities)
+            )
+        return parts + (seq,)
+
+
+class TickRingRegistry:
+    """
+    Per-process cache of attached rings, used by the API.
+    Rings that do not exist yet (ingestor not started) are retried on the next call.
+    """
+
+    def __init__(self):
+        self._rings = {}
+
+    def get(self, symbol: str):
+        ring = self._rings.get(symbol)
+        if ring is None:
+            ring = TickRing.attach(symbol)
+            if ring is not None:
+                self._rings[symbol] = ring
+        return ring
+
+    def close(self):
+        for ring in self._rings.values():
+            ring.close()
+        self._rings.clear()
+
+
+def create_rings(symbols) -> dict:
+    """Creates one ring per symbol. Called by the process that owns their lifetime."""
+    return {symbol: TickRing.create(symbol) for symbol in symbols}
+
+
+def open_rings(symbols) -> dict:
+    """
+    Attaches to the rings for `symbols`, creating any that are missing
+    (e.g. when the ingestor is started on its own).
+    """
+    rings = {}
+    for symbol in symbols:
+        ring = TickRing.attach(symbol)
+        rings[symbol] = ring if ring is not None else TickRing.create(symbol)
+    return rings
@@ -0,0 +1,89 @@
+# Queries against the compact `ticks` table. Ticks are clustered on
+# (symbol_id, timestamp, trade_id) in a WITHOUT ROWID table, so every per-symbol
+# time-range read is a primary-key range scan. Symbols are stored as small integers;
+# the `symbols` table maps them back to their names.
+
+INSERT_TICK_SQL = """
+    INSERT OR IGNORE INTO ticks (symbol_id, timestamp, trade_id, price, quantity)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+LATEST_TICK_SQL = """
+    SELECT price, timestamp FROM ticks
+    WHERE symbol_id = (SELECT id FROM symbols WHERE name = ?)
+    ORDER BY timestamp DESC, trade_id DESC LIMIT 1
+"""
+
+RANGE_TICKS_SQL = """
+    SELECT timestamp, trade_id, price, quantity FROM ticks
+    WHERE symbol_id = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp, trade_id
+"""
+
+DELETE_RANGE_SQL = """
+    DELETE FROM ticks WHERE symbol_id = ? AND timestamp >= ? AND timestamp < ?
+"""
+
+
+class SymbolIds:
+    """
+    Cached name -> id mapping of the `symbols` table. Unknown names are inserted
+    on first use, so new symbols need no migration.
+    """
+
+    def __init__(self):
+        self._ids = {}
+
+    def get(self, conn, name: str) -> int:
+        symbol_id = self._ids.get(name)
+        if symbol_id is None:
+            conn.execute("INSERT OR IGNORE INTO symbols (name) VALUES (?)", (name,))
+            symbol_id = conn.execute(
+                "SELECT id FROM symbols WHERE name = ?", (name,)
+            ).fetchone()[0]
+            self._ids[name] = symbol_id
+        return symbol_id
+
+    def clear(self):
+        # Called after a rolled back transaction, which may have undone an insert.
+        self._ids.clear()
+
+
+def list_symbols(conn) -> list:
+    """Every (id, name) in the `symbols` table."""
+    return [tuple(row) for row in conn.execute("SELECT id, name FROM symbols ORDER BY id")]
+
+
+def insert_ticks(conn, ticks, symbol_ids: SymbolIds) -> list:
+    """
+    Inserts a batch of (timestamp, symbol, price, quantity, trade_id) ticks.
+    A tick that is already stored (same symbol, timestamp and trade id) is skipped.
+    Returns the ticks that were inserted, so only those are rolled into the bars.
+
+    Runs inside the caller's transaction. The whole batch is inserted with one
+    executemany; only when some rows were skipped (a replayed or overlapping
+    batch) is it redone row by row to find out which.
+    """
+    rows = [
+        (symbol_ids.get(conn, symbol), timestamp, trade_id, price, quantity)
+        for timestamp, symbol, price, quantity, trade_id in ticks
+    ]
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    conn.execute("SAVEPOINT insert_ticks")
+    if conn.executemany(INSERT_TICK_SQL, rows).rowcount == len(rows):
+        conn.execute("RELEASE insert_ticks")
+        return list(ticks)
+
+    conn.execute("ROLLBACK TO insert_ticks")
+    inserted = [
+        tick for tick, row in zip(ticks, rows) if conn.execute(INSERT_TICK_SQL, row).rowcount
+    ]
+    conn.execute("RELEASE insert_ticks")
+    return inserted
+
+
+def latest_tick(conn, symbol: str):
+    """The newest stored tick of a symbol as {"price", "timestamp"}, or None."""
+    row = conn.execute(LATEST_TICK_SQL, (symbol,)).fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,181 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from database import get_db_connection
+from bars import upsert_bars
+from tick_store import SymbolIds, insert_ticks
+from metrics import ingest_metrics
+from config import WRITER_BATCH_SIZE, WRITER_FLUSH_INTERVAL, WRITER_STATS_INTERVAL
+
+
+class TickWriter:
+    """
+    Dedicated writer stage for the ingestor.
+
+    The websocket callback only parses a trade and puts it on an in-memory queue.
+    A background thread owns one long-lived SQLite connection and flushes the
+    queued ticks with `executemany`, one transaction per batch. A batch is flushed
+    as soon as it reaches `batch_size` rows or `flush_interval` seconds have passed
+    since the first queued row, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = WRITER_BATCH_SIZE,
+        flush_interval: float = WRITER_FLUSH_INTERVAL,
+        stats_interval: float = WRITER_STATS_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats_interval = stats_interval
+        self._symbol_ids = SymbolIds()
+
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # --- Counters exposed through stats() ---
+        self._lock = threading.Lock()
+        self._rows_written = 0
+        self._batches_written = 0
+        self._errors = 0
+        self._last_batch_size = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        """Starts the background writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="TickWriter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stops the writer thread after flushing whatever is still queued."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def put(self, tick: tuple):
+        """
+        Queues a single parsed tick: (timestamp, symbol, price, quantity, trade_id).
+        This never touches the database, so it is safe to call from the websocket thread.
+        """
+        self._queue.put(tick)
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the writer's tuning counters."""
+        with self._lock:
+            batches = self._batches_written
+            return {
+                "batch_size_limit": self.batch_size,
+                "flush_interval_ms": self.flush_interval * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "rows_written": self._rows_written,
+                "batches_written": batches,
+                "errors": self._errors,
+                "last_batch_size": self._last_batch_size,
+                "avg_batch_size": (self._rows_written / batches) if batches else 0.0,
+                "last_flush_ms": self._last_flush_ms,
+                "avg_flush_ms": (self._total_flush_ms / batches) if batches else 0.0,
+                "max_flush_ms": self._max_flush_ms,
+            }
+
+    def _collect_batch(self) -> list:
+        """
+        Blocks until at least one tick is available, then keeps collecting until the
+        batch is full or the flush interval has elapsed.
+        """
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> list:
+        """Takes everything currently queued without waiting."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _flush(self, conn, batch: list):
+        """
+        Writes one batch and rolls it into the OHLC bars, both in a single
+        transaction, and records the latency.
+        """
+        started = time.perf_counter()
+        try:
+            with conn:
+                # Ticks that were already stored must not be counted again.
+                inserted = insert_ticks(conn, batch, self._symbol_ids)
+                upsert_bars(conn, inserted)
+        except sqlite3.Error as e:
+            self._symbol_ids.clear()
+            with self._lock:
+                self._errors += 1
+            print(f"--- Tick Writer Database Error ({len(batch)} rows dropped): {e} ---")
+            ingest_metrics.write_failed(len(batch))
+            return
+
+        elapsed = time.perf_counter() - started
+        ingest_metrics.batch_written(len(batch), elapsed, self._queue.qsize())
+        elapsed_ms = elapsed * 1000.0
+        with self._lock:
+            self._rows_written += len(batch)
+            self._batches_written += 1
+            self._last_batch_size = len(batch)
+            self._last_flush_ms = elapsed_ms
+            self._total_flush_ms += elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+
+    def _log_stats(self):
+        s = self.stats()
+        print(
+            f"--- Tick Writer: queue={s['queue_depth']} rows={s['rows_written']} "
+            f"avg_batch={s['avg_batch_size']:.1f} avg_flush={s['avg_flush_ms']:.2f}ms "
+            f"max_flush={s['max_flush_ms']:.2f}ms errors={s['errors']} ---"
+        )
+
+    def _run(self):
+        # The connection is created inside the writer thread and is never shared.
+        conn = get_db_connection()
+        # WAL + NORMAL only syncs at checkpoints, which is what makes batching pay off.
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        next_stats_at = time.monotonic() + self.stats_interval
+        try:
+            while not self._stop_event.is_set():
+                batch = self._collect_batch()
+                if batch:
+                    self._flush(conn, batch)
+
+                if self.stats_interval and time.monotonic() >= next_stats_at:
+                    self._log_stats()
+                    next_stats_at = time.monotonic() + self.stats_interval
+
+            # Flush whatever arrived while we were shutting down.
+            batch = self._drain()
+            for i in range(0, len(batch), self.batch_size):
+                self._flush(conn, batch[i : i + self.batch_size])
+        finally:
+            conn.close()